@@ -1,17 +1,24 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from app.db.database import get_db
+from app.db.snapshot import get_read_db
 from app.services.agent import chat_with_agent
+from app.services.sessions import session_store
 from app.core.safety import is_dangerous_query
+from app.core.responses import FastJSONResponse
 from pydantic import BaseModel
+from typing import Optional
 
 router = APIRouter()
 
 class ChatRequest(BaseModel):
     message: str
+    # Return table results as {"columns": [...], "rows": [[...]]} instead of a list of dicts
+    columnar: bool = False
+    # Conversation to continue; omit to start a new one (returned as session_id)
+    session_id: Optional[str] = None
 
 @router.post("/chat")
-def chat(payload: ChatRequest, db: Session = Depends(get_db)):
+def chat(payload: ChatRequest, db: Session = Depends(get_read_db)):
     """
     Chat endpoint with safety checks
     """
@@ -23,13 +30,18 @@ def chat(payload: ChatRequest, db: Session = Depends(get_db)):
                 detail="Dangerous operations (DELETE, DROP, etc.) are not allowed"
             )
         
-        response = chat_with_agent(payload.message, db)
+        session = session_store.get_or_create(payload.session_id)
+        response = chat_with_agent(payload.message, db, columnar=payload.columnar, session=session)
         
         # Check for errors in response
         if "error" in response:
             raise HTTPException(status_code=500, detail=response.get("error"))
         
-        return response
+        # Present when tools read the snapshot instead of the primary database
+        if "snapshot_age_seconds" in db.info:
+            response["snapshot_age_seconds"] = db.info["snapshot_age_seconds"]
+        
+        return FastJSONResponse(response)
     except HTTPException:
         raise
     except Exception as e:
@@ -1,50 +1,63 @@
 """
 Data summary and statistics endpoints
 """
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from app.db.database import get_db
+from app.db.snapshot import get_read_db
 from app.db import models
+from app.core.http_cache import REVALIDATE, make_etag, etag_matches, not_modified, cache_headers
+from app.core.responses import FastJSONResponse
+from app.core.singleflight import flight, make_key
+from app.services.summary import get_data_summary as build_data_summary
+from app.services.warmup import DATA_SUMMARY_KEY, warmup
+from app.services.visualization import row_cursors
+from app.services.tools import to_columnar
 
 router = APIRouter()
 
 @router.get("/data/summary")
-def get_data_summary(db: Session = Depends(get_db)):
+def get_data_summary(request: Request, db: Session = Depends(get_read_db)):
     """
-    Get database statistics summary
+    Get database statistics summary.
+    The ETag follows the data version, so unchanged data answers 304
+    without running the aggregates; the payload itself is usually precomputed.
     """
     try:
-        user_count = db.query(func.count(models.User.id)).scalar() or 0
-        order_count = db.query(func.count(models.Order.id)).scalar() or 0
-        sale_count = db.query(func.count(models.Sale.id)).scalar() or 0
-        
-        total_revenue = db.query(func.sum(models.Sale.revenue)).scalar() or 0
-        avg_order_amount = db.query(func.avg(models.Order.amount)).scalar() or 0
-        avg_sale_revenue = db.query(func.avg(models.Sale.revenue)).scalar() or 0
-        
-        return {
-            "tables": {
-                "users": {
-                    "count": user_count
-                },
-                "orders": {
-                    "count": order_count,
-                    "avg_amount": float(avg_order_amount) if avg_order_amount else 0
-                },
-                "sales": {
-                    "count": sale_count,
-                    "total_revenue": float(total_revenue) if total_revenue else 0,
-                    "avg_revenue": float(avg_sale_revenue) if avg_sale_revenue else 0
-                }
-            },
-            "summary": {
-                "total_users": user_count,
-                "total_orders": order_count,
-                "total_sales": sale_count,
-                "total_revenue": float(total_revenue) if total_revenue else 0
-            }
-        }
+        # Precomputed by the warmup scheduler; a stale entry keeps the ETag of its own version
+        entry = warmup.serve(DATA_SUMMARY_KEY, db) if warmup is not None else None
+        version = entry.version if entry is not None else models.get_data_version(db)
+        etag = make_etag("data-summary", version)
+        if etag_matches(request, etag):
+            return not_modified(etag, REVALIDATE)
+
+        if entry is not None:
+            summary = entry.value
+        else:
+            # Concurrent refreshes of the same data version share one computation
+            summary = flight.do(
+                make_key("get_data_summary", {"version": version}),
+                lambda: build_data_summary(db)
+            )
+        headers = cache_headers(etag, REVALIDATE)
+        if "snapshot_age_seconds" in db.info:
+            headers["X-Snapshot-Age"] = str(db.info["snapshot_age_seconds"])
+        return FastJSONResponse(summary, headers=headers)
     except Exception as e:
         return {"error": str(e)}
 
+
+@router.get("/data/rows")
+def get_more_rows(cursor: str, columnar: bool = False):
+    """
+    Next page of a table visualization ("load more").
+    The cursor comes from visualization.next_cursor or a previous page
+    """
+    page = row_cursors.page(cursor)
+    if page is None:
+        raise HTTPException(status_code=404, detail="Cursor expired, please ask the question again")
+    rows, next_cursor, total_rows = page
+    return FastJSONResponse({
+        "rows": to_columnar(rows) if columnar else rows,
+        "next_cursor": next_cursor,
+        "total_rows": total_rows
+    })
@@ -0,0 +1,32 @@
+"""
+Runtime metrics endpoint
+"""
+from fastapi import APIRouter
+from app.core.singleflight import flight
+from app.core.startup import startup_report
+from app.core.admission import admission
+from app.services.warmup import warmup
+from app.services.changes import change_feed
+from app.services.visualization import row_cursors
+from app.services.sessions import session_store
+from app.db.snapshot import snapshot
+from app.services import agent
+
+router = APIRouter()
+
+@router.get("/metrics")
+def get_metrics():
+    """
+    Report in-process performance counters
+    """
+    return {
+        "startup": startup_report.as_dict(),
+        "singleflight": flight.stats(),
+        "sessions": session_store.stats(),
+        "llm": agent.client.stats() if agent.client is not None else None,
+        "snapshot": snapshot.stats() if snapshot is not None else None,
+        "admission": admission.stats() if admission is not None else None,
+        "warmup": warmup.stats() if warmup is not None else None,
+        "changes": change_feed.stats() if change_feed is not None else None,
+        "visualization": row_cursors.stats()
+    }
@@ -0,0 +1,68 @@
+"""
+Live change stream endpoint (Server-Sent Events)
+"""
+import asyncio
+import json
+import time
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from app.core.config import settings
+from app.services.changes import ChangeEvent, change_feed
+
+router = APIRouter()
+
+
+def format_event(event: ChangeEvent) -> str:
+    data = json.dumps(event.data, default=str, separators=(",", ":"))
+    return f"id: {event.id}\nevent: {event.name}\ndata: {data}\n\n"
+
+
+async def event_stream(since: Optional[int]):
+    change_feed.subscribers += 1
+    try:
+        # Reconnect delay for EventSource
+        yield f"retry: {int(settings.CHANGES_POLL_SECONDS * 4000)}\n\n"
+        last_sent = time.monotonic()
+        generation = change_feed.generation
+        while True:
+            events = change_feed.events_since(since)
+            # Buffer no longer covers the client, or the baseline was reloaded
+            if events is None or change_feed.generation != generation:
+                generation = change_feed.generation
+                events = [change_feed.snapshot()]
+            for event in events:
+                yield format_event(event)
+                since = event.id
+                last_sent = time.monotonic()
+            if time.monotonic() - last_sent > settings.CHANGES_HEARTBEAT_SECONDS:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": ping\n\n"
+                last_sent = time.monotonic()
+            await asyncio.sleep(settings.CHANGES_POLL_SECONDS)
+    finally:
+        change_feed.subscribers -= 1
+
+
+@router.get("/stream/changes")
+def stream_changes(request: Request, since: Optional[int] = None):
+    """
+    Live data summary and support ticket updates.
+    The first event is the full summary; after that "summary" events carry
+    the delta and new totals, and "ticket" events announce ticket changes.
+    Reconnecting clients resume from Last-Event-ID (or ?since=).
+    """
+    if change_feed is None or not change_feed.ready:
+        raise HTTPException(status_code=503, detail="Change feed is not available")
+    if change_feed.subscribers >= change_feed.max_subscribers:
+        change_feed.rejected += 1
+        raise HTTPException(status_code=503, detail="Too many live subscribers, please try again later")
+
+    last_event_id = request.headers.get("last-event-id", "")
+    if last_event_id.isdigit():
+        since = int(last_event_id)
+    return StreamingResponse(
+        event_stream(since),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
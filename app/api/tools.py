@@ -1,129 +1,246 @@
 """
-Tools/Function listing endpoint
+Tools/Function listing, direct invocation and batch evaluation endpoints
 """
-from fastapi import APIRouter
+import json
+from typing import Any, Dict, List, Type
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+from app.core.http_cache import STATIC_MAX_AGE, make_etag, cached_json
+from app.core.responses import FastJSONResponse
+from app.db.snapshot import get_read_db
+from app.services.agent import TOOLS_SCHEMA, invoke_tool
+from app.services.tool_args import ARGS_MODELS
+from app.services.batch import BatchError, run_batch
 
 router = APIRouter()
 
-@router.get("/tools")
-def get_tools():
-    """
-    Get list of available tools/functions
-    """
-    tools = [
-        {
-            "name": "get_row_count",
-            "description": "Get total number of rows from a table",
-            "parameters": {
-                "table": {
-                    "type": "string",
-                    "enum": ["users", "orders", "sales"],
-                    "required": True,
-                    "description": "Name of the table to count rows"
-                }
-            },
-            "returns": "integer - Total number of rows"
+TOOLS = [
+    {
+        "name": "get_row_count",
+        "description": "Get total number of rows from a table",
+        "parameters": {
+            "table": {
+                "type": "string",
+                "enum": ["users", "orders", "sales"],
+                "required": True,
+                "description": "Name of the table to count rows"
+            }
+        },
+        "returns": "integer - Total number of rows"
+    },
+    {
+        "name": "get_recent_records",
+        "description": "Get most recent records from a table",
+        "parameters": {
+            "table": {"type": "string", "enum": ["orders", "sales"], "required": True},
+            "limit": {"type": "integer", "default": 5, "required": False}
+        },
+        "returns": "array - List of recent records"
+    },
+    {
+        "name": "get_sales_stats",
+        "description": "Get aggregated sales statistics",
+        "parameters": {},
+        "returns": "object - Sales statistics"
+    },
+    {
+        "name": "get_user_stats",
+        "description": "Get user statistics (total users, users with orders, etc.)",
+        "parameters": {},
+        "returns": "object - User statistics"
+    },
+    {
+        "name": "get_order_stats",
+        "description": "Get order statistics (total orders, amounts, averages)",
+        "parameters": {},
+        "returns": "object - Order statistics"
+    },
+    {
+        "name": "get_top_products",
+        "description": "Get top products by order count",
+        "parameters": {
+            "limit": {"type": "integer", "default": 10, "required": False}
         },
-        {
-            "name": "get_recent_records",
-            "description": "Get most recent records from a table",
-            "parameters": {
-                "table": {"type": "string", "enum": ["orders", "sales"], "required": True},
-                "limit": {"type": "integer", "default": 5, "required": False}
-            },
-            "returns": "array - List of recent records"
+        "returns": "array - Top products list"
+    },
+    {
+        "name": "get_user_orders",
+        "description": "Get orders for a specific user",
+        "parameters": {
+            "user_id": {"type": "integer", "required": True},
+            "limit": {"type": "integer", "default": 10, "required": False}
         },
-        {
-            "name": "get_sales_stats",
-            "description": "Get aggregated sales statistics",
-            "parameters": {},
-            "returns": "object - Sales statistics"
+        "returns": "array - User orders list"
+    },
+    {
+        "name": "get_average_order_value",
+        "description": "Get average order value",
+        "parameters": {},
+        "returns": "object - Average order value"
+    },
+    {
+        "name": "get_sales_by_product",
+        "description": "Get sales statistics grouped by product",
+        "parameters": {
+            "limit": {"type": "integer", "default": 10, "required": False}
         },
-        {
-            "name": "get_user_stats",
-            "description": "Get user statistics (total users, users with orders, etc.)",
-            "parameters": {},
-            "returns": "object - User statistics"
+        "returns": "array - Sales by product"
+    },
+    {
+        "name": "search_orders",
+        "description": "Search orders by product name or amount range",
+        "parameters": {
+            "product": {"type": "string", "required": False},
+            "min_amount": {"type": "number", "required": False},
+            "max_amount": {"type": "number", "required": False},
+            "limit": {"type": "integer", "default": 20, "required": False}
         },
-        {
-            "name": "get_order_stats",
-            "description": "Get order statistics (total orders, amounts, averages)",
-            "parameters": {},
-            "returns": "object - Order statistics"
+        "returns": "array - Search results"
+    },
+    {
+        "name": "get_user_by_id",
+        "description": "Get user information by user ID",
+        "parameters": {
+            "user_id": {"type": "integer", "required": True}
         },
-        {
-            "name": "get_top_products",
-            "description": "Get top products by order count",
-            "parameters": {
-                "limit": {"type": "integer", "default": 10, "required": False}
-            },
-            "returns": "array - Top products list"
+        "returns": "object - User information"
+    },
+    {
+        "name": "get_users_by_ids",
+        "description": "Get several users by ID in one query, keyed by ID (null for unknown IDs)",
+        "parameters": {
+            "user_ids": {"type": "array", "items": "integer", "required": True}
         },
-        {
-            "name": "get_user_orders",
-            "description": "Get orders for a specific user",
-            "parameters": {
-                "user_id": {"type": "integer", "required": True},
-                "limit": {"type": "integer", "default": 10, "required": False}
-            },
-            "returns": "array - User orders list"
+        "returns": "object - User information by ID"
+    },
+    {
+        "name": "get_orders_for_users",
+        "description": "Get the latest orders of several users in one query, keyed by user ID",
+        "parameters": {
+            "user_ids": {"type": "array", "items": "integer", "required": True},
+            "limit": {"type": "integer", "default": 10, "required": False}
         },
-        {
-            "name": "get_average_order_value",
-            "description": "Get average order value",
-            "parameters": {},
-            "returns": "object - Average order value"
+        "returns": "object - Order lists by user ID"
+    },
+    {
+        "name": "get_revenue_by_period",
+        "description": "Get revenue statistics for the last N days, optionally grouped by day, week or month",
+        "parameters": {
+            "days": {"type": "integer", "default": 30, "required": False},
+            "group_by": {"type": "string", "enum": ["day", "week", "month"], "required": False}
         },
-        {
-            "name": "get_sales_by_product",
-            "description": "Get sales statistics grouped by product",
-            "parameters": {
-                "limit": {"type": "integer", "default": 10, "required": False}
-            },
-            "returns": "array - Sales by product"
+        "returns": "object - Revenue statistics (with a per-period series when grouped)"
+    },
+    {
+        "name": "get_orders_by_date_range",
+        "description": "Get orders within a specific date range",
+        "parameters": {
+            "start_date": {"type": "string", "required": False},
+            "end_date": {"type": "string", "required": False},
+            "limit": {"type": "integer", "default": 50, "required": False}
         },
-        {
-            "name": "search_orders",
-            "description": "Search orders by product name or amount range",
-            "parameters": {
-                "product": {"type": "string", "required": False},
-                "min_amount": {"type": "number", "required": False},
-                "max_amount": {"type": "number", "required": False},
-                "limit": {"type": "integer", "default": 20, "required": False}
-            },
-            "returns": "array - Search results"
+        "returns": "array - Orders in date range"
+    },
+    {
+        "name": "get_distribution",
+        "description": "Get exact quantiles (median, p90, ...) and a histogram of order amounts or sale revenue, optionally per product or period",
+        "parameters": {
+            "table": {"type": "string", "enum": ["orders", "sales"], "default": "orders", "required": False},
+            "group_by": {"type": "string", "enum": ["product", "day", "week", "month"], "required": False},
+            "days": {"type": "integer", "required": False},
+            "quantiles": {"type": "array", "items": "number", "required": False},
+            "bins": {"type": "integer", "default": 20, "required": False},
+            "scale": {"type": "string", "enum": ["linear", "log"], "default": "linear", "required": False},
+            "limit": {"type": "integer", "default": 10, "required": False}
         },
-        {
-            "name": "get_user_by_id",
-            "description": "Get user information by user ID",
-            "parameters": {
-                "user_id": {"type": "integer", "required": True}
-            },
-            "returns": "object - User information"
+        "returns": "object - Quantiles and histogram (per group with group_by)"
+    },
+    {
+        "name": "get_cohort_retention",
+        "description": "Get monthly signup cohorts with the share of users ordering in each following month and repeat buyers",
+        "parameters": {
+            "start_month": {"type": "string", "required": False},
+            "cohorts": {"type": "integer", "default": 6, "required": False},
+            "periods": {"type": "integer", "default": 6, "required": False}
         },
-        {
-            "name": "get_revenue_by_period",
-            "description": "Get revenue statistics for the last N days",
-            "parameters": {
-                "days": {"type": "integer", "default": 30, "required": False}
-            },
-            "returns": "object - Revenue statistics"
+        "returns": "object - Retention matrix per cohort"
+    },
+    {
+        "name": "run_query_spec",
+        "description": "Run an ad-hoc query spec (filters, group-by, aggregates, order, limit) over allowlisted columns, rejected if the query planner estimates it too expensive",
+        "parameters": {
+            "table": {"type": "string", "enum": ["users", "orders", "sales"], "required": True},
+            "filters": {"type": "array", "required": False},
+            "group_by": {"type": "array", "required": False},
+            "aggregates": {"type": "array", "required": False},
+            "columns": {"type": "array", "required": False},
+            "order_by": {"type": "array", "required": False},
+            "limit": {"type": "integer", "default": 50, "required": False}
         },
-        {
-            "name": "get_orders_by_date_range",
-            "description": "Get orders within a specific date range",
-            "parameters": {
-                "start_date": {"type": "string", "required": False},
-                "end_date": {"type": "string", "required": False},
-                "limit": {"type": "integer", "default": 50, "required": False}
-            },
-            "returns": "array - Orders in date range"
-        }
-    ]
-    
-    return {
-        "tools": tools,
-        "count": len(tools),
-        "description": "Available functions that the AI agent can use to query the database"
+        "returns": "array - Result rows"
     }
+]
+
+TOOLS_RESPONSE = {
+    "tools": TOOLS,
+    "count": len(TOOLS),
+    "description": "Available functions that the AI agent can use to query the database",
+    # Each tool can also be called directly, without the LLM
+    "invoke": "POST /api/tools/{name}"
+}
+
+# The list only changes with a deploy, so the ETag is computed once
+TOOLS_ETAG = make_etag("tools", json.dumps(TOOLS_RESPONSE, sort_keys=True))
+
+
+@router.get("/tools")
+def get_tools(request: Request):
+    """
+    Get list of available tools/functions
+    """
+    return cached_json(request, TOOLS_ETAG, STATIC_MAX_AGE, TOOLS_RESPONSE)
+
+
+
+class BatchRequest(BaseModel):
+    tool: str
+    # One argument object per call, e.g. [{"user_id": 1}, {"user_id": 2, "limit": 5}]
+    args: List[Dict[str, Any]]
+
+
+@router.post("/tools/batch")
+def run_tool_batch(payload: BatchRequest, db: Session = Depends(get_read_db)):
+    """
+    Run one tool for many argument sets.
+    get_user_by_id and get_user_orders are answered with a single grouped
+    query; other tools run once per distinct argument set.
+    """
+    try:
+        return FastJSONResponse(run_batch(db, payload.tool, payload.args))
+    except BatchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _invoke_endpoint(tool_name: str, args_model: Type[BaseModel]):
+    def endpoint(payload: args_model, columnar: bool = False, db: Session = Depends(get_read_db)):
+        # Only the arguments the client set; omitted and null ones keep the tool defaults
+        args = payload.model_dump(exclude_none=True)
+        try:
+            return FastJSONResponse(invoke_tool(tool_name, args, db, columnar=columnar))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return endpoint
+
 
+# POST /tools/{name} for every registered tool, same answer shape as /chat
+for tool in TOOLS_SCHEMA:
+    function = tool["function"]
+    router.add_api_route(
+        f"/tools/{function['name']}",
+        _invoke_endpoint(function["name"], ARGS_MODELS[function["name"]]),
+        methods=["POST"],
+        name=f"invoke_{function['name']}",
+        summary=f"Invoke {function['name']}",
+        description=function["description"],
+    )
@@ -0,0 +1,294 @@
+"""
+Admission control for expensive endpoints (/api/chat, tool calls).
+Requests to the admitted paths pass two gates before reaching the app:
+- a per-client token bucket (ADMISSION_RATE_PER_MINUTE, ADMISSION_BURST) -> 429
+- a global concurrency cap with a bounded wait queue -> 503 when the queue
+  is full or the wait times out
+Both rejections carry Retry-After. Everything else (health, metrics, static
+files, the frontend) bypasses admission, and because the cap sits below the
+threadpool size, cheap endpoints keep free threads while chats queue.
+
+Buckets live in process memory by default; ADMISSION_STORE=sqlite keeps
+them in a small local SQLite file so all uvicorn workers on the host share
+one limit per client. The concurrency cap is always per process.
+"""
+import asyncio
+import json
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from app.core.config import settings
+
+
+class MemoryBucketStore:
+    """
+    Token buckets in a dict, least recently seen clients evicted past max_clients
+    """
+
+    def __init__(self, max_clients: int = 10000):
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, key: str, rate: float, burst: float, now: float) -> Tuple[bool, float]:
+        """
+        Spend one token from key's bucket.
+        Returns: (allowed, seconds until a token is available)
+        """
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            allowed, tokens, wait = _refill_and_take(tokens, updated, rate, burst, now)
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+            return allowed, wait
+
+
+class SQLiteBucketStore:
+    """
+    Token buckets in a local SQLite file shared by every worker process.
+    Each take is one short write transaction (BEGIN IMMEDIATE), so concurrent
+    workers serialize on the file lock instead of double-spending tokens.
+    """
+
+    # Every this many takes, drop buckets that have been full (idle) for a while
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._takes = 0
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, rate: float, burst: float, now: float) -> Tuple[bool, float]:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (burst, now)
+            allowed, tokens, wait = _refill_and_take(tokens, updated, rate, burst, now)
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                (key, tokens, now)
+            )
+            self._takes += 1
+            if self._takes % self.PRUNE_EVERY == 0:
+                conn.execute("DELETE FROM buckets WHERE updated < ?", (now - burst / rate,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, wait
+
+
+def _refill_and_take(tokens: float, updated: float, rate: float, burst: float,
+                     now: float) -> Tuple[bool, float, float]:
+    """
+    Returns: (allowed, tokens left, seconds until the next token)
+    """
+    tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+    if tokens >= 1:
+        return True, tokens - 1, 0.0
+    return False, tokens, (1 - tokens) / rate
+
+
+class Overloaded(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    """
+    At most max_concurrent requests run; up to max_queue more wait (FIFO) for
+    at most queue_timeout seconds. Retry-After on rejection is the expected
+    time for the queue ahead to drain, from an EWMA of request durations.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.waiting = 0
+        self.avg_seconds = 1.0
+
+    def retry_after(self) -> float:
+        return self.avg_seconds * (self.waiting + 1) / self.max_concurrent
+
+    async def acquire(self) -> None:
+        if self._semaphore is None:
+            # Created lazily so it binds to the server's event loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        if self._semaphore.locked():
+            if self.waiting >= self.max_queue:
+                raise Overloaded("queue_full", self.retry_after())
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise Overloaded("queue_timeout", self.retry_after())
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+        self.in_flight += 1
+
+    def release(self, seconds: float) -> None:
+        self.in_flight -= 1
+        self.avg_seconds += 0.2 * (seconds - self.avg_seconds)
+        self._semaphore.release()
+
+
+def build_store():
+    if settings.ADMISSION_STORE == "sqlite":
+        return SQLiteBucketStore(settings.ADMISSION_STORE_PATH)
+    return MemoryBucketStore()
+
+
+class AdmissionController:
+    def __init__(self, store, rate_per_minute: float, burst: float, limiter: ConcurrencyLimiter,
+                 paths: Tuple[str, ...], client_header: str = ""):
+        self.store = store
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.limiter = limiter
+        self.paths = paths
+        self.client_header = client_header.lower().encode("latin-1")
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {"rate_limited": 0, "queue_full": 0, "queue_timeout": 0}
+
+    def applies_to(self, path: str) -> bool:
+        return path.startswith(self.paths)
+
+    def client_key(self, scope) -> str:
+        """
+        Configured header (API key, first X-Forwarded-For hop), else the peer address
+        """
+        if self.client_header:
+            for name, value in scope.get("headers", ()):
+                if name == self.client_header:
+                    return value.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    def check_rate(self, scope) -> Optional[float]:
+        """
+        None if admitted, else seconds until the client may retry
+        """
+        if self.rate <= 0:
+            return None
+        allowed, wait = self.store.take(self.client_key(scope), self.rate, self.burst, time.time())
+        if allowed:
+            return None
+        self.rejected["rate_limited"] += 1
+        return wait
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "in_flight": self.limiter.in_flight,
+            "waiting": self.limiter.waiting,
+            "max_concurrent": self.limiter.max_concurrent,
+            "max_queue": self.limiter.max_queue,
+            "avg_seconds": round(self.limiter.avg_seconds, 3),
+            "store": type(self.store).__name__
+        }
+
+
+async def _reject(send, status: int, message: str, retry_after: float) -> None:
+    # "error" is what the frontend shows; "detail" matches HTTPException bodies
+    body = json.dumps({"detail": message, "error": message}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode())
+        ]
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    """
+    Pure ASGI middleware: the slot is held until the response body is sent
+    """
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.controller.applies_to(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        controller = self.controller
+        if isinstance(controller.store, SQLiteBucketStore):
+            # May wait on another worker's file lock; keep it off the event loop
+            wait = await asyncio.get_running_loop().run_in_executor(None, controller.check_rate, scope)
+        else:
+            wait = controller.check_rate(scope)
+        if wait is not None:
+            await _reject(send, 429, "Too many requests, please slow down", wait)
+            return
+
+        try:
+            await controller.limiter.acquire()
+        except Overloaded as e:
+            controller.rejected[e.reason] += 1
+            await _reject(send, 503, "Server is busy, please retry shortly", e.retry_after)
+            return
+
+        controller.admitted += 1
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.limiter.release(time.monotonic() - started)
+
+
+def build_admission() -> Optional[AdmissionController]:
+    """
+    None when ADMISSION_ENABLED is off
+    """
+    if not settings.ADMISSION_ENABLED:
+        return None
+    paths = tuple(p.strip() for p in settings.ADMISSION_PATHS.split(",") if p.strip())
+    limiter = ConcurrencyLimiter(
+        settings.ADMISSION_MAX_CONCURRENT,
+        settings.ADMISSION_MAX_QUEUE,
+        settings.ADMISSION_QUEUE_TIMEOUT_SECONDS
+    )
+    return AdmissionController(
+        build_store(),
+        settings.ADMISSION_RATE_PER_MINUTE,
+        settings.ADMISSION_BURST,
+        limiter,
+        paths,
+        settings.ADMISSION_CLIENT_HEADER
+    )
+
+
+admission = build_admission()
@@ -0,0 +1,54 @@
+"""
+HTTP caching helpers: ETag generation and conditional request handling
+"""
+import hashlib
+from typing import Any, Dict
+from fastapi import Request, Response
+from app.core.responses import FastJSONResponse
+
+# Data-derived responses may be stored but must be revalidated on every use
+REVALIDATE = "no-cache"
+# Static metadata (tool list) can be reused for a while without asking
+STATIC_MAX_AGE = "public, max-age=300"
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Build a strong ETag from the given parts (e.g. resource name and data version)
+    """
+    digest = hashlib.sha1(":".join(str(part) for part in parts).encode()).hexdigest()[:16]
+    return f'"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Check the If-None-Match header against an ETag (weak comparison)
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+
+    candidates = [tag.strip() for tag in header.split(",")]
+    return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in candidates)
+
+
+def cache_headers(etag: str, cache_control: str) -> Dict[str, str]:
+    return {"ETag": etag, "Cache-Control": cache_control}
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    """
+    Empty 304 response carrying the validator headers
+    """
+    return Response(status_code=304, headers=cache_headers(etag, cache_control))
+
+
+def cached_json(request: Request, etag: str, cache_control: str, content: Any) -> Response:
+    """
+    Return 304 if the client already has this ETag, otherwise the JSON body with caching headers
+    """
+    if etag_matches(request, etag):
+        return not_modified(etag, cache_control)
+    return FastJSONResponse(content, headers=cache_headers(etag, cache_control))
@@ -0,0 +1,42 @@
+"""
+Fast JSON responses and compression for API payloads
+"""
+from typing import Any
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from starlette.middleware.gzip import GZipMiddleware
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the stdlib encoder
+    orjson = None
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:  # brotli is optional, gzip is always available
+    BrotliMiddleware = None
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson when it is installed.
+    Returning it directly from an endpoint also skips FastAPI's
+    jsonable_encoder pass; datetimes are serialized natively.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def add_compression(app: FastAPI, minimum_size: int) -> None:
+    """
+    Compress responses larger than minimum_size bytes.
+    Uses brotli when brotli-asgi is installed (with gzip fallback for
+    clients that don't accept br), otherwise plain gzip.
+    """
+    if BrotliMiddleware is not None:
+        app.add_middleware(BrotliMiddleware, minimum_size=minimum_size, gzip_fallback=True)
+    else:
+        app.add_middleware(GZipMiddleware, minimum_size=minimum_size)
@@ -0,0 +1,106 @@
+"""
+Request coalescing (single-flight).
+Concurrent identical calls (same name and normalized arguments) share one
+in-flight execution; every caller receives the leader's result or error.
+Results are shared between callers and must be treated as read-only.
+"""
+import inspect
+import json
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+Key = Tuple[str, str]
+
+
+def normalize_args(args: Dict[str, Any], func: Optional[Callable] = None) -> Dict[str, Any]:
+    """
+    Fill omitted arguments with func's defaults so get_top_products() and
+    get_top_products(limit=10) compare equal. The db session is never included.
+    """
+    normalized = {}
+    if func is not None:
+        for param_name, param in inspect.signature(func).parameters.items():
+            if param_name != "db" and param.default is not inspect.Parameter.empty:
+                normalized[param_name] = param.default
+    normalized.update(args)
+    return normalized
+
+
+def make_key(name: str, args: Dict[str, Any], func: Optional[Callable] = None) -> Key:
+    """
+    Build a coalescing key from the name and normalized arguments
+    """
+    return name, json.dumps(normalize_args(args, func), sort_keys=True, default=str)
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Key, _Call] = {}
+        self._executions = defaultdict(int)
+        self._collapsed = defaultdict(int)
+
+    def do(self, key: Key, fn: Callable[[], Any]) -> Any:
+        """
+        Run fn unless an identical call is already in flight, in which case
+        wait for it and return its result
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self._executions[key[0]] += 1
+            else:
+                self._collapsed[key[0]] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Executions vs collapsed (deduplicated) requests, overall and per name
+        """
+        with self._lock:
+            names = set(self._executions) | set(self._collapsed)
+            return {
+                "executions": sum(self._executions.values()),
+                "collapsed": sum(self._collapsed.values()),
+                "in_flight": len(self._calls),
+                "by_name": {
+                    name: {
+                        "executions": self._executions[name],
+                        "collapsed": self._collapsed[name]
+                    }
+                    for name in sorted(names)
+                }
+            }
+
+
+# Shared by the agent tools and the data summary endpoint
+flight = SingleFlight()
@@ -0,0 +1,68 @@
+"""
+Application startup: database initialization and a startup-time report
+"""
+import time
+from typing import Any, Callable, Dict, List
+
+
+class StartupReport:
+    """
+    Collects how long each import/init step took, in milliseconds
+    """
+
+    def __init__(self):
+        self.steps: List[Dict[str, Any]] = []
+
+    def record(self, step: str, started: float) -> None:
+        """
+        Record a step that began at `started` (time.perf_counter()) and ends now
+        """
+        self.steps.append({
+            "step": step,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2)
+        })
+
+    def timed(self, step: str, fn: Callable[[], Any]) -> Any:
+        started = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            self.record(step, started)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "steps": list(self.steps),
+            "total_ms": round(sum(step["duration_ms"] for step in self.steps), 2)
+        }
+
+
+startup_report = StartupReport()
+
+
+def init_database() -> List[str]:
+    """
+    Create tables, apply migrations and backfill new user aggregates
+    and the user activity matrix.
+    Runs in the app lifespan hook or from scripts/init_db.py.
+    Returns the list of columns added by migrations
+    """
+    from app.db.database import Base, SessionLocal, engine
+    from app.db import models  # noqa: F401  (registers tables on Base.metadata)
+    from app.db.migrations import run_migrations
+    from app.services.user_aggregates import reconcile_user_aggregates
+    from app.services.cohorts import activity_backfill_needed, reconcile_user_activity
+
+    startup_report.timed("db.create_all", lambda: Base.metadata.create_all(bind=engine))
+    added = startup_report.timed("db.migrations", lambda: run_migrations(engine))
+
+    # Freshly added user aggregates start at zero, so backfill them from orders
+    if added:
+        with SessionLocal() as db:
+            startup_report.timed("db.reconcile_user_aggregates", lambda: reconcile_user_aggregates(db))
+
+    # A freshly created activity matrix is built once from existing orders
+    with SessionLocal() as db:
+        if activity_backfill_needed(db):
+            startup_report.timed("db.reconcile_user_activity", lambda: reconcile_user_activity(db))
+
+    return added
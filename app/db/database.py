@@ -1,10 +1,27 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from app.core.config import settings
 
-DATABASE_URL = "sqlite:///./data.db"
+DATABASE_URL = settings.DATABASE_URL
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread" : False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False,bind=engine)
+
+def engine_options(url: str) -> dict:
+    """
+    SQLite needs cross-thread connections; server databases get a checked pool
+    """
+    if url.startswith("sqlite"):
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_pre_ping": True,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW
+    }
+
+
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+# Committed objects keep their loaded values instead of being expired and
+# re-selected on the next attribute access
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 Base = declarative_base()
 
 def get_db():
@@ -0,0 +1,61 @@
+"""
+SQL that differs between SQLite and PostgreSQL.
+Tools build queries through these helpers so they run on either backend.
+"""
+from sqlalchemy import Integer, cast, func, literal_column
+from sqlalchemy.orm import Session
+
+BUCKET_UNITS = ("day", "week", "month")
+
+# Rows fetched per round trip when streaming large results
+# (a server-side cursor on PostgreSQL)
+STREAM_BATCH_SIZE = 1000
+
+
+def dialect_name(db: Session) -> str:
+    return db.get_bind().dialect.name
+
+
+def floor_int(expression, dialect: str):
+    """
+    floor() of a non-negative number as an integer
+    """
+    if dialect == "postgresql":
+        return func.floor(expression)
+    # SQLite's CAST truncates toward zero (floor() is an optional build feature)
+    return cast(expression, Integer)
+
+
+def date_bucket(column, unit: str, dialect: str):
+    """
+    Start of the day/week (Monday)/month containing `column`, as 'YYYY-MM-DD'
+    """
+    if unit not in BUCKET_UNITS:
+        raise ValueError(f"Invalid bucket '{unit}'. Allowed: {', '.join(BUCKET_UNITS)}")
+
+    if dialect == "postgresql":
+        # Inlined literals (unit is allowlisted above): with bound parameters
+        # PostgreSQL sees the SELECT and GROUP BY expressions as different
+        return func.to_char(func.date_trunc(literal_column(f"'{unit}'"), column), literal_column("'YYYY-MM-DD'"))
+
+    # SQLite date functions
+    if unit == "day":
+        return func.strftime("%Y-%m-%d", column)
+    if unit == "month":
+        return func.strftime("%Y-%m-01", column)
+    # Next Sunday (or the same day), then back to that week's Monday
+    return func.date(column, "weekday 0", "-6 days")
+
+
+def iso_timestamp(column, dialect: str):
+    """
+    `column` as an ISO 8601 string, formatted by the database for the whole
+    result instead of per row in Python. Same strings as datetime.isoformat():
+    'YYYY-MM-DDTHH:MM:SS.ffffff', without the fraction for whole seconds
+    """
+    if dialect == "postgresql":
+        text = func.to_char(column, literal_column("'YYYY-MM-DD\"T\"HH24:MI:SS.US'"))
+    else:
+        # SQLAlchemy stores SQLite datetimes as 'YYYY-MM-DD HH:MM:SS.ffffff'
+        text = func.replace(column, " ", "T")
+    return func.replace(text, ".000000", "")
@@ -0,0 +1,64 @@
+"""
+Lightweight schema migrations for databases created before a column existed.
+create_all() only creates missing tables, so new columns and indexes on
+existing tables are added here.
+"""
+from typing import List
+from sqlalchemy import inspect, select, text
+from sqlalchemy.engine import Engine
+from app.db import models
+
+# Tables whose columns or indexes may have grown since the first release
+MIGRATED_TABLES = [models.User.__table__, models.Order.__table__, models.Sale.__table__]
+
+
+def _add_missing_columns(conn, table) -> List[str]:
+    """
+    Add columns defined on the model but missing in the database
+    """
+    existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+    added = []
+
+    for column in table.columns:
+        if column.name in existing:
+            continue
+
+        ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=conn.dialect)}"
+        if column.server_default is not None:
+            ddl += f" DEFAULT {column.server_default.arg}"
+            if not column.nullable:
+                ddl += " NOT NULL"
+        conn.execute(text(ddl))
+        added.append(f"{table.name}.{column.name}")
+
+    return added
+
+
+def run_migrations(engine: Engine) -> List[str]:
+    """
+    Bring an existing database up to the current models.
+    Returns the list of added columns (empty if nothing changed)
+    """
+    added = []
+    with engine.begin() as conn:
+        for table in MIGRATED_TABLES:
+            added.extend(_add_missing_columns(conn, table))
+
+    for table in MIGRATED_TABLES:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+    _ensure_data_version_row(engine)
+
+    return added
+
+
+def _ensure_data_version_row(engine: Engine) -> None:
+    """
+    The data version counter lives in a single row that must exist
+    before the first write can bump it
+    """
+    table = models.DataVersion.__table__
+    with engine.begin() as conn:
+        if conn.execute(select(table.c.id).where(table.c.id == 1)).first() is None:
+            conn.execute(table.insert().values(id=1, version=0))
@@ -1,5 +1,6 @@
-from sqlalchemy import Column,Integer,String,Float,DateTime,ForeignKey
-from sqlalchemy.orm import relationship
+import json
+from sqlalchemy import Column,Integer,BigInteger,String,Float,DateTime,ForeignKey,Index,Text,event,case,cast,literal,or_,func
+from sqlalchemy.orm import relationship, Session, attributes
 from .database import Base
 from datetime import datetime
 
@@ -10,6 +11,13 @@ class User(Base):
     email = Column(String, unique=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    # Denormalized order aggregates, maintained on order insert
+    # (see _apply_order_to_user) and repaired by reconcile_user_aggregates
+    order_count = Column(Integer, nullable=False, default=0, server_default="0", index=True)
+    total_spent = Column(Float, nullable=False, default=0.0, server_default="0")
+    first_order_at = Column(DateTime, nullable=True)
+    last_order_at = Column(DateTime, nullable=True)
+
 
 class Order(Base):
     __tablename__ = "orders"
@@ -17,10 +25,16 @@ class Order(Base):
     user_id = Column(Integer, ForeignKey("users.id"))
     product = Column(String)
     amount = Column(Float)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    # Date-filtered tools read a range of this index instead of the whole history
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
     user = relationship("User")
 
+    __table_args__ = (
+        # A user's latest orders without scanning all of their history
+        Index("ix_orders_user_id_created_at", "user_id", "created_at"),
+    )
+
 
 class Sale(Base):
     __tablename__ = "sales"
@@ -31,6 +45,11 @@ class Sale(Base):
 
     order = relationship("Order")
 
+    __table_args__ = (
+        # Covers revenue-by-period: the range scan never touches the table rows
+        Index("ix_sales_created_at_revenue", "created_at", "revenue"),
+    )
+
 
 class SupportTicket(Base):
     __tablename__ = "support_tickets"
@@ -42,4 +61,202 @@ class SupportTicket(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     external_id = Column(String, nullable=True)  # GitHub Issue ID, Trello ID, etc.
-    external_url = Column(String, nullable=True)  # Link to external ticket
\ No newline at end of file
+    external_url = Column(String, nullable=True)  # Link to external ticket
+
+
+class DataVersion(Base):
+    """
+    Single-row counter bumped on every write to users/orders/sales.
+    Used as the validator for HTTP caching (ETag) of data-derived responses.
+    """
+    __tablename__ = "data_version"
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0, server_default="0")
+
+
+class UserActivity(Base):
+    """
+    Which months each user ordered in, as a bitmask relative to the month they
+    joined (bit i = ordered i months after signup). One row per user, kept up
+    to date on user and order inserts; cohort retention reads only this table.
+    Repaired by reconcile_user_activity (app/services/cohorts.py).
+    """
+    __tablename__ = "user_activity"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    # Signup month as year * 12 + month - 1
+    cohort_month = Column(Integer, nullable=False, index=True)
+    months = Column(BigInteger, nullable=False, default=0, server_default="0")
+
+
+# Months after signup tracked in UserActivity.months (a signed 64-bit integer)
+ACTIVITY_MONTHS = 63
+
+
+def month_index(moment: datetime) -> int:
+    return moment.year * 12 + moment.month - 1
+
+
+class ChangeLog(Base):
+    """
+    Append-only log of row changes to users/orders/sales/support_tickets,
+    written in the same transaction as the change (see _log_change).
+    Read in id order by the change feed (app/services/changes.py).
+    """
+    __tablename__ = "change_log"
+    id = Column(Integer, primary_key=True)
+    table_name = Column(String, nullable=False)
+    op = Column(String, nullable=False)  # insert, update, delete
+    row_id = Column(Integer)
+    # JSON of the logged columns; updates also carry the previous values under "old"
+    payload = Column(Text, nullable=False, default="{}")
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+# Tables whose writes invalidate data-derived responses
+VERSIONED_TABLES = {"users", "orders", "sales"}
+
+
+def get_data_version(db: Session) -> int:
+    """
+    Current data version (0 if the counter row doesn't exist yet)
+    """
+    return db.query(DataVersion.version).filter(DataVersion.id == 1).scalar() or 0
+
+
+def bump_data_version(connection) -> None:
+    """
+    Increment the data version inside the caller's transaction
+    """
+    table = DataVersion.__table__
+    connection.execute(
+        table.update().where(table.c.id == 1).values(version=table.c.version + 1)
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_data_version_on_write(session, flush_context):
+    """
+    One version bump per flush that touched a versioned table
+    """
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if getattr(obj, "__tablename__", None) in VERSIONED_TABLES:
+            bump_data_version(session.connection())
+            return
+
+
+@event.listens_for(Order, "after_insert")
+def _apply_order_to_user(mapper, connection, target):
+    """
+    Update the owner's order aggregates in the same transaction as the insert
+    """
+    if target.user_id is None:
+        return
+
+    users = User.__table__
+    created_at = target.created_at or datetime.utcnow()
+    connection.execute(
+        users.update()
+        .where(users.c.id == target.user_id)
+        .values(
+            order_count=func.coalesce(users.c.order_count, 0) + 1,
+            total_spent=func.coalesce(users.c.total_spent, 0) + (target.amount or 0),
+            first_order_at=case(
+                (or_(users.c.first_order_at.is_(None), users.c.first_order_at > created_at), created_at),
+                else_=users.c.first_order_at
+            ),
+            last_order_at=case(
+                (or_(users.c.last_order_at.is_(None), users.c.last_order_at < created_at), created_at),
+                else_=users.c.last_order_at
+            )
+        )
+    )
+
+
+@event.listens_for(User, "after_insert")
+def _create_user_activity(mapper, connection, target):
+    """
+    Empty activity row in the user's signup cohort
+    """
+    connection.execute(
+        UserActivity.__table__.insert().values(
+            user_id=target.id,
+            cohort_month=month_index(target.created_at or datetime.utcnow()),
+            months=0
+        )
+    )
+
+
+@event.listens_for(User, "before_delete")
+def _delete_user_activity(mapper, connection, target):
+    activity = UserActivity.__table__
+    connection.execute(activity.delete().where(activity.c.user_id == target.id))
+
+
+@event.listens_for(Order, "after_insert")
+def _apply_order_to_activity(mapper, connection, target):
+    """
+    Set the owner's bit for the month of the order (orders before signup or
+    more than ACTIVITY_MONTHS later are not tracked)
+    """
+    if target.user_id is None:
+        return
+
+    activity = UserActivity.__table__
+    order_month = month_index(target.created_at or datetime.utcnow())
+    connection.execute(
+        activity.update()
+        .where(
+            activity.c.user_id == target.user_id,
+            activity.c.cohort_month <= order_month,
+            activity.c.cohort_month > order_month - ACTIVITY_MONTHS
+        )
+        .values(months=activity.c.months.op("|")(
+            cast(literal(1), BigInteger).op("<<")(order_month - activity.c.cohort_month)
+        ))
+    )
+
+
+# Columns copied into the change log, per logged model
+CHANGE_LOG_COLUMNS = {
+    User: (),
+    Order: ("amount",),
+    Sale: ("revenue",),
+    SupportTicket: ("title", "status", "priority"),
+}
+
+
+def _log_change(connection, target, op: str) -> None:
+    columns = CHANGE_LOG_COLUMNS[type(target)]
+    payload = {column: getattr(target, column) for column in columns}
+    if op == "update":
+        old = {}
+        for column in columns:
+            history = attributes.get_history(target, column)
+            if history.deleted:
+                old[column] = history.deleted[0]
+        if not old:
+            # Nothing the feed reports on changed
+            return
+        payload["old"] = old
+    connection.execute(
+        ChangeLog.__table__.insert().values(
+            table_name=target.__tablename__,
+            op=op,
+            row_id=target.id,
+            payload=json.dumps(payload, default=str),
+            created_at=datetime.utcnow()
+        )
+    )
+
+
+def _register_change_log(model) -> None:
+    for op in ("insert", "update", "delete"):
+        event.listen(model, f"after_{op}", lambda mapper, connection, target, op=op: _log_change(connection, target, op))
+    # Load the previous value on assignment, so updates of expired objects still log "old"
+    for column in CHANGE_LOG_COLUMNS[model]:
+        event.listen(getattr(model, column), "set", lambda target, value, oldvalue, initiator: value,
+                     active_history=True, retval=True)
+
+
+for _model in CHANGE_LOG_COLUMNS:
+    _register_change_log(_model)
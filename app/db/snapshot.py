@@ -0,0 +1,161 @@
+"""
+Read-only snapshot of the SQLite database for analytics reads.
+A background thread copies the primary database into SNAPSHOT_PATH with the
+SQLite online backup API every SNAPSHOT_REFRESH_SECONDS (skipped while the
+data version is unchanged). Tool queries read the snapshot through their own
+engine, so long aggregate scans never hold locks on the file writers use.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from app.core.config import settings
+from app.db.database import SessionLocal, engine
+
+logger = logging.getLogger(__name__)
+
+# Pages copied per backup step; writers can get the lock between steps
+BACKUP_PAGES_PER_STEP = 256
+
+
+def _read_version(connection: sqlite3.Connection) -> Optional[int]:
+    try:
+        row = connection.execute("SELECT version FROM data_version WHERE id = 1").fetchone()
+    except sqlite3.Error:
+        return None
+    return row[0] if row else None
+
+
+class Snapshot:
+    def __init__(self, primary_path: str, snapshot_path: str, refresh_seconds: float):
+        self.primary_path = primary_path
+        self.path = snapshot_path
+        self.refresh_seconds = refresh_seconds
+        self.version: Optional[int] = None
+        # Last time the snapshot was known to match the primary
+        self.synced_at: Optional[float] = None
+        self.refreshes = 0
+        self.last_copy_ms: Optional[float] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # A new connection per session (NullPool) so readers pick up the
+        # file swapped in by the latest refresh; the URL only names the file
+        self.engine = create_engine(
+            f"sqlite:///{snapshot_path}",
+            creator=lambda: sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False),
+            poolclass=NullPool
+        )
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=self.engine)
+
+    @property
+    def ready(self) -> bool:
+        return self.synced_at is not None
+
+    def age_seconds(self) -> Optional[float]:
+        if self.synced_at is None:
+            return None
+        return round(time.time() - self.synced_at, 3)
+
+    def refresh(self) -> bool:
+        """
+        Bring the snapshot up to date; returns True if data was copied
+        """
+        with self._lock:
+            source = sqlite3.connect(self.primary_path)
+            try:
+                version = _read_version(source)
+                if self.ready and version is not None and version == self.version:
+                    self.synced_at = time.time()
+                    return False
+
+                started = time.perf_counter()
+                tmp_path = f"{self.path}.tmp"
+                target = sqlite3.connect(tmp_path)
+                try:
+                    source.backup(target, pages=BACKUP_PAGES_PER_STEP)
+                    # The backup may include writes made after reading the version
+                    version = _read_version(target)
+                finally:
+                    target.close()
+                # Atomic swap: open readers keep the old file until they finish
+                os.replace(tmp_path, self.path)
+            finally:
+                source.close()
+
+            self.version = version
+            self.synced_at = time.time()
+            self.refreshes += 1
+            self.last_copy_ms = round((time.perf_counter() - started) * 1000, 2)
+            return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.refresh_seconds):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Snapshot refresh failed: {e}")
+
+    def start(self) -> None:
+        self.refresh()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="db-snapshot", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "version": self.version,
+            "age_seconds": self.age_seconds(),
+            "refreshes": self.refreshes,
+            "last_copy_ms": self.last_copy_ms
+        }
+
+
+def build_snapshot() -> Optional[Snapshot]:
+    """
+    Snapshot for the primary database, or None when disabled or not SQLite
+    """
+    if not settings.SNAPSHOT_ENABLED:
+        return None
+    if engine.dialect.name != "sqlite":
+        logger.warning("SNAPSHOT_ENABLED is only supported for SQLite, reading from the primary")
+        return None
+    return Snapshot(engine.url.database, settings.SNAPSHOT_PATH, settings.SNAPSHOT_REFRESH_SECONDS)
+
+
+snapshot = build_snapshot()
+
+
+def open_read_session():
+    """
+    Session for analytics reads: the snapshot when enabled, the primary otherwise.
+    session.info["snapshot_age_seconds"] tells how stale the data may be
+    """
+    if snapshot is not None and snapshot.ready:
+        db = snapshot.SessionLocal()
+        db.info["snapshot_age_seconds"] = snapshot.age_seconds()
+        return db
+    return SessionLocal()
+
+
+def get_read_db():
+    """
+    FastAPI dependency wrapping open_read_session
+    """
+    db = open_read_session()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -1,22 +1,72 @@
+import time
+
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse, HTMLResponse
 from pathlib import Path
-from app.db.database import Base, engine
-from app.db import models
+from app.core.config import settings
+from app.core.responses import FastJSONResponse, add_compression
+from app.core.admission import AdmissionMiddleware, admission
+from app.core.startup import startup_report, init_database
+from app.db.snapshot import snapshot
+from app.services import parallel_agg
+from app.services.warmup import warmup
+from app.services.changes import change_feed
 from app.api.chat import router as chat_router
 from app.api.data import router as data_router
 from app.api.ticket import router as ticket_router
 from app.api.tools import router as tools_router
 from app.api.health import router as health_router
+from app.api.metrics import router as metrics_router
+from app.api.stream import router as stream_router
+
+startup_report.record("import app.main", _import_started)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Schema creation and migrations run when the server starts, not at import.
+    Set DB_INIT_ON_STARTUP=false when scripts/init_db.py runs at deploy time.
+    The read snapshot (if enabled) is taken after that and refreshed in the background,
+    then the warmup scheduler precomputes the dashboard calls and the change
+    feed starts following writes for live dashboards.
+    """
+    if settings.DB_INIT_ON_STARTUP:
+        init_database()
+    if snapshot is not None:
+        startup_report.timed("db.snapshot", snapshot.start)
+    if warmup is not None:
+        warmup.start()
+    if change_feed is not None:
+        startup_report.timed("changes.load", change_feed.start)
+    yield
+    if change_feed is not None:
+        change_feed.stop()
+    if warmup is not None:
+        warmup.stop()
+    if snapshot is not None:
+        snapshot.stop()
+    parallel_agg.shutdown()
+
 
 app = FastAPI(
     title="Data Insights App",
     description="AI-powered chat application for data insights",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan
 )
 
+# Rate limiting and load shedding for chat/tool calls (added first so CORS
+# headers still wrap its 429/503 responses)
+if admission is not None:
+    app.add_middleware(AdmissionMiddleware, controller=admission)
+
 # CORS middleware for frontend
 app.add_middleware(
     CORSMiddleware,
@@ -26,8 +76,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# Compress large responses (brotli if available, gzip otherwise)
+add_compression(app, minimum_size=settings.COMPRESSION_MINIMUM_SIZE)
 
 # Include routers (before static files to avoid conflicts)
 app.include_router(health_router, prefix="/api", tags=["Health"])
@@ -35,6 +85,8 @@ app.include_router(chat_router, prefix="/api", tags=["Chat"])
 app.include_router(data_router, prefix="/api", tags=["Data"])
 app.include_router(ticket_router, prefix="/api", tags=["Tickets"])
 app.include_router(tools_router, prefix="/api", tags=["Tools"])
+app.include_router(metrics_router, prefix="/api", tags=["Metrics"])
+app.include_router(stream_router, prefix="/api", tags=["Stream"])
 
 # Serve static files (CSS, JS, images)
 static_path = Path("static")
@@ -70,10 +122,15 @@ def api_info():
         "endpoints": {
             "chat": "/api/chat",
             "data_summary": "/api/data/summary",
+            "data_rows": "/api/data/rows",
+            "stream_changes": "/api/stream/changes",
             "create_ticket": "/api/ticket/create",
             "list_tickets": "/api/ticket/list",
             "tools": "/api/tools",
+            "tools_invoke": "/api/tools/{name}",
+            "tools_batch": "/api/tools/batch",
             "health": "/api/health",
+            "metrics": "/api/metrics",
             "docs": "/docs"
         }
     }
\ No newline at end of file
@@ -1,10 +1,19 @@
 import json
 import logging
-from cerebras.cloud.sdk import Cerebras
+import time
 from app.services import tools
+from app.services.tool_router import select_tools
+from app.services.llm_gateway import LLMUnavailableError
+from app.services.llm_router import build_client, build_router, default_provider_specs
+from app.db.models import get_data_version
 from app.core.config import settings
 from app.core.safety import validate_table_name, sanitize_input
-from typing import Dict, Any, Optional
+from app.core.singleflight import flight, make_key, normalize_args
+from app.services.warmup import warmup
+from app.services.visualization import (
+    downsample_series, is_period_label, label_value_columns, row_cursors, top_n_with_other
+)
+from typing import Dict, Any, List, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -17,20 +26,27 @@ def get_cerebras_client():
         raise ValueError("CEREBRAS_API_KEY is not set in environment variables")
     
     try:
-        # Use the same pattern as Cerebras documentation
-        client = Cerebras(api_key=settings.CEREBRAS_API_KEY)
-        return client
+        return build_client(default_provider_specs(settings)[0], settings)
     except Exception as e:
         logger.error(f"Failed to initialize Cerebras client: {str(e)}")
         raise ValueError(f"Failed to initialize Cerebras client: {str(e)}")
 
 # Initialize client at module level (lazy initialization)
-# Don't initialize at startup to avoid errors if API key is missing
+# Don't initialize at startup to avoid errors if API key is missing.
+# Holds an LLMRouter over the configured providers, each behind an LLMGateway.
 client = None
 
-def format_response_for_visualization(result: Any, tool_name: str) -> Dict[str, Any]:
+AGENT_MODEL = settings.LLM_MODEL
+
+def format_response_for_visualization(result: Any, tool_name: str, columnar: bool = False) -> Dict[str, Any]:
     """
-    Format response for frontend visualization (tables, charts)
+    Format response for frontend visualization (tables, charts).
+    With columnar=True, list results and table visualizations use the
+    compact {"columns": [...], "rows": [[...]]} shape instead of repeating
+    the keys in every row.
+    Payloads stay bounded (app/services/visualization.py): long series are
+    downsampled, many categories folded into "other", and tables send one
+    page of rows plus a cursor for the rest.
     """
     response = {
         "tool_used": tool_name,
@@ -38,6 +54,14 @@ def format_response_for_visualization(result: Any, tool_name: str) -> Dict[str,
         "visualization": None
     }
     
+    # Batch lookups come keyed by user id; they are shown as one table
+    if tool_name == "get_users_by_ids" and isinstance(result, dict):
+        result = [user for user in result.values() if user is not None]
+        response["result"] = result
+    elif tool_name == "get_orders_for_users" and isinstance(result, dict):
+        result = [{"user_id": user_id, **order} for user_id, orders in result.items() for order in orders]
+        response["result"] = result
+    
     # Stat cards (single number)
     if tool_name in ["get_row_count", "get_average_order_value"]:
         if isinstance(result, dict):
@@ -50,30 +74,128 @@ def format_response_for_visualization(result: Any, tool_name: str) -> Dict[str,
             "value": value
         }
     
-    # Table data (lists)
-    elif tool_name in ["get_recent_records", "get_user_orders", "get_top_products", 
-                       "get_sales_by_product", "search_orders", "get_orders_by_date_range"]:
-        if isinstance(result, list) and len(result) > 0:
+    # Grouped query specs with one label and one number read better as a chart
+    elif tool_name == "run_query_spec" and isinstance(result, list) and label_value_columns(result):
+        label, value = label_value_columns(result)
+        # The chart covers every row; the raw rows are paged like a table
+        rows, next_cursor = row_cursors.first_page(result)
+        response["result"] = tools.to_columnar(rows) if columnar else rows
+        if all(is_period_label(row[label]) for row in result):
+            points = downsample_series(sorted(result, key=lambda row: row[label]), value)
+            response["visualization"] = {
+                "type": "chart",
+                "chart_type": "line",
+                "labels": [row[label] for row in points],
+                "values": [row[value] for row in points]
+            }
+            if len(points) < len(result):
+                response["visualization"]["downsampled_from"] = len(result)
+        else:
+            labels, values, folded = top_n_with_other(
+                [row[label] for row in result], [row[value] for row in result],
+                additive=value.startswith(("count", "sum"))
+            )
+            response["visualization"] = {
+                "type": "chart",
+                "chart_type": "bar",
+                "labels": labels,
+                "values": values
+            }
+            if folded:
+                response["visualization"]["folded_categories"] = folded
+        if next_cursor is not None:
+            response["visualization"]["total_rows"] = len(result)
+            response["visualization"]["next_cursor"] = next_cursor
+    
+    # Cohort retention: cohorts x months-since-signup heatmap
+    elif tool_name == "get_cohort_retention" and isinstance(result, dict):
+        if result.get("cohorts"):
+            response["visualization"] = {
+                "type": "heatmap",
+                "x_labels": [f"{offset}-oy" for offset in range(result["periods"])],
+                "y_labels": [f"{cohort['cohort']} ({cohort['size']})" for cohort in result["cohorts"]],
+                "values": [cohort["retention"] for cohort in result["cohorts"]],
+                "unit": "%"
+            }
+    
+    # Distributions: one histogram as a bar chart, per-group quantiles as a table
+    elif tool_name == "get_distribution" and isinstance(result, dict):
+        edges = result.get("histogram", {}).get("edges", [])
+        if result.get("groups"):
+            rows = [{key: value for key, value in group.items() if key != "histogram"} for group in result["groups"]]
             response["visualization"] = {
                 "type": "table",
+                "data": rows,
+                "columns": list(rows[0].keys())
+            }
+        elif result.get("histogram", {}).get("counts"):
+            response["visualization"] = {
+                "type": "chart",
+                "chart_type": "bar",
                 "data": result,
-                "columns": list(result[0].keys()) if result else []
+                "labels": [f"{round(low, 2):g}-{round(high, 2):g}" for low, high in zip(edges, edges[1:])],
+                "values": result["histogram"]["counts"]
             }
     
+    # Table data (lists)
+    elif tool_name in ["get_recent_records", "get_user_orders", "get_top_products", 
+                       "get_sales_by_product", "search_orders", "get_orders_by_date_range",
+                       "run_query_spec", "get_users_by_ids", "get_orders_for_users"]:
+        if isinstance(result, list) and len(result) > 0:
+            rows, next_cursor = row_cursors.first_page(result)
+            if columnar:
+                # Rows travel once, in result; the table just points at them
+                response["result"] = tools.to_columnar(rows)
+                response["visualization"] = {
+                    "type": "table",
+                    "columns": response["result"]["columns"],
+                    "columnar": True
+                }
+            else:
+                response["result"] = rows
+                response["visualization"] = {
+                    "type": "table",
+                    "data": rows,
+                    "columns": list(result[0].keys()) if result else []
+                }
+            if next_cursor is not None:
+                response["visualization"]["total_rows"] = len(result)
+                response["visualization"]["next_cursor"] = next_cursor
+    
     # Charts (dictionaries with multiple values)
     elif tool_name in ["get_sales_stats", "get_user_stats", "get_order_stats", 
                        "get_revenue_by_period", "get_user_by_id"]:
-        if isinstance(result, dict):
+        if isinstance(result, dict) and result.get("series"):
+            # Revenue over time; totals stay exact, only the plotted points are thinned
+            series = downsample_series(result["series"], "revenue")
+            if len(series) < len(result["series"]):
+                result = {**result, "series": series, "series_points": len(result["series"])}
+                response["result"] = result
+            response["visualization"] = {
+                "type": "chart",
+                "chart_type": "line",
+                "data": result,
+                "labels": [point["period"] for point in series],
+                "values": [point["revenue"] for point in series]
+            }
+            if "series_points" in result:
+                response["visualization"]["downsampled_from"] = result["series_points"]
+        elif isinstance(result, dict):
             # Filter out non-numeric values for charts
             numeric_data = {k: v for k, v in result.items() if isinstance(v, (int, float))}
             if len(numeric_data) > 0:
+                labels, values, folded = top_n_with_other(
+                    list(numeric_data.keys()), list(numeric_data.values()), additive=False
+                )
                 response["visualization"] = {
                     "type": "chart",
                     "chart_type": "bar",
                     "data": result,
-                    "labels": list(numeric_data.keys()),
-                    "values": list(numeric_data.values())
+                    "labels": labels,
+                    "values": values
                 }
+                if folded:
+                    response["visualization"]["folded_categories"] = folded
             else:
                 # If no numeric data, show as table
                 response["visualization"] = {
@@ -84,11 +206,620 @@ def format_response_for_visualization(result: Any, tool_name: str) -> Dict[str,
     
     return response
 
-def chat_with_agent(message: str, db) -> Dict[str, Any]:
+SYSTEM_PROMPT = (
+    "You are a data analytics assistant that understands and responds in Uzbek language. "
+    "You must understand questions in Uzbek (O'zbek tili) and respond in Uzbek. "
+    "You must NOT access database directly. "
+    "You must use provided tools to answer questions. "
+    "Always provide clear and helpful responses in Uzbek language based on the data you receive. "
+    "When users ask questions in Uzbek like 'Nechta foydalanuvchi bor?' or 'Oxirgi 10 ta buyurtma', "
+    "understand them correctly and use the appropriate tools. "
+    "Respond in Uzbek language, using proper Uzbek grammar and terminology."
+)
+
+# Tool definitions sent to the LLM; built once at import
+TOOLS_SCHEMA = [
+    {
+        "type": "function",
+        "function": {
+            "name": "get_row_count",
+            "description": "Get total number of rows from a table. Use this when user asks 'Nechta foydalanuvchi bor?', 'Jami nechta buyurtma?', 'Nechta savdo bor?' or similar questions about counting records.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "table": {
+                        "type": "string",
+                        "enum": ["users", "orders", "sales"],
+                        "description": "Table name: 'users' for foydalanuvchilar, 'orders' for buyurtmalar, 'sales' for savdolar"
+                    }
+                },
+                "required": ["table"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_recent_records",
+            "description": "Get most recent records from a table. Use this when user asks 'Oxirgi 10 ta buyurtma', 'So'nggi savdolar', 'Eng yangi yozuvlar' or similar questions about recent records.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "table": {
+                        "type": "string",
+                        "enum": ["orders", "sales"],
+                        "description": "Table name: 'orders' for buyurtmalar, 'sales' for savdolar"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "default": 5,
+                        "minimum": 1,
+                        "maximum": 100,
+                        "description": "Number of records to return (nechta yozuv)"
+                    }
+                },
+                "required": ["table"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_sales_stats",
+            "description": "Get aggregated sales statistics including total sales, average sales, maximum and minimum sale. Use this when user asks 'Savdo statistikasi', 'Daromad ma'lumotlari', 'Savdo ko'rsatkichlari' or similar questions about sales statistics.",
+            "parameters": {
+                "type": "object",
+                "properties": {}
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_user_stats",
+            "description": "Get user statistics including total users, users with orders, users without orders. Use this when user asks 'Foydalanuvchilar statistikasi', 'Nechta foydalanuvchi buyurtma bergan?', 'Foydalanuvchilar haqida ma'lumot' or similar questions.",
+            "parameters": {
+                "type": "object",
+                "properties": {}
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_order_stats",
+            "description": "Get order statistics including total orders, total amount, average amount, max and min amounts. Use this when user asks 'Buyurtmalar statistikasi', 'Jami buyurtma summasi', 'O'rtacha buyurtma qiymati' or similar questions.",
+            "parameters": {
+                "type": "object",
+                "properties": {}
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_top_products",
+            "description": "Get top products by order count. Use this when user asks 'Eng ko'p sotilgan mahsulotlar', 'Top 10 mahsulot', 'Qaysi mahsulot ko'p sotilgan?' or similar questions.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "limit": {
+                        "type": "integer",
+                        "default": 10,
+                        "minimum": 1,
+                        "maximum": 50,
+                        "description": "Number of top products to return"
+                    }
+                }
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_user_orders",
+            "description": "Get orders for a specific user by user ID. Use this when user asks 'Foydalanuvchi buyurtmalari', 'ID 5 foydalanuvchining buyurtmalari', 'Foydalanuvchi nechta buyurtma bergan?' or similar questions.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "user_id": {
+                        "type": "integer",
+                        "description": "User ID (foydalanuvchi ID raqami)"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "default": 10,
+                        "minimum": 1,
+                        "maximum": 100,
+                        "description": "Number of orders to return"
+                    }
+                },
+                "required": ["user_id"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_average_order_value",
+            "description": "Get average order value. Use this when user asks 'O'rtacha buyurtma qiymati', 'Bir buyurtmaning o'rtacha summasi' or similar questions.",
+            "parameters": {
+                "type": "object",
+                "properties": {}
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_sales_by_product",
+            "description": "Get sales statistics grouped by product. Use this when user asks 'Mahsulot bo'yicha savdo', 'Qaysi mahsulot ko'p daromad keltiradi?', 'Mahsulotlar daromadi' or similar questions.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "limit": {
+                        "type": "integer",
+                        "default": 10,
+                        "minimum": 1,
+                        "maximum": 50,
+                        "description": "Number of products to return"
+                    }
+                }
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "search_orders",
+            "description": "Search orders by product name or amount range. Use this when user asks 'Mahsulot bo'yicha qidirish', '100 dollardan yuqori buyurtmalar', 'Laptop buyurtmalari' or similar questions.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "product": {
+                        "type": "string",
+                        "description": "Product name to search (mahsulot nomi)"
+                    },
+                    "min_amount": {
+                        "type": "number",
+                        "description": "Minimum order amount (minimal buyurtma summasi)"
+                    },
+                    "max_amount": {
+                        "type": "number",
+                        "description": "Maximum order amount (maksimal buyurtma summasi)"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "default": 20,
+                        "minimum": 1,
+                        "maximum": 100,
+                        "description": "Number of results to return"
+                    }
+                }
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_user_by_id",
+            "description": "Get user information by user ID including name, email, order count, total spent. Use this when user asks 'Foydalanuvchi ma'lumotlari', 'ID 5 foydalanuvchi kim?', 'Foydalanuvchi necha pul sarflagan?' or similar questions.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "user_id": {
+                        "type": "integer",
+                        "description": "User ID (foydalanuvchi ID raqami)"
+                    }
+                },
+                "required": ["user_id"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_users_by_ids",
+            "description": "Get information about several users at once by their IDs, in one call. Use this instead of repeated get_user_by_id calls when user asks 'ID 3, 7 va 12 foydalanuvchilar kim?', 'Bu foydalanuvchilarni solishtir' or similar questions.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "user_ids": {
+                        "type": "array",
+                        "items": {"type": "integer"},
+                        "description": "User IDs (foydalanuvchi ID raqamlari)"
+                    }
+                },
+                "required": ["user_ids"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_orders_for_users",
+            "description": "Get the latest orders of several users at once, in one call. Use this instead of repeated get_user_orders calls when user asks 'ID 3 va 5 foydalanuvchilarning buyurtmalari' or similar questions.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "user_ids": {
+                        "type": "array",
+                        "items": {"type": "integer"},
+                        "description": "User IDs (foydalanuvchi ID raqamlari)"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "default": 10,
+                        "description": "Orders per user (har bir foydalanuvchi uchun buyurtmalar soni)"
+                    }
+                },
+                "required": ["user_ids"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_revenue_by_period",
+            "description": "Get revenue statistics for the last N days. Use this when user asks 'Oxirgi 30 kunlik daromad', 'Haftalik daromad', 'So'nggi oy statistikasi' or similar questions.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "days": {
+                        "type": "integer",
+                        "default": 30,
+                        "minimum": 1,
+                        "maximum": 365,
+                        "description": "Number of days to look back (necha kun oldin)"
+                    },
+                    "group_by": {
+                        "type": "string",
+                        "enum": ["day", "week", "month"],
+                        "description": "Also return a per-day/week/month revenue series (kunlik/haftalik/oylik dinamika)"
+                    }
+                }
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_orders_by_date_range",
+            "description": "Get orders within a specific date range. Use this when user asks '2024 yil buyurtmalari', 'Sana oralig'idagi buyurtmalar', 'Oxirgi hafta buyurtmalari' or similar questions.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "start_date": {
+                        "type": "string",
+                        "description": "Start date in ISO format (boshlanish sanasi, masalan: 2024-01-01)"
+                    },
+                    "end_date": {
+                        "type": "string",
+                        "description": "End date in ISO format (tugash sanasi, masalan: 2024-12-31)"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "default": 50,
+                        "minimum": 1,
+                        "maximum": 200,
+                        "description": "Number of orders to return"
+                    }
+                }
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_distribution",
+            "description": "Median, percentiles (p90, p99...) and histogram of order amounts or sale revenue, overall or per product / day / week / month. Use this when user asks 'Buyurtma summalarining medianasi', 'p90 qancha?', 'Daromad taqsimoti', 'Mahsulotlar bo'yicha mediana' or similar questions.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "table": {
+                        "type": "string",
+                        "enum": ["orders", "sales"],
+                        "default": "orders",
+                        "description": "orders (amount) or sales (revenue)"
+                    },
+                    "group_by": {
+                        "type": "string",
+                        "enum": ["product", "day", "week", "month"],
+                        "description": "Separate stats per product or period (mahsulot / kun / hafta / oy bo'yicha)"
+                    },
+                    "days": {
+                        "type": "integer",
+                        "minimum": 1,
+                        "maximum": 3650,
+                        "description": "Only the last N days (omit for all history)"
+                    },
+                    "quantiles": {
+                        "type": "array",
+                        "items": {"type": "number"},
+                        "description": "Quantiles between 0 and 1, e.g. [0.5, 0.9]; default 0.25, 0.5, 0.75, 0.9, 0.99"
+                    },
+                    "bins": {
+                        "type": "integer",
+                        "default": 20,
+                        "minimum": 1,
+                        "maximum": 50,
+                        "description": "Histogram bins"
+                    },
+                    "scale": {
+                        "type": "string",
+                        "enum": ["linear", "log"],
+                        "default": "linear",
+                        "description": "Equal-width or log-spaced bins"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "default": 10,
+                        "minimum": 1,
+                        "maximum": 50,
+                        "description": "Groups to report with group_by (largest products or latest periods)"
+                    }
+                }
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_cohort_retention",
+            "description": "Cohort retention: users grouped by signup month and the share of each cohort that ordered 0, 1, 2... months after joining, plus repeat buyers. Use this when user asks 'May oyida qo'shilgan foydalanuvchilarning necha foizi keyingi oylarda xarid qilgan?', 'Retention', 'Kohort tahlili', 'Qayta xarid qiluvchilar ulushi' or similar questions.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "start_month": {
+                        "type": "string",
+                        "description": "First signup month, YYYY-MM (omit for the latest cohorts)"
+                    },
+                    "cohorts": {
+                        "type": "integer",
+                        "default": 6,
+                        "minimum": 1,
+                        "maximum": 24,
+                        "description": "Number of monthly cohorts"
+                    },
+                    "periods": {
+                        "type": "integer",
+                        "default": 6,
+                        "minimum": 1,
+                        "maximum": 24,
+                        "description": "Months after signup to report"
+                    }
+                }
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "run_query_spec",
+            "description": "Ad-hoc query for questions the other tools can't answer in one call, e.g. 'Mart oyida 5-foydalanuvchining mahsulotlar bo'yicha daromadi', 'Har oy bo'yicha buyurtmalar soni'. Columns: users(id, name, created_at, order_count, total_spent, first_order_at, last_order_at), orders(id, user_id, product, amount, created_at), sales(id, order_id, revenue, created_at). Use 'table.column' for related tables (users-orders-sales are joined automatically).",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "table": {
+                        "type": "string",
+                        "enum": ["users", "orders", "sales"],
+                        "description": "Base table"
+                    },
+                    "filters": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "column": {"type": "string"},
+                                "op": {"type": "string", "enum": ["eq", "ne", "gt", "gte", "lt", "lte", "in", "contains", "between"]},
+                                "value": {"description": "Value; a list for 'in' and [low, high] for 'between'. Dates as YYYY-MM-DD"}
+                            },
+                            "required": ["column", "op", "value"]
+                        }
+                    },
+                    "group_by": {
+                        "type": "array",
+                        "items": {
+                            "description": "Column name, or {\"column\": \"created_at\", \"bucket\": \"day|week|month\"}"
+                        }
+                    },
+                    "aggregates": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "func": {"type": "string", "enum": ["count", "sum", "avg", "min", "max"]},
+                                "column": {"type": "string", "description": "Column, or '*' for count"},
+                                "as": {"type": "string", "description": "Output name"}
+                            },
+                            "required": ["func"]
+                        }
+                    },
+                    "columns": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Columns to return when there are no aggregates"
+                    },
+                    "order_by": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "column": {"type": "string", "description": "Output name or column"},
+                                "direction": {"type": "string", "enum": ["asc", "desc"]}
+                            }
+                        }
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "default": 50,
+                        "minimum": 1,
+                        "maximum": 100
+                    }
+                },
+                "required": ["table"]
+            }
+        }
+    }
+]
+
+TOOL_NAMES = [tool["function"]["name"] for tool in TOOLS_SCHEMA]
+
+def tools_for_message(message: str, session=None) -> List[Dict[str, Any]]:
+    """
+    Tool schemas to offer the LLM for this message: the few the local
+    classifier finds relevant, or the full set when it finds nothing
+    """
+    if not settings.TOOL_PRUNING_ENABLED:
+        return TOOLS_SCHEMA
+    
+    # Follow-ups ("faqat 3 tasi") often refer to the tools used just before
+    names = select_tools(
+        message,
+        settings.TOOL_PRUNING_MAX_TOOLS,
+        always_include=session.recent_tools if session else ()
+    )
+    if not names:
+        return TOOLS_SCHEMA
+    return [tool for tool in TOOLS_SCHEMA if tool["function"]["name"] in names]
+
+def api_error_response(api_error: Exception) -> Dict[str, Any]:
+    """
+    Map an LLM API exception to a user-facing error response
+    """
+    error_msg = str(api_error)
+    logger.error(f"Cerebras API error: {error_msg}")
+    
+    if isinstance(api_error, LLMUnavailableError):
+        return {
+            "error": "LLM service temporarily unavailable",
+            "message": f"{error_msg}. Please try again in a few seconds."
+        }
+    
+    # Provide more specific error messages
+    if "Connection" in error_msg or "connection" in error_msg.lower():
+        return {
+            "error": "Connection error with Cerebras API",
+            "message": "Please check your internet connection and API key. If the problem persists, the API service might be temporarily unavailable.",
+            "details": "Unable to connect to Cerebras API service"
+        }
+    elif "401" in error_msg or "Unauthorized" in error_msg or "authentication" in error_msg.lower():
+        return {
+            "error": "Authentication failed",
+            "message": "Invalid API key. Please check your CEREBRAS_API_KEY in .env file"
+        }
+    elif "429" in error_msg or "rate limit" in error_msg.lower():
+        return {
+            "error": "Rate limit exceeded",
+            "message": "Too many requests. Please wait a moment and try again."
+        }
+    else:
+        return {
+            "error": f"API error: {error_msg}",
+            "message": "An error occurred while processing your request. Please try again."
+        }
+
+def apply_safety_limits(tool_name: str, args: Dict[str, Any]) -> Optional[str]:
+    """
+    Validate and clamp tool arguments in place.
+    Returns an error message if the call must be rejected
+    """
+    if tool_name not in TOOL_NAMES:
+        return f"Tool '{tool_name}' not found"
+    
+    # Safety check - validate table name if present
+    if "table" in args:
+        if not validate_table_name(args["table"]):
+            return "Invalid table name. Allowed tables: users, orders, sales"
+    
+    # Batch lookups: a bounded list of integer ids
+    if "user_ids" in args:
+        user_ids = args["user_ids"]
+        if not isinstance(user_ids, list) or not user_ids:
+            return "user_ids must be a non-empty list of integers"
+        if any(isinstance(user_id, bool) or not isinstance(user_id, int) for user_id in user_ids):
+            return "user_ids must contain only integers"
+        if len(user_ids) > settings.TOOLS_BATCH_MAX_ITEMS:
+            return f"At most {settings.TOOLS_BATCH_MAX_ITEMS} user_ids per call"
+    
+    # Safety check - validate limit
+    if "limit" in args:
+        limit = args.get("limit", 5)
+        if limit < 1 or limit > 100:
+            args["limit"] = min(max(limit, 1), 100)
+    
+    return None
+
+def execute_tool(tool_name: str, args: Dict[str, Any], db) -> Any:
+    """
+    Run a registered tool; identical concurrent calls share one DB execution
+    and warmed calls (app.services.warmup) are served precomputed
+    """
+    tool_fn = getattr(tools, tool_name)
+    key = make_key(tool_name, args, func=tool_fn)
+    entry = warmup.serve(key, db) if warmup is not None else None
+    if entry is not None:
+        return entry.value
+    return flight.do(key, lambda: tool_fn(db, **args))
+
+def invoke_tool(tool_name: str, args: Dict[str, Any], db, columnar: bool = False) -> Dict[str, Any]:
+    """
+    Call a tool directly, without the LLM.
+    Same safety limits, result cache and visualization shaping as a tool
+    call made by chat_with_agent; raises ValueError for rejected arguments
+    """
+    started = time.perf_counter()
+    args = dict(args)
+    error = apply_safety_limits(tool_name, args)
+    if error:
+        raise ValueError(error)
+    args = normalize_args(args, getattr(tools, tool_name))
+    try:
+        result = execute_tool(tool_name, args, db)
+    except OverflowError as e:
+        # e.g. a date window reaching past year 1
+        raise ValueError(f"Argument out of range: {e}")
+    formatted_response = format_response_for_visualization(result, tool_name, columnar=columnar)
+    formatted_response["args"] = args
+    formatted_response["total_latency_ms"] = _elapsed_ms(started)
+    return formatted_response
+
+def summarize_tool_result(result: Any) -> str:
+    """
+    Compact JSON of a tool result to feed back to the LLM.
+    Long lists are cut to AGENT_TOOL_RESULT_MAX_ROWS rows and the whole
+    text to AGENT_TOOL_RESULT_MAX_CHARS, so large outputs don't blow the prompt.
+    """
+    if isinstance(result, list):
+        max_rows = settings.AGENT_TOOL_RESULT_MAX_ROWS
+        result = {
+            "row_count": len(result),
+            "rows": result[:max_rows],
+            "truncated": len(result) > max_rows
+        }
+    
+    text = json.dumps(result, default=str, ensure_ascii=False, separators=(",", ":"))
+    max_chars = settings.AGENT_TOOL_RESULT_MAX_CHARS
+    if len(text) > max_chars:
+        text = text[:max_chars] + "...(truncated)"
+    return text
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 2)
+
+def chat_with_agent(message: str, db, columnar: bool = False, session=None) -> Dict[str, Any]:
     """
     Cerebras-powered AI agent.
     LLM NEVER sees database.
     Only function calling allowed.
+    
+    Runs a bounded loop: the LLM picks tools, their (trimmed) results are
+    fed back, and the loop ends when the model answers in text or the step,
+    wall-clock or token budget runs out. Latency is reported per step.
+    
+    With a session (app.services.sessions), earlier turns are included in
+    compact form and tool calls that an earlier result already answers are
+    served from the session instead of the database.
     """
     global client
     
@@ -96,15 +827,15 @@ def chat_with_agent(message: str, db) -> Dict[str, Any]:
         # Check if client is initialized
         if client is None:
             try:
-                client = get_cerebras_client()
+                client = build_router(settings)
             except Exception as e:
                 return {
-                    "error": f"Cerebras API client is not available: {str(e)}",
-                    "message": "Please check your CEREBRAS_API_KEY in .env file"
+                    "error": f"LLM API client is not available: {str(e)}",
+                    "message": "Please check your CEREBRAS_API_KEY / LLM_PROVIDERS in .env file"
                 }
         
-        # Check API key
-        if not settings.CEREBRAS_API_KEY:
+        # Check API key (configured providers carry their own keys)
+        if not settings.LLM_PROVIDERS and not settings.CEREBRAS_API_KEY:
             return {
                 "error": "CEREBRAS_API_KEY is not configured",
                 "message": "Please set CEREBRAS_API_KEY in your .env file"
@@ -119,346 +850,156 @@ def chat_with_agent(message: str, db) -> Dict[str, Any]:
                 "message": "Please provide a valid question"
             }
         
-        tools_schema = [
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_row_count",
-                    "description": "Get total number of rows from a table. Use this when user asks 'Nechta foydalanuvchi bor?', 'Jami nechta buyurtma?', 'Nechta savdo bor?' or similar questions about counting records.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "table": {
-                                "type": "string",
-                                "enum": ["users", "orders", "sales"],
-                                "description": "Table name: 'users' for foydalanuvchilar, 'orders' for buyurtmalar, 'sales' for savdolar"
-                            }
-                        },
-                        "required": ["table"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_recent_records",
-                    "description": "Get most recent records from a table. Use this when user asks 'Oxirgi 10 ta buyurtma', 'So'nggi savdolar', 'Eng yangi yozuvlar' or similar questions about recent records.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "table": {
-                                "type": "string",
-                                "enum": ["orders", "sales"],
-                                "description": "Table name: 'orders' for buyurtmalar, 'sales' for savdolar"
-                            },
-                            "limit": {
-                                "type": "integer",
-                                "default": 5,
-                                "minimum": 1,
-                                "maximum": 100,
-                                "description": "Number of records to return (nechta yozuv)"
-                            }
-                        },
-                        "required": ["table"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_sales_stats",
-                    "description": "Get aggregated sales statistics including total sales, average sales, maximum and minimum sale. Use this when user asks 'Savdo statistikasi', 'Daromad ma'lumotlari', 'Savdo ko'rsatkichlari' or similar questions about sales statistics.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {}
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_user_stats",
-                    "description": "Get user statistics including total users, users with orders, users without orders. Use this when user asks 'Foydalanuvchilar statistikasi', 'Nechta foydalanuvchi buyurtma bergan?', 'Foydalanuvchilar haqida ma'lumot' or similar questions.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {}
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_order_stats",
-                    "description": "Get order statistics including total orders, total amount, average amount, max and min amounts. Use this when user asks 'Buyurtmalar statistikasi', 'Jami buyurtma summasi', 'O'rtacha buyurtma qiymati' or similar questions.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {}
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_top_products",
-                    "description": "Get top products by order count. Use this when user asks 'Eng ko'p sotilgan mahsulotlar', 'Top 10 mahsulot', 'Qaysi mahsulot ko'p sotilgan?' or similar questions.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "limit": {
-                                "type": "integer",
-                                "default": 10,
-                                "minimum": 1,
-                                "maximum": 50,
-                                "description": "Number of top products to return"
-                            }
-                        }
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_user_orders",
-                    "description": "Get orders for a specific user by user ID. Use this when user asks 'Foydalanuvchi buyurtmalari', 'ID 5 foydalanuvchining buyurtmalari', 'Foydalanuvchi nechta buyurtma bergan?' or similar questions.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "user_id": {
-                                "type": "integer",
-                                "description": "User ID (foydalanuvchi ID raqami)"
-                            },
-                            "limit": {
-                                "type": "integer",
-                                "default": 10,
-                                "minimum": 1,
-                                "maximum": 100,
-                                "description": "Number of orders to return"
-                            }
-                        },
-                        "required": ["user_id"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_average_order_value",
-                    "description": "Get average order value. Use this when user asks 'O'rtacha buyurtma qiymati', 'Bir buyurtmaning o'rtacha summasi' or similar questions.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {}
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_sales_by_product",
-                    "description": "Get sales statistics grouped by product. Use this when user asks 'Mahsulot bo'yicha savdo', 'Qaysi mahsulot ko'p daromad keltiradi?', 'Mahsulotlar daromadi' or similar questions.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "limit": {
-                                "type": "integer",
-                                "default": 10,
-                                "minimum": 1,
-                                "maximum": 50,
-                                "description": "Number of products to return"
-                            }
-                        }
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "search_orders",
-                    "description": "Search orders by product name or amount range. Use this when user asks 'Mahsulot bo'yicha qidirish', '100 dollardan yuqori buyurtmalar', 'Laptop buyurtmalari' or similar questions.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "product": {
-                                "type": "string",
-                                "description": "Product name to search (mahsulot nomi)"
-                            },
-                            "min_amount": {
-                                "type": "number",
-                                "description": "Minimum order amount (minimal buyurtma summasi)"
-                            },
-                            "max_amount": {
-                                "type": "number",
-                                "description": "Maximum order amount (maksimal buyurtma summasi)"
-                            },
-                            "limit": {
-                                "type": "integer",
-                                "default": 20,
-                                "minimum": 1,
-                                "maximum": 100,
-                                "description": "Number of results to return"
-                            }
-                        }
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_user_by_id",
-                    "description": "Get user information by user ID including name, email, order count, total spent. Use this when user asks 'Foydalanuvchi ma'lumotlari', 'ID 5 foydalanuvchi kim?', 'Foydalanuvchi necha pul sarflagan?' or similar questions.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "user_id": {
-                                "type": "integer",
-                                "description": "User ID (foydalanuvchi ID raqami)"
-                            }
-                        },
-                        "required": ["user_id"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_revenue_by_period",
-                    "description": "Get revenue statistics for the last N days. Use this when user asks 'Oxirgi 30 kunlik daromad', 'Haftalik daromad', 'So'nggi oy statistikasi' or similar questions.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "days": {
-                                "type": "integer",
-                                "default": 30,
-                                "minimum": 1,
-                                "maximum": 365,
-                                "description": "Number of days to look back (necha kun oldin)"
-                            }
-                        }
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_orders_by_date_range",
-                    "description": "Get orders within a specific date range. Use this when user asks '2024 yil buyurtmalari', 'Sana oralig'idagi buyurtmalar', 'Oxirgi hafta buyurtmalari' or similar questions.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "start_date": {
-                                "type": "string",
-                                "description": "Start date in ISO format (boshlanish sanasi, masalan: 2024-01-01)"
-                            },
-                            "end_date": {
-                                "type": "string",
-                                "description": "End date in ISO format (tugash sanasi, masalan: 2024-12-31)"
-                            },
-                            "limit": {
-                                "type": "integer",
-                                "default": 50,
-                                "minimum": 1,
-                                "maximum": 200,
-                                "description": "Number of orders to return"
-                            }
-                        }
-                    }
-                }
-            }
+        started = time.perf_counter()
+        # System prompt and tool schema stay byte-identical across requests
+        # so the provider's prompt prefix cache can be reused
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            *(session.history_messages() if session else []),
+            {"role": "user", "content": sanitized_message}
         ]
-
-        try:
-            response = client.chat.completions.create(
-                model="llama-3.3-70b",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "You are a data analytics assistant that understands and responds in Uzbek language. "
-                            "You must understand questions in Uzbek (O'zbek tili) and respond in Uzbek. "
-                            "You must NOT access database directly. "
-                            "You must use provided tools to answer questions. "
-                            "Always provide clear and helpful responses in Uzbek language based on the data you receive. "
-                            "When users ask questions in Uzbek like 'Nechta foydalanuvchi bor?' or 'Oxirgi 10 ta buyurtma', "
-                            "understand them correctly and use the appropriate tools. "
-                            "Respond in Uzbek language, using proper Uzbek grammar and terminology."
-                        )
-                    },
-                    {"role": "user", "content": sanitized_message}
-                ],
-                tools=tools_schema,
-                tool_choice="auto"
-            )
-        except Exception as api_error:
-            error_msg = str(api_error)
-            logger.error(f"Cerebras API error: {error_msg}")
+        turn_tools = []  # (tool_name, normalized args, result) for the session
+        offered = tools_for_message(sanitized_message, session)
+        if session is not None:
+            session.sync_data_version(get_data_version(db))
+        steps = []
+        tokens_used = 0
+        answer = None
+        last_tool = None  # (tool_name, result) of the last successful tool call
+        last_error = None
+        stop_reason = "max_steps"
+        
+        for step_number in range(1, settings.AGENT_MAX_STEPS + 1):
+            if time.perf_counter() - started > settings.AGENT_TIME_BUDGET_SECONDS:
+                stop_reason = "time_budget"
+                break
+            if tokens_used >= settings.AGENT_TOKEN_BUDGET:
+                stop_reason = "token_budget"
+                break
             
-            # Provide more specific error messages
-            if "Connection" in error_msg or "connection" in error_msg.lower():
-                return {
-                    "error": "Connection error with Cerebras API",
-                    "message": "Please check your internet connection and API key. If the problem persists, the API service might be temporarily unavailable.",
-                    "details": "Unable to connect to Cerebras API service"
-                }
-            elif "401" in error_msg or "Unauthorized" in error_msg or "authentication" in error_msg.lower():
-                return {
-                    "error": "Authentication failed",
-                    "message": "Invalid API key. Please check your CEREBRAS_API_KEY in .env file"
-                }
-            elif "429" in error_msg or "rate limit" in error_msg.lower():
-                return {
-                    "error": "Rate limit exceeded",
-                    "message": "Too many requests. Please wait a moment and try again."
-                }
-            else:
-                return {
-                    "error": f"API error: {error_msg}",
-                    "message": "An error occurred while processing your request. Please try again."
-                }
-
-        msg = response.choices[0].message
-
-        # Tool chaqirilsa
-        if msg.tool_calls:
-            call = msg.tool_calls[0]
-            tool_name = call.function.name
-            args = json.loads(call.function.arguments)
+            llm_started = time.perf_counter()
+            # Picking tools can go to a cheap fast model; once tool results
+            # are in, the explanation goes to the providers serving "answer"
+            role = "answer" if last_tool is not None else "tools"
+            try:
+                response, provider = client.create(
+                    role=role,
+                    messages=messages,
+                    tools=offered,
+                    tool_choice="auto",
+                    # Retries and hedges must fit in what is left of the request budget
+                    timeout=max(settings.AGENT_TIME_BUDGET_SECONDS - (llm_started - started), 1.0)
+                )
+            except Exception as api_error:
+                if last_tool is None:
+                    return api_error_response(api_error)
+                # Keep what the earlier steps produced
+                last_error = api_error_response(api_error)["error"]
+                stop_reason = "api_error"
+                break
+            
+            step = {
+                "step": step_number,
+                "llm_ms": _elapsed_ms(llm_started),
+                "provider": provider,
+                "tools_offered": len(offered),
+                "tools": []
+            }
+            usage = getattr(response, "usage", None)
+            step["tokens"] = getattr(usage, "total_tokens", 0) or 0
+            tokens_used += step["tokens"]
+            steps.append(step)
+            
+            msg = response.choices[0].message
+            
+            # Text answer - the model is done
+            if not msg.tool_calls:
+                answer = msg.content
+                stop_reason = "answer"
+                step["elapsed_ms"] = _elapsed_ms(started)
+                break
+            
+            # The classifier left out a tool the model wants: retry with all tools
+            offered_names = {tool["function"]["name"] for tool in offered}
+            if offered is not TOOLS_SCHEMA and any(call.function.name not in offered_names for call in msg.tool_calls):
+                offered = TOOLS_SCHEMA
+                step["fallback_to_full_schema"] = True
+                step["elapsed_ms"] = _elapsed_ms(started)
+                continue
             
-            # Safety check - validate table name if present
-            if "table" in args:
-                if not validate_table_name(args["table"]):
-                    return {
-                        "error": "Invalid table name. Allowed tables: users, orders, sales",
-                        "tool_used": tool_name
+            # Tool chaqirilsa
+            messages.append({
+                "role": "assistant",
+                "content": msg.content or "",
+                "tool_calls": [
+                    {
+                        "id": call.id,
+                        "type": "function",
+                        "function": {"name": call.function.name, "arguments": call.function.arguments}
                     }
+                    for call in msg.tool_calls
+                ]
+            })
+            if msg.content:
+                answer = msg.content
             
-            # Safety check - validate limit
-            if "limit" in args:
-                limit = args.get("limit", 5)
-                if limit < 1 or limit > 100:
-                    args["limit"] = min(max(limit, 1), 100)
+            for call in msg.tool_calls:
+                tool_name = call.function.name
+                tool_started = time.perf_counter()
+                tool_step = {"name": tool_name}
+                try:
+                    args = json.loads(call.function.arguments or "{}")
+                    error = apply_safety_limits(tool_name, args)
+                    tool_step["args"] = args
+                    if error:
+                        raise ValueError(error)
+                    args = normalize_args(args, getattr(tools, tool_name))
+                    result = session.find_result(tool_name, args) if session else None
+                    if result is not None:
+                        tool_step["reused"] = True
+                    else:
+                        result = execute_tool(tool_name, args, db)
+                    last_tool = (tool_name, result)
+                    turn_tools.append((tool_name, args, result))
+                    content = summarize_tool_result(result)
+                except Exception as e:
+                    last_error = f"Error executing tool: {str(e)}"
+                    tool_step["error"] = str(e)
+                    content = json.dumps({"error": str(e)})
+                tool_step["ms"] = _elapsed_ms(tool_started)
+                step["tools"].append(tool_step)
+                messages.append({"role": "tool", "tool_call_id": call.id, "content": content})
             
-            try:
-                result = getattr(tools, tool_name)(db, **args)
-                formatted_response = format_response_for_visualization(result, tool_name)
-                
-                # Add AI explanation if available
-                if msg.content:
-                    formatted_response["explanation"] = msg.content
-                
-                return formatted_response
-            except AttributeError:
-                return {
-                    "error": f"Tool '{tool_name}' not found",
-                    "available_tools": ["get_row_count", "get_recent_records", "get_sales_stats"]
-                }
-            except Exception as e:
-                return {
-                    "error": f"Error executing tool: {str(e)}",
-                    "tool_used": tool_name
-                }
-
+            step["elapsed_ms"] = _elapsed_ms(started)
+        
+        report = {
+            "steps": steps,
+            "stop_reason": stop_reason,
+            "tokens_used": tokens_used,
+            "total_latency_ms": _elapsed_ms(started)
+        }
+        
+        if session is not None:
+            session.add_turn(sanitized_message, answer, turn_tools)
+            report["session_id"] = session.id
+        
+        if last_tool is not None:
+            tool_name, result = last_tool
+            formatted_response = format_response_for_visualization(result, tool_name, columnar=columnar)
+            
+            # Add AI explanation if available
+            if answer:
+                formatted_response["explanation"] = answer
+            formatted_response.update(report)
+            return formatted_response
+        
+        if answer is None and last_error:
+            return {"error": last_error, **report}
+        
         return {
-            "answer": msg.content,
-            "tool_used": None
+            "answer": answer,
+            "tool_used": None,
+            **report
         }
     
     except ValueError as ve:
@@ -0,0 +1,98 @@
+"""
+Batch evaluation of a tool over many argument sets.
+Per-user tools have set-based variants (get_users_by_ids,
+get_orders_for_users), so N lookups become one IN / window query instead of
+N round trips. Other tools run once per distinct argument set. Results come
+back in input order, each next to the arguments it answers.
+"""
+from typing import Any, Callable, Dict, List
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.singleflight import make_key, normalize_args
+from app.services import tools
+from app.services.agent import TOOL_NAMES, apply_safety_limits, execute_tool
+from app.services.tool_args import validate_args
+
+
+class BatchError(ValueError):
+    pass
+
+
+def _users_by_id(db: Session, arg_sets: List[Dict[str, Any]]) -> List[Any]:
+    users = tools.get_users_by_ids(db, [args["user_id"] for args in arg_sets])
+    return [users[args["user_id"]] for args in arg_sets]
+
+
+def _orders_by_user(db: Session, arg_sets: List[Dict[str, Any]]) -> List[Any]:
+    # One query at the largest limit; smaller limits are a prefix of it
+    limit = max(args["limit"] for args in arg_sets)
+    orders = tools.get_orders_for_users(db, [args["user_id"] for args in arg_sets], limit=limit)
+    return [orders[args["user_id"]][:args["limit"]] for args in arg_sets]
+
+
+# tool name -> handler answering all argument sets with one query
+BATCH_HANDLERS: Dict[str, Callable[[Session, List[Dict[str, Any]]], List[Any]]] = {
+    "get_user_by_id": _users_by_id,
+    "get_user_orders": _orders_by_user,
+}
+
+
+def run_batch(db: Session, tool_name: str, arg_sets: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Evaluate tool_name for every argument set.
+    Invalid sets get an "error" entry instead of failing the whole batch.
+    """
+    if not arg_sets:
+        raise BatchError("args must be a non-empty list of argument objects")
+    if len(arg_sets) > settings.TOOLS_BATCH_MAX_ITEMS:
+        raise BatchError(f"At most {settings.TOOLS_BATCH_MAX_ITEMS} argument sets per batch")
+    if tool_name not in TOOL_NAMES:
+        raise BatchError(f"Tool '{tool_name}' not found")
+    tool_fn = getattr(tools, tool_name)
+
+    items: List[Dict[str, Any]] = []
+    valid: List[Dict[str, Any]] = []
+    for args in arg_sets:
+        item = {"args": args}
+        items.append(item)
+        try:
+            if not isinstance(args, dict):
+                raise ValueError("Each argument set must be an object")
+            # Same checks as POST /api/tools/{name}
+            args = validate_args(tool_name, args)
+            error = apply_safety_limits(tool_name, args)
+            if error:
+                raise ValueError(error)
+            item["normalized"] = normalize_args(args, tool_fn)
+            valid.append(item)
+        except (TypeError, ValueError) as e:
+            item["error"] = str(e)
+
+    handler = BATCH_HANDLERS.get(tool_name)
+    if valid and handler is not None:
+        results = handler(db, [item["normalized"] for item in valid])
+        for item, result in zip(valid, results):
+            item["result"] = result
+        queries = 1
+    else:
+        # Identical argument sets run once
+        distinct: Dict[Any, Any] = {}
+        for item in valid:
+            key = make_key(tool_name, item["normalized"])
+            try:
+                if key not in distinct:
+                    distinct[key] = execute_tool(tool_name, item["normalized"], db)
+                item["result"] = distinct[key]
+            except Exception as e:
+                item["error"] = str(e)
+        queries = len(distinct)
+
+    for item in items:
+        item.pop("normalized", None)
+    return {
+        "tool": tool_name,
+        "batched": handler is not None,
+        "calls": queries,
+        "count": len(items),
+        "results": items
+    }
@@ -0,0 +1,364 @@
+"""
+Change feed for live dashboards.
+Writes to users/orders/sales/support_tickets append a row to change_log in
+their own transaction (app/db/models.py). A background thread reads the log
+in id order every CHANGES_POLL_SECONDS and keeps the data summary up to date
+from those rows alone, so a refresh costs O(changes) instead of re-running
+the aggregates over whole tables. Each poll becomes at most one "summary"
+event (delta plus the new totals) and one "ticket" event per ticket change,
+buffered in memory for the SSE endpoint (/api/stream/changes).
+
+Writes that skip the ORM events (bulk query().delete(), raw SQL, imports)
+never reach the log, so every CHANGES_VERIFY_SECONDS the totals are checked
+against a full read and re-baselined when they disagree; a log whose ids went
+backwards (truncated, ids reused) is re-baselined on the next poll.
+
+Ids are read in order, which relies on the log committing in id order. That
+holds for SQLite's single writer but not for PostgreSQL, where concurrent
+transactions commit sequence ids out of order, so the feed is SQLite-only.
+"""
+import json
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, NamedTuple, Optional, Tuple
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db import models
+from app.db.database import SessionLocal, engine
+from app.services.summary import shape_summary
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeEvent(NamedTuple):
+    # Last change_log id the event covers (the SSE event id)
+    id: int
+    name: str
+    data: Dict[str, Any]
+
+
+class SummaryState:
+    """
+    Running counts and sums behind the data summary
+    """
+    def __init__(self, users: int = 0, orders: int = 0, order_amount_sum: float = 0.0, order_amounts: int = 0,
+                 sales: int = 0, revenue_sum: float = 0.0, revenues: int = 0):
+        self.users = users
+        self.orders = orders
+        self.order_amount_sum = order_amount_sum
+        # Non-null amounts/revenues: the denominators of AVG()
+        self.order_amounts = order_amounts
+        self.sales = sales
+        self.revenue_sum = revenue_sum
+        self.revenues = revenues
+
+    @classmethod
+    def load(cls, db: Session) -> Tuple[int, "SummaryState"]:
+        """
+        Full aggregates and the last change_log id, read in one statement so
+        they describe the same moment
+        """
+        row = db.execute(select(
+            select(func.coalesce(func.max(models.ChangeLog.id), 0)).scalar_subquery(),
+            select(func.count(models.User.id)).scalar_subquery(),
+            select(func.count(models.Order.id)).scalar_subquery(),
+            select(func.coalesce(func.sum(models.Order.amount), 0)).scalar_subquery(),
+            select(func.count(models.Order.amount)).scalar_subquery(),
+            select(func.count(models.Sale.id)).scalar_subquery(),
+            select(func.coalesce(func.sum(models.Sale.revenue), 0)).scalar_subquery(),
+            select(func.count(models.Sale.revenue)).scalar_subquery(),
+        )).one()
+        last_id, *totals = row
+        return last_id, cls(*totals)
+
+    def matches(self, other: "SummaryState") -> bool:
+        """
+        Same counts, and sums equal up to float rounding
+        """
+        def close(a: float, b: float) -> bool:
+            return abs(a - b) <= 1e-6 * max(1.0, abs(a), abs(b))
+        return (
+            (self.users, self.orders, self.order_amounts, self.sales, self.revenues)
+            == (other.users, other.orders, other.order_amounts, other.sales, other.revenues)
+            and close(self.order_amount_sum, other.order_amount_sum)
+            and close(self.revenue_sum, other.revenue_sum)
+        )
+
+    def _add(self, table: str, payload: Dict[str, Any], sign: int, delta: Dict[str, float]) -> None:
+        if table == "users":
+            self.users += sign
+            delta["total_users"] = delta.get("total_users", 0) + sign
+        elif table == "orders":
+            self.orders += sign
+            delta["total_orders"] = delta.get("total_orders", 0) + sign
+            if payload.get("amount") is not None:
+                self.order_amount_sum += sign * payload["amount"]
+                self.order_amounts += sign
+        elif table == "sales":
+            self.sales += sign
+            delta["total_sales"] = delta.get("total_sales", 0) + sign
+            if payload.get("revenue") is not None:
+                self.revenue_sum += sign * payload["revenue"]
+                self.revenues += sign
+                delta["total_revenue"] = delta.get("total_revenue", 0) + sign * payload["revenue"]
+
+    def apply(self, table: str, op: str, payload: Dict[str, Any], delta: Dict[str, float]) -> None:
+        """
+        Fold one logged change into the totals, accumulating the summary delta
+        """
+        if op == "insert":
+            self._add(table, payload, 1, delta)
+        elif op == "delete":
+            self._add(table, payload, -1, delta)
+        elif op == "update":
+            # Value changes only: take the old row out and put the new one in
+            old = {**payload, **payload.get("old", {})}
+            self._add(table, old, -1, delta)
+            self._add(table, payload, 1, delta)
+
+    def summary(self) -> Dict[str, Any]:
+        return shape_summary(
+            self.users,
+            self.orders,
+            self.order_amount_sum / self.order_amounts if self.order_amounts else 0,
+            self.sales,
+            self.revenue_sum,
+            self.revenue_sum / self.revenues if self.revenues else 0
+        )
+
+
+class ChangeFeed:
+    def __init__(self, session_factory: Callable[[], Session], poll_seconds: float, batch_size: int,
+                 buffer_size: int, retention_rows: int, max_subscribers: int, verify_seconds: float):
+        self.session_factory = session_factory
+        self.poll_seconds = poll_seconds
+        self.verify_seconds = verify_seconds
+        self.batch_size = batch_size
+        self.retention_rows = retention_rows
+        self.max_subscribers = max_subscribers
+        self.state: Optional[SummaryState] = None
+        self.last_id = 0
+        # Bumped on every (re)load; connected clients resync when it changes
+        self.generation = 0
+        self._events: Deque[ChangeEvent] = deque(maxlen=buffer_size)
+        # Every change after this id is covered by a buffered event
+        self._covered_from = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.subscribers = 0
+        self.polls = 0
+        self.changes = 0
+        self.events = 0
+        self.resyncs = 0
+        self.rebaselines = 0
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+
+    def load(self) -> None:
+        """
+        Baseline summary from a full read; later changes are applied incrementally
+        """
+        with self.session_factory() as db:
+            last_id, state = SummaryState.load(db)
+        self._set_baseline(last_id, state)
+
+    def _set_baseline(self, last_id: int, state: SummaryState) -> None:
+        with self._lock:
+            self.state = state
+            self.last_id = last_id
+            self._covered_from = last_id
+            self._events.clear()
+            self.generation += 1
+
+    def poll(self, up_to: Optional[int] = None) -> int:
+        """
+        Apply change_log rows written since the last poll (up to id `up_to`
+        when given); returns how many
+        """
+        query = select(
+            models.ChangeLog.id, models.ChangeLog.table_name, models.ChangeLog.op,
+            models.ChangeLog.row_id, models.ChangeLog.payload
+        ).where(models.ChangeLog.id > self.last_id)
+        if up_to is not None:
+            query = query.where(models.ChangeLog.id <= up_to)
+        with self.session_factory() as db:
+            rows = db.execute(query.order_by(models.ChangeLog.id).limit(self.batch_size)).all()
+            # Nothing new: make sure the log wasn't truncated under us
+            # (SQLite hands out ids from max(id) + 1 again)
+            newest = None if rows else db.execute(select(func.coalesce(func.max(models.ChangeLog.id), 0))).scalar()
+        self.polls += 1
+        if not rows:
+            if newest < self.last_id:
+                logger.warning(f"change_log ids went back from {self.last_id} to {newest}, reloading the baseline")
+                self.rebaselines += 1
+                self.load()
+            return 0
+
+        with self._lock:
+            delta: Dict[str, float] = {}
+            summary_changed = False
+            for change_id, table, op, row_id, payload in rows:
+                payload = json.loads(payload or "{}")
+                if table == "support_tickets":
+                    self._append(ChangeEvent(change_id, "ticket", {"op": op, "id": row_id, **payload}))
+                else:
+                    self.state.apply(table, op, payload, delta)
+                    summary_changed = True
+            self.last_id = rows[-1][0]
+            if summary_changed:
+                self._append(ChangeEvent(self.last_id, "summary", {
+                    "change_id": self.last_id,
+                    "delta": {name: round(value, 2) for name, value in delta.items() if value},
+                    **self.state.summary()
+                }))
+            self.changes += len(rows)
+        return len(rows)
+
+    def _append(self, event: ChangeEvent) -> None:
+        if len(self._events) == self._events.maxlen:
+            self._covered_from = self._events[0].id
+        self._events.append(event)
+        self.events += 1
+
+    def events_since(self, since: Optional[int]) -> Optional[List[ChangeEvent]]:
+        """
+        Buffered events after `since`, or None when the client has to resync
+        from a snapshot (first connect, or it fell behind the buffer)
+        """
+        with self._lock:
+            if since is None or since < self._covered_from or since > self.last_id:
+                return None
+            return [event for event in self._events if event.id > since]
+
+    def snapshot(self) -> ChangeEvent:
+        """
+        Current totals as a summary event, for new or resyncing clients
+        """
+        with self._lock:
+            self.resyncs += 1
+            return ChangeEvent(self.last_id, "summary", {
+                "change_id": self.last_id,
+                "resync": True,
+                "delta": {},
+                **self.state.summary()
+            })
+
+    def verify(self) -> bool:
+        """
+        Check the running totals against a full read, re-baselining when they
+        disagree (writes that bypassed the ORM events). Returns True if reloaded
+        """
+        with self.session_factory() as db:
+            last_id, fresh = SummaryState.load(db)
+        if last_id >= self.last_id:
+            # Bring the running totals to the same point in the log first
+            while self.last_id < last_id and self.poll(up_to=last_id):
+                pass
+            if self.last_id == last_id and fresh.matches(self.state):
+                return False
+        logger.warning(f"Live summary drifted from the tables at change {last_id}, reloading the baseline")
+        self.rebaselines += 1
+        self._set_baseline(last_id, fresh)
+        return True
+
+    def prune(self) -> int:
+        """
+        Drop change_log rows beyond the retention window
+        (the newest row always stays, so ids are never handed out again)
+        """
+        with self.session_factory() as db:
+            deleted = db.execute(
+                delete(models.ChangeLog).where(models.ChangeLog.id <= self.last_id - max(self.retention_rows, 1))
+            ).rowcount
+            db.commit()
+        return deleted
+
+    def _run(self) -> None:
+        prune_every = max(1, int(60 / self.poll_seconds)) if self.poll_seconds > 0 else 1
+        verified_at = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                if not self.ready:
+                    self.load()
+                # Keep reading while a backlog is larger than one batch
+                while self.poll() == self.batch_size:
+                    pass
+                if self.verify_seconds > 0 and time.monotonic() - verified_at >= self.verify_seconds:
+                    verified_at = time.monotonic()
+                    self.verify()
+                if self.polls % prune_every == 0:
+                    self.prune()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Change feed poll failed: {e}")
+            self._stop.wait(self.poll_seconds)
+
+    def start(self) -> None:
+        """
+        Load the baseline and start polling in the background
+        (the poller retries the load if it fails here)
+        """
+        try:
+            self.load()
+        except Exception as e:
+            self.last_error = str(e)
+            logger.error(f"Change feed baseline failed: {e}")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="changes", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state is not None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "last_change_id": self.last_id,
+            "subscribers": self.subscribers,
+            "rejected_subscribers": self.rejected,
+            "polls": self.polls,
+            "changes_applied": self.changes,
+            "events": self.events,
+            "buffered_events": len(self._events),
+            "resyncs": self.resyncs,
+            "rebaselines": self.rebaselines,
+            "last_error": self.last_error
+        }
+
+
+def build_change_feed() -> Optional[ChangeFeed]:
+    """
+    None when CHANGES_ENABLED is off, or the database is not SQLite (the
+    poller needs ids to commit in order, see the module docstring)
+    """
+    if not settings.CHANGES_ENABLED:
+        return None
+    if engine.dialect.name != "sqlite":
+        logger.warning(
+            f"Change feed disabled: {engine.dialect.name} can commit change_log ids out of order; "
+            "dashboards fall back to GET /api/data/summary"
+        )
+        return None
+    return ChangeFeed(
+        SessionLocal,
+        settings.CHANGES_POLL_SECONDS,
+        settings.CHANGES_BATCH_SIZE,
+        settings.CHANGES_BUFFER_SIZE,
+        settings.CHANGES_RETENTION_ROWS,
+        settings.CHANGES_MAX_SUBSCRIBERS,
+        settings.CHANGES_VERIFY_SECONDS
+    )
+
+
+change_feed = build_change_feed()
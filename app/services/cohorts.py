@@ -0,0 +1,164 @@
+"""
+Cohort retention from the user activity matrix.
+user_activity holds one bitmask per user: bit i is set when the user ordered
+i months after the month they joined (maintained on user/order inserts in
+app/db/models.py). Retention for a range of cohorts is one grouped scan of
+that table, counting set bits per month offset with bit operations in SQL,
+instead of joining users with every order.
+"""
+from datetime import datetime
+from typing import Any, Dict, Optional
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+from app.db import models
+from app.db.dialect import STREAM_BATCH_SIZE, date_bucket, dialect_name
+
+MAX_COHORTS = 24
+MAX_PERIODS = 24
+
+
+class CohortError(ValueError):
+    pass
+
+
+def month_label(index: int) -> str:
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def parse_month(value: str) -> int:
+    try:
+        return models.month_index(datetime.strptime(value, "%Y-%m"))
+    except (TypeError, ValueError):
+        raise CohortError(f"Invalid month '{value}', expected YYYY-MM")
+
+
+def expected_activity(db: Session) -> Dict[int, Dict[str, int]]:
+    """
+    Activity rows recomputed from users and orders
+    """
+    expected = {
+        user.id: {"cohort_month": models.month_index(user.created_at or datetime.utcnow()), "months": 0}
+        for user in db.query(models.User.id, models.User.created_at).yield_per(STREAM_BATCH_SIZE)
+    }
+    # One row per user and month ordered in, not per order
+    month = date_bucket(models.Order.created_at, "month", dialect_name(db)).label("month")
+    user_months = db.query(models.Order.user_id, month).filter(
+        models.Order.user_id.isnot(None), models.Order.created_at.isnot(None)
+    ).group_by(models.Order.user_id, month).yield_per(STREAM_BATCH_SIZE)
+    for row in user_months:
+        activity = expected.get(row.user_id)
+        if activity is None:
+            continue
+        offset = models.month_index(datetime.strptime(row.month, "%Y-%m-%d")) - activity["cohort_month"]
+        if 0 <= offset < models.ACTIVITY_MONTHS:
+            activity["months"] |= 1 << offset
+    return expected
+
+
+def reconcile_user_activity(db: Session) -> Dict[str, int]:
+    """
+    Rebuild missing or drifted activity rows (order deletes, bulk imports and
+    edits that bypass the ORM). Returns the number of users checked and repaired
+    """
+    expected = expected_activity(db)
+    stored = {
+        row.user_id: row
+        for row in db.query(
+            models.UserActivity.user_id, models.UserActivity.cohort_month, models.UserActivity.months
+        ).yield_per(STREAM_BATCH_SIZE)
+    }
+
+    missing = [{"user_id": user_id, **row} for user_id, row in expected.items() if user_id not in stored]
+    drifted = [
+        {"user_id": user_id, **row}
+        for user_id, row in expected.items()
+        if user_id in stored and (stored[user_id].cohort_month, stored[user_id].months) != (row["cohort_month"], row["months"])
+    ]
+    orphans = [user_id for user_id in stored if user_id not in expected]
+
+    if missing:
+        db.execute(insert(models.UserActivity), missing)
+    if drifted:
+        db.execute(update(models.UserActivity), drifted)
+    if orphans:
+        db.execute(delete(models.UserActivity).where(models.UserActivity.user_id.in_(orphans)))
+    if missing or drifted or orphans:
+        db.commit()
+
+    return {
+        "checked": len(expected),
+        "repaired": len(missing) + len(drifted) + len(orphans)
+    }
+
+
+def activity_backfill_needed(db: Session) -> bool:
+    """
+    Users exist but the activity matrix is empty (table just created)
+    """
+    return (
+        db.query(models.UserActivity.user_id).first() is None
+        and db.query(models.User.id).first() is not None
+    )
+
+
+def get_cohort_retention(db: Session, start_month: Optional[str] = None, cohorts: int = 6,
+                         periods: int = 6) -> Dict[str, Any]:
+    """
+    For each signup month from start_month (default: the latest `cohorts`
+    months), the share of its users who ordered 0, 1, ... periods-1 months
+    after joining, plus repeat buyers (2+ orders) and users active in 2+ months.
+    Offsets that are still in the future are None.
+    """
+    if not 1 <= cohorts <= MAX_COHORTS:
+        raise CohortError(f"cohorts must be between 1 and {MAX_COHORTS}")
+    if not 1 <= periods <= MAX_PERIODS:
+        raise CohortError(f"periods must be between 1 and {MAX_PERIODS}")
+
+    current = models.month_index(datetime.utcnow())
+    if start_month:
+        first = parse_month(start_month)
+    else:
+        latest = db.query(func.max(models.UserActivity.cohort_month)).scalar()
+        first = (latest if latest is not None else current) - cohorts + 1
+    last = first + cohorts - 1
+
+    activity = models.UserActivity
+    months = activity.months
+    rows = db.execute(
+        select(
+            activity.cohort_month,
+            func.count().label("size"),
+            # More than one bit set: active in at least two different months
+            func.sum(case((months.op("&")((months - 1).self_group()) != 0, 1), else_=0)).label("returning_users"),
+            func.sum(case((models.User.order_count >= 2, 1), else_=0)).label("repeat_buyers"),
+            *[func.sum(months.op(">>")(offset).op("&")(1)).label(f"m{offset}") for offset in range(periods)]
+        )
+        .join(models.User, models.User.id == activity.user_id)
+        .where(activity.cohort_month.between(first, last))
+        .group_by(activity.cohort_month)
+        .order_by(activity.cohort_month)
+    ).all()
+
+    result = []
+    for row in rows:
+        size = row.size
+        active = [
+            int(getattr(row, f"m{offset}") or 0) if row.cohort_month + offset <= current else None
+            for offset in range(periods)
+        ]
+        result.append({
+            "cohort": month_label(row.cohort_month),
+            "size": size,
+            "active": active,
+            "retention": [round(100 * count / size, 1) if count is not None else None for count in active],
+            "repeat_buyers": int(row.repeat_buyers or 0),
+            "repeat_rate": round(100 * int(row.repeat_buyers or 0) / size, 1),
+            "returning_users": int(row.returning_users or 0)
+        })
+
+    return {
+        "start_month": month_label(first),
+        "end_month": month_label(last),
+        "periods": periods,
+        "cohorts": result
+    }
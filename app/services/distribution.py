@@ -0,0 +1,216 @@
+"""
+Distribution statistics of order amounts / sale revenue: exact quantiles and
+histograms, overall or per product / day / week / month.
+Everything is computed by the database in three grouped queries, so rows
+never reach Python and memory stays bounded by groups x (quantiles + bins):
+1. count, min, max and avg per group (also picks the groups to report),
+2. quantiles: rows ranked with ROW_NUMBER() per group, keeping only the two
+   ranks around each quantile position, interpolated linearly (numpy's default),
+3. histogram: one shared set of bin edges (equal width or log-spaced), rows
+   binned with a CASE expression and counted per group and bin.
+"""
+import math
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+from sqlalchemy import and_, case, func, literal, or_, select, true
+from sqlalchemy.orm import Session
+from app.db import models
+from app.db.dialect import BUCKET_UNITS, date_bucket, dialect_name, floor_int
+
+# table -> (model, measured column)
+MEASURES = {
+    "orders": (models.Order, models.Order.amount),
+    "sales": (models.Sale, models.Sale.revenue),
+}
+GROUPINGS = ("product",) + BUCKET_UNITS
+SCALES = ("linear", "log")
+DEFAULT_QUANTILES = (0.25, 0.5, 0.75, 0.9, 0.99)
+MAX_QUANTILES = 10
+MAX_BINS = 50
+
+
+class DistributionError(ValueError):
+    pass
+
+
+def quantile_name(q: float) -> str:
+    return f"p{q * 100:g}"
+
+
+def bin_edges(low: float, high: float, bins: int, scale: str) -> List[float]:
+    """
+    bins + 1 edges from low to high, equally spaced or log-spaced
+    """
+    if high <= low:
+        return [low, high]
+    if scale == "log":
+        if low <= 0:
+            raise DistributionError("Log scale needs positive values")
+        ratio = math.log(high / low) / bins
+        edges = [low * math.exp(ratio * i) for i in range(bins + 1)]
+    else:
+        width = (high - low) / bins
+        edges = [low + width * i for i in range(bins + 1)]
+    edges[-1] = high
+    return edges
+
+
+def _validate(table: str, group_by: Optional[str], quantiles: Sequence[float], bins: int, scale: str) -> None:
+    if table not in MEASURES:
+        raise DistributionError(f"Invalid table '{table}'. Allowed: {', '.join(MEASURES)}")
+    if group_by is not None and group_by not in GROUPINGS:
+        raise DistributionError(f"Invalid group_by '{group_by}'. Allowed: {', '.join(GROUPINGS)}")
+    if scale not in SCALES:
+        raise DistributionError(f"Invalid scale '{scale}'. Allowed: {', '.join(SCALES)}")
+    if not 1 <= bins <= MAX_BINS:
+        raise DistributionError(f"bins must be between 1 and {MAX_BINS}")
+    if not quantiles or len(quantiles) > MAX_QUANTILES:
+        raise DistributionError(f"Give 1..{MAX_QUANTILES} quantiles")
+    if any(isinstance(q, bool) or not isinstance(q, (int, float)) or not 0 <= q <= 1 for q in quantiles):
+        raise DistributionError("Quantiles must be numbers between 0 and 1")
+
+
+def _source(db: Session, table: str, group_by: Optional[str], days: Optional[int]):
+    """
+    (grp, value) rows to describe, as a subquery
+    """
+    model, value = MEASURES[table]
+    if group_by == "product":
+        group = models.Order.product
+    elif group_by is not None:
+        group = date_bucket(model.created_at, group_by, dialect_name(db))
+    else:
+        group = literal("all")
+
+    stmt = select(group.label("grp"), value.label("value")).where(value.isnot(None))
+    if table == "sales" and group_by == "product":
+        stmt = stmt.join(models.Order, models.Sale.order_id == models.Order.id)
+    if days:
+        stmt = stmt.where(model.created_at >= datetime.utcnow() - timedelta(days=days))
+    return stmt.subquery()
+
+
+def _quantiles(db: Session, src, groups_filter, quantiles: Sequence[float]) -> Dict[Any, Dict[str, float]]:
+    ranked = select(
+        src.c.grp,
+        src.c.value,
+        func.row_number().over(partition_by=src.c.grp, order_by=src.c.value).label("rn"),
+        func.count().over(partition_by=src.c.grp).label("n")
+    ).where(groups_filter).subquery()
+
+    dialect = dialect_name(db)
+    # 1-based ranks floor(k)+1 and floor(k)+2 around position k = (n - 1) * q
+    wanted = []
+    for q in quantiles:
+        below = floor_int((ranked.c.n - 1) * q, dialect) + 1
+        wanted.append(and_(ranked.c.rn >= below, ranked.c.rn <= below + 1))
+    rows = db.execute(select(ranked.c.grp, ranked.c.n, ranked.c.rn, ranked.c.value).where(or_(*wanted))).all()
+
+    ranks: Dict[Any, Dict[int, float]] = {}
+    counts: Dict[Any, int] = {}
+    for row in rows:
+        ranks.setdefault(row.grp, {})[row.rn] = float(row.value)
+        counts[row.grp] = row.n
+
+    result = {}
+    for grp, values in ranks.items():
+        position_values = {}
+        for q in quantiles:
+            k = (counts[grp] - 1) * q
+            below = int(k)
+            low = values.get(below + 1, values[min(values)])
+            high = values.get(below + 2, low)
+            position_values[quantile_name(q)] = round(low + (high - low) * (k - below), 4)
+        result[grp] = position_values
+    return result
+
+
+def _histogram(db: Session, src, groups_filter, edges: List[float]) -> Dict[Any, List[int]]:
+    bins = len(edges) - 1
+    # Inner edges only: below the first is bin 0, everything else falls into the last bin
+    bucket = case(
+        *[(src.c.value < edge, index) for index, edge in enumerate(edges[1:-1])],
+        else_=bins - 1
+    ) if bins > 1 else literal(0)
+    # Binned in a subquery so GROUP BY refers to a plain column on every backend
+    binned = select(src.c.grp, bucket.label("bin")).where(groups_filter).subquery()
+    rows = db.execute(
+        select(binned.c.grp, binned.c.bin, func.count().label("n")).group_by(binned.c.grp, binned.c.bin)
+    ).all()
+
+    counts: Dict[Any, List[int]] = {}
+    for row in rows:
+        counts.setdefault(row.grp, [0] * bins)[row.bin] += row.n
+    return counts
+
+
+def get_distribution(db: Session, table: str = "orders", group_by: Optional[str] = None,
+                     days: Optional[int] = None, quantiles: Optional[List[float]] = None,
+                     bins: int = 20, scale: str = "linear", limit: int = 10) -> Dict[str, Any]:
+    """
+    Quantiles and histogram of orders.amount or sales.revenue.
+    With group_by, the `limit` largest products (or latest periods) get their own
+    stats and histogram counts over shared bin edges
+    """
+    quantiles = list(quantiles) if quantiles else list(DEFAULT_QUANTILES)
+    _validate(table, group_by, quantiles, bins, scale)
+    src = _source(db, table, group_by, days)
+    column = MEASURES[table][1].key
+
+    stats_query = select(
+        src.c.grp,
+        func.count().label("count"),
+        func.min(src.c.value).label("min"),
+        func.max(src.c.value).label("max"),
+        func.avg(src.c.value).label("avg")
+    ).group_by(src.c.grp)
+    if group_by == "product":
+        stats_query = stats_query.order_by(func.count().desc(), src.c.grp).limit(limit)
+    else:
+        stats_query = stats_query.order_by(src.c.grp.desc()).limit(limit)
+    stats = db.execute(stats_query).all()
+    if group_by in BUCKET_UNITS:
+        # The latest periods were picked; report them oldest first
+        stats = stats[::-1]
+
+    result: Dict[str, Any] = {"table": table, "column": column, "days": days}
+    if not stats:
+        result.update({"count": 0, "quantiles": {}, "histogram": {"scale": scale, "edges": [], "counts": []}})
+        return result
+
+    groups = [row.grp for row in stats]
+    groups_filter = src.c.grp.in_(groups) if group_by else true()
+    low = float(min(row.min for row in stats))
+    high = float(max(row.max for row in stats))
+    edges = bin_edges(low, high, bins, scale)
+    quantile_values = _quantiles(db, src, groups_filter, quantiles)
+    histograms = _histogram(db, src, groups_filter, edges)
+    rounded_edges = [round(edge, 4) for edge in edges]
+
+    if group_by is None:
+        row = stats[0]
+        result.update({
+            "count": row.count,
+            "min": float(row.min),
+            "max": float(row.max),
+            "avg": round(float(row.avg), 4),
+            "quantiles": quantile_values.get(row.grp, {}),
+            "histogram": {"scale": scale, "edges": rounded_edges, "counts": histograms.get(row.grp, [])}
+        })
+        return result
+
+    result["group_by"] = group_by
+    result["histogram"] = {"scale": scale, "edges": rounded_edges}
+    result["groups"] = [
+        {
+            "group": row.grp,
+            "count": row.count,
+            "min": float(row.min),
+            "avg": round(float(row.avg), 4),
+            **quantile_values.get(row.grp, {}),
+            "max": float(row.max),
+            "histogram": histograms.get(row.grp, [0] * (len(edges) - 1))
+        }
+        for row in stats
+    ]
+    return result
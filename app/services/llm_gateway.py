@@ -0,0 +1,311 @@
+"""
+Managed access to the LLM API.
+Wraps an OpenAI-compatible SDK client (Cerebras) with:
+- a pooled (HTTP/2 when `h2` is installed) httpx client and per-request timeouts
+- retries with full-jitter exponential backoff on 429/5xx/timeouts (Retry-After honoured)
+- a concurrency semaphore with a bounded wait
+- a circuit breaker that fails fast while the API keeps failing
+- optional hedged requests: a second identical request after the observed p95 latency
+"""
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMUnavailableError(Exception):
+    """
+    Raised without calling the API: the circuit is open or the gateway is saturated
+    """
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Transient failures worth retrying: rate limits, server errors, timeouts, connection drops
+    """
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    name = type(error).__name__
+    return "Timeout" in name or "Connection" in name
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """
+    Retry-After header of an API error response, if any
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failed requests and rejects
+    calls for `reset_seconds`; then lets a single trial request through
+    (half-open) and closes again on success
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now: float) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if now - self._opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._state(time.monotonic())
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class LatencyWindow:
+    """
+    Recent successful call latencies (seconds) for percentile estimates
+    """
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+class LLMGateway:
+    def __init__(
+        self,
+        client: Any,
+        *,
+        timeout: float,
+        max_retries: int,
+        backoff_base: float,
+        backoff_max: float,
+        max_concurrency: int,
+        queue_timeout: float,
+        breaker: CircuitBreaker,
+        hedge_enabled: bool = False,
+        hedge_percentile: float = 95,
+        hedge_min_samples: int = 20,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        self.client = client
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.queue_timeout = queue_timeout
+        self.breaker = breaker
+        self.hedge_enabled = hedge_enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.latency = LatencyWindow()
+        self._sleep = sleep
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        # Hedges need a thread of their own next to the primary request
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency * 2, thread_name_prefix="llm-hedge")
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "requests": 0, "attempts": 0, "retries": 0, "failures": 0,
+            "rejected": 0, "hedges": 0, "hedge_wins": 0
+        }
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def create(self, timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        chat.completions.create() with the gateway's policies applied.
+        `timeout` caps this call's total time (e.g. the agent's remaining budget)
+        """
+        self._count("requests")
+        deadline = time.monotonic() + (timeout if timeout is not None else self.timeout * (self.max_retries + 1))
+
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self._count("rejected")
+            raise LLMUnavailableError("Too many concurrent LLM requests")
+        if not self.breaker.allow():
+            self._slots.release()
+            self._count("rejected")
+            raise LLMUnavailableError("LLM circuit breaker is open, the API is failing")
+
+        try:
+            attempt = 0
+            while True:
+                attempt += 1
+                self._count("attempts")
+                request_timeout = min(self.timeout, max(deadline - time.monotonic(), 0.001))
+                try:
+                    started = time.monotonic()
+                    response = self._call(request_timeout, kwargs)
+                    self.latency.add(time.monotonic() - started)
+                    self.breaker.record_success()
+                    return response
+                except Exception as e:
+                    if not is_retryable(e):
+                        # Bad request / auth errors are not the API being down
+                        self.breaker.record_success()
+                        raise
+                    delay = self._backoff(attempt, e)
+                    if attempt > self.max_retries or time.monotonic() + delay >= deadline:
+                        self._count("failures")
+                        self.breaker.record_failure()
+                        raise
+                    logger.warning(f"LLM call failed ({e}), retry {attempt} in {delay:.2f}s")
+                    self._count("retries")
+                    self._sleep(delay)
+        finally:
+            self._slots.release()
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """
+        Full-jitter exponential backoff, at least the server's Retry-After
+        """
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    def _request(self, request_timeout: float, kwargs: Dict[str, Any]) -> Any:
+        return self.client.chat.completions.create(timeout=request_timeout, **kwargs)
+
+    def hedge_delay(self) -> Optional[float]:
+        """
+        Seconds to wait before hedging, or None while hedging is off or
+        there are too few latency samples
+        """
+        if not self.hedge_enabled or len(self.latency) < self.hedge_min_samples:
+            return None
+        return self.latency.percentile(self.hedge_percentile)
+
+    def _call(self, request_timeout: float, kwargs: Dict[str, Any]) -> Any:
+        delay = self.hedge_delay()
+        if delay is None or delay >= request_timeout:
+            return self._request(request_timeout, kwargs)
+
+        primary = self._executor.submit(self._request, request_timeout, kwargs)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        # Primary is slower than p95: race an identical request against it
+        self._count("hedges")
+        hedge = self._executor.submit(self._request, max(request_timeout - delay, 0.001), kwargs)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count("hedge_wins")
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        p50 = self.latency.percentile(50)
+        p95 = self.latency.percentile(95)
+        stats.update({
+            "circuit": self.breaker.state,
+            "latency_p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "latency_p95_ms": round(p95 * 1000, 1) if p95 is not None else None
+        })
+        return stats
+
+
+def build_http_client(settings):
+    """
+    Pooled httpx client shared by all LLM requests; HTTP/2 if `h2` is installed
+    """
+    import httpx
+
+    try:
+        import h2  # noqa: F401
+        http2 = True
+    except ImportError:
+        http2 = False
+
+    return httpx.Client(
+        http2=http2,
+        timeout=httpx.Timeout(settings.LLM_TIMEOUT_SECONDS, connect=settings.LLM_CONNECT_TIMEOUT_SECONDS),
+        limits=httpx.Limits(
+            max_connections=settings.LLM_MAX_CONCURRENCY * 2,
+            max_keepalive_connections=settings.LLM_MAX_CONCURRENCY
+        )
+    )
+
+
+def build_gateway(client: Any, settings) -> LLMGateway:
+    return LLMGateway(
+        client,
+        timeout=settings.LLM_TIMEOUT_SECONDS,
+        max_retries=settings.LLM_MAX_RETRIES,
+        backoff_base=settings.LLM_BACKOFF_BASE_SECONDS,
+        backoff_max=settings.LLM_BACKOFF_MAX_SECONDS,
+        max_concurrency=settings.LLM_MAX_CONCURRENCY,
+        queue_timeout=settings.LLM_QUEUE_TIMEOUT_SECONDS,
+        breaker=CircuitBreaker(settings.LLM_BREAKER_FAILURES, settings.LLM_BREAKER_RESET_SECONDS),
+        hedge_enabled=settings.LLM_HEDGE_ENABLED,
+        hedge_percentile=settings.LLM_HEDGE_PERCENTILE,
+        hedge_min_samples=settings.LLM_HEDGE_MIN_SAMPLES
+    )
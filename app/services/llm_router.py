@@ -0,0 +1,178 @@
+"""
+Multi-provider LLM routing.
+Providers are OpenAI-compatible backends (Cerebras, OpenAI, local servers
+such as Ollama or vLLM), each behind its own LLMGateway. A call is routed to
+the providers that serve the requested role ("tools" for tool selection,
+"answer" for explanations once tool results are in), preferring the lowest
+latency EWMA weighted by error rate, and fails over to the next one if a
+provider errors or its circuit is open.
+
+LLM_PROVIDERS is a JSON list, e.g.
+    [{"name": "local", "kind": "openai", "base_url": "http://localhost:11434/v1",
+      "model": "llama3.1:8b", "roles": ["tools"]},
+     {"name": "cerebras", "kind": "cerebras", "model": "llama-3.3-70b",
+      "api_key_env": "CEREBRAS_API_KEY", "roles": ["tools", "answer"]}]
+Without it, the single Cerebras provider from CEREBRAS_API_KEY is used.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from app.services.llm_gateway import LLMUnavailableError, build_gateway, build_http_client
+
+logger = logging.getLogger(__name__)
+
+ROLES = ("tools", "answer")
+# How much a provider's error rate inflates its latency score
+ERROR_PENALTY = 4.0
+
+
+def default_provider_specs(settings) -> List[Dict[str, Any]]:
+    return [{
+        "name": "cerebras",
+        "kind": "cerebras",
+        "model": settings.LLM_MODEL,
+        "base_url": settings.LLM_BASE_URL,
+        "api_key": settings.CEREBRAS_API_KEY,
+        "roles": list(ROLES)
+    }]
+
+
+def provider_specs(settings) -> List[Dict[str, Any]]:
+    if not settings.LLM_PROVIDERS:
+        return default_provider_specs(settings)
+    specs = json.loads(settings.LLM_PROVIDERS)
+    if not isinstance(specs, list) or not specs:
+        raise ValueError("LLM_PROVIDERS must be a non-empty JSON list")
+    return specs
+
+
+def build_client(spec: Dict[str, Any], settings) -> Any:
+    """
+    SDK client for a provider spec; retries are left to the gateway
+    """
+    api_key = spec.get("api_key") or os.getenv(spec.get("api_key_env", ""), "")
+    options = dict(
+        base_url=spec.get("base_url") or None,
+        timeout=settings.LLM_TIMEOUT_SECONDS,
+        max_retries=0,
+        http_client=build_http_client(settings)
+    )
+
+    if spec.get("kind", "openai") == "cerebras":
+        if not api_key:
+            raise ValueError(f"API key for provider '{spec.get('name')}' is not set")
+        # Imported on first use: the SDK is heavy and only needed for chat
+        from cerebras.cloud.sdk import Cerebras
+        return Cerebras(api_key=api_key, **options)
+
+    from openai import OpenAI
+    # Local OpenAI-compatible servers usually ignore the key but the SDK requires one
+    return OpenAI(api_key=api_key or "not-needed", **options)
+
+
+class Provider:
+    def __init__(self, spec: Dict[str, Any], gateway, alpha: float):
+        self.name = spec.get("name") or spec.get("kind", "openai")
+        self.model = spec["model"]
+        self.roles = set(spec.get("roles") or ROLES)
+        self.gateway = gateway
+        self.alpha = alpha
+        self.latency_ewma: Optional[float] = None
+        self.error_rate = 0.0
+        self.calls = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: Optional[float]) -> None:
+        """
+        Update the EWMAs with a call result (seconds=None for a failure)
+        """
+        with self._lock:
+            self.calls += 1
+            failed = seconds is None
+            self.errors += failed
+            self.error_rate = (1 - self.alpha) * self.error_rate + self.alpha * failed
+            if not failed:
+                self.latency_ewma = seconds if self.latency_ewma is None else (
+                    (1 - self.alpha) * self.latency_ewma + self.alpha * seconds
+                )
+
+    def score(self) -> float:
+        # Providers without samples go first so they get measured
+        if self.latency_ewma is None:
+            return 0.0
+        return self.latency_ewma * (1 + ERROR_PENALTY * self.error_rate)
+
+    def available(self) -> bool:
+        return self.gateway.breaker.state != "open"
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "roles": sorted(self.roles),
+            "latency_ewma_ms": round(self.latency_ewma * 1000, 1) if self.latency_ewma is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "calls": self.calls,
+            "errors": self.errors,
+            "gateway": self.gateway.stats()
+        }
+
+
+class LLMRouter:
+    def __init__(self, providers: List[Provider], explore_rate: float = 0.0):
+        self.providers = providers
+        self.explore_rate = explore_rate
+
+    def candidates(self, role: str) -> List[Provider]:
+        """
+        Providers for a role, best score first. Occasionally a random
+        provider is tried first so stale latency estimates get refreshed.
+        """
+        serving = [p for p in self.providers if role in p.roles] or list(self.providers)
+        ranked = sorted(serving, key=lambda p: (not p.available(), p.score()))
+        if len(ranked) > 1 and random.random() < self.explore_rate:
+            ranked.insert(0, ranked.pop(random.randrange(1, len(ranked))))
+        return ranked
+
+    def create(self, role: str = "tools", timeout: Optional[float] = None, **kwargs) -> Tuple[Any, str]:
+        """
+        Run a chat completion on the best provider for the role, failing over
+        on errors. `timeout` bounds the whole call, failovers included: each
+        provider gets only what is left of it. Returns (response, provider name)
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        last_error: Optional[Exception] = None
+        for provider in self.candidates(role):
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning(f"LLM time budget spent, not failing over to '{provider.name}'")
+                    break
+                kwargs["timeout"] = remaining
+            started = time.perf_counter()
+            try:
+                response = provider.gateway.create(model=provider.model, **kwargs)
+            except Exception as e:
+                provider.record(None)
+                logger.warning(f"LLM provider '{provider.name}' failed: {e}")
+                last_error = e
+                continue
+            provider.record(time.perf_counter() - started)
+            return response, provider.name
+
+        raise last_error or LLMUnavailableError("No LLM provider available")
+
+    def stats(self) -> Dict[str, Any]:
+        return {provider.name: provider.stats() for provider in self.providers}
+
+
+def build_router(settings) -> LLMRouter:
+    providers = []
+    for spec in provider_specs(settings):
+        gateway = build_gateway(build_client(spec, settings), settings)
+        providers.append(Provider(spec, gateway, settings.LLM_EWMA_ALPHA))
+    return LLMRouter(providers, settings.LLM_ROUTER_EXPLORE_RATE)
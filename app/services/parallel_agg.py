@@ -0,0 +1,181 @@
+"""
+Parallel aggregation for large tables.
+The id range is split into shards and each shard's partial aggregate
+(count, sum, min, max per group) runs in a worker process over its own
+read-only connection. Partials are merged in the parent and averages are
+recomputed from the merged sums and counts, so results match the
+single-query tools.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db import models
+
+# Shards per worker: smaller shards even out workers that hit dense id ranges
+SHARDS_PER_WORKER = 2
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+
+# Worker-side engines, one per database URL
+_engines: Dict[str, Any] = {}
+
+
+def _read_only_engine(url: str):
+    engine = _engines.get(url)
+    if engine is None:
+        if url.startswith("sqlite"):
+            import sqlite3
+            path = url.split("///", 1)[1]
+            engine = create_engine(
+                url,
+                creator=lambda: sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+            )
+        else:
+            engine = create_engine(url, execution_options={"postgresql_readonly": True})
+        _engines[url] = engine
+    return engine
+
+
+def _partial_statement(kind: str, lo: int, hi: int):
+    orders = models.Order.__table__
+    sales = models.Sale.__table__
+
+    if kind == "order_stats":
+        return select(
+            func.count(orders.c.id), func.count(orders.c.amount), func.sum(orders.c.amount),
+            func.min(orders.c.amount), func.max(orders.c.amount)
+        ).where(orders.c.id.between(lo, hi))
+
+    if kind == "top_products":
+        return select(
+            orders.c.product, func.count(orders.c.id), func.count(orders.c.amount), func.sum(orders.c.amount)
+        ).where(orders.c.id.between(lo, hi)).group_by(orders.c.product)
+
+    if kind == "sales_by_product":
+        return select(
+            orders.c.product, func.count(sales.c.id), func.count(sales.c.revenue), func.sum(sales.c.revenue)
+        ).select_from(
+            sales.join(orders, sales.c.order_id == orders.c.id)
+        ).where(sales.c.id.between(lo, hi)).group_by(orders.c.product)
+
+    raise ValueError(f"Unknown aggregate '{kind}'")
+
+
+def run_partial(url: str, kind: str, lo: int, hi: int) -> List[Tuple]:
+    """
+    Worker entry point: one shard's partial aggregate as plain tuples
+    """
+    with _read_only_engine(url).connect() as conn:
+        return [tuple(row) for row in conn.execute(_partial_statement(kind, lo, hi))]
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers != workers:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        # spawn: the server process has threads, which fork() does not copy safely
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"))
+        _pool_workers = workers
+    return _pool
+
+
+def shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True)
+        _pool = None
+
+
+def plan_shards(db: Session, table) -> Optional[List[Tuple[int, int]]]:
+    """
+    Id ranges to aggregate in parallel, or None when the table is too small
+    or parallel mode is off (PARALLEL_AGG_WORKERS <= 1)
+    """
+    workers = settings.PARALLEL_AGG_WORKERS
+    if workers <= 1:
+        return None
+
+    # Both ends come from the primary key index
+    lo, hi = db.query(func.min(table.c.id), func.max(table.c.id)).one()
+    if lo is None or hi - lo + 1 < settings.PARALLEL_AGG_MIN_ROWS:
+        return None
+
+    count = workers * SHARDS_PER_WORKER
+    step = (hi - lo + 1 + count - 1) // count
+    return [(start, min(start + step - 1, hi)) for start in range(lo, hi + 1, step)]
+
+
+def _run_shards(db: Session, kind: str, shards: List[Tuple[int, int]]) -> List[List[Tuple]]:
+    url = db.get_bind().url.render_as_string(hide_password=False)
+    pool = _get_pool(settings.PARALLEL_AGG_WORKERS)
+    futures = [pool.submit(run_partial, url, kind, lo, hi) for lo, hi in shards]
+    return [future.result() for future in futures]
+
+
+def _merge_groups(partials: List[List[Tuple]]) -> Dict[str, List[float]]:
+    """
+    product -> [row count, non-null value count, sum]
+    """
+    merged: Dict[str, List[float]] = {}
+    for rows in partials:
+        for product, count, value_count, total in rows:
+            entry = merged.setdefault(product, [0, 0, 0.0])
+            entry[0] += count
+            entry[1] += value_count
+            entry[2] += total or 0
+    return merged
+
+
+def order_stats(db: Session, shards: List[Tuple[int, int]]) -> Dict[str, Any]:
+    count = value_count = 0
+    total = 0.0
+    low = high = None
+    for rows in _run_shards(db, "order_stats", shards):
+        shard_count, shard_values, shard_sum, shard_min, shard_max = rows[0]
+        count += shard_count
+        value_count += shard_values
+        total += shard_sum or 0
+        if shard_min is not None:
+            low = shard_min if low is None else min(low, shard_min)
+            high = shard_max if high is None else max(high, shard_max)
+
+    return {
+        "total_orders": count,
+        "total_amount": float(total),
+        "avg_amount": total / value_count if value_count else 0,
+        "max_amount": float(high) if high else 0,
+        "min_amount": float(low) if low else 0
+    }
+
+
+def top_products(db: Session, shards: List[Tuple[int, int]], limit: int) -> List[Dict[str, Any]]:
+    merged = _merge_groups(_run_shards(db, "top_products", shards))
+    ranked = sorted(merged.items(), key=lambda item: item[1][0], reverse=True)[:limit]
+    return [
+        {
+            "product": product,
+            "order_count": count,
+            "total_amount": float(total),
+            "avg_amount": total / value_count if value_count else 0
+        }
+        for product, (count, value_count, total) in ranked
+    ]
+
+
+def sales_by_product(db: Session, shards: List[Tuple[int, int]], limit: int) -> List[Dict[str, Any]]:
+    merged = _merge_groups(_run_shards(db, "sales_by_product", shards))
+    ranked = sorted(merged.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+    return [
+        {
+            "product": product,
+            "sale_count": count,
+            "total_revenue": float(total),
+            "avg_revenue": total / value_count if value_count else 0
+        }
+        for product, (count, value_count, total) in ranked
+    ]
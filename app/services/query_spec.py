@@ -0,0 +1,339 @@
+"""
+Compiler for structured ad-hoc queries (the run_query_spec tool).
+The LLM sends a spec instead of SQL:
+
+    {"table": "sales",
+     "filters": [{"column": "orders.user_id", "op": "eq", "value": 5},
+                 {"column": "created_at", "op": "between", "value": ["2024-03-01", "2024-03-31"]}],
+     "group_by": ["orders.product"],
+     "aggregates": [{"func": "sum", "column": "revenue", "as": "total_revenue"}],
+     "order_by": [{"column": "total_revenue", "direction": "desc"}],
+     "limit": 10}
+
+Every table, column, operator and aggregate is checked against the
+allowlists in app.core.safety, values are bound as parameters, related
+tables are joined along foreign keys, and the planner's estimate has to
+stay under a cost limit before the query runs.
+"""
+import re
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Tuple
+from sqlalchemy import DateTime, Float, Integer, func, select, text
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.safety import (
+    ALLOWED_AGGREGATES, ALLOWED_FILTER_OPS, QUERYABLE_COLUMNS, validate_column_name, validate_table_name
+)
+from app.db import models
+from app.db.dialect import BUCKET_UNITS, date_bucket
+
+TABLES = {
+    "users": models.User.__table__,
+    "orders": models.Order.__table__,
+    "sales": models.Sale.__table__,
+}
+
+# Foreign-key joins between neighbouring tables (users - orders - sales)
+_users, _orders, _sales = TABLES["users"], TABLES["orders"], TABLES["sales"]
+JOINS = {
+    ("orders", "users"): _orders.c.user_id == _users.c.id,
+    ("sales", "orders"): _sales.c.order_id == _orders.c.id,
+}
+NEIGHBOURS = {"users": ["orders"], "orders": ["users", "sales"], "sales": ["orders"]}
+
+MAX_FILTERS = 10
+MAX_GROUP_BY = 3
+MAX_AGGREGATES = 5
+MAX_IN_VALUES = 50
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 100
+_DATE_ONLY = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+class QuerySpecError(ValueError):
+    """
+    The spec is invalid or too expensive; the message is shown to the LLM
+    """
+
+
+def _join_path(start: str, target: str) -> List[str]:
+    """
+    Tables to walk from `start` to `target`, excluding `start`
+    """
+    paths = {start: []}
+    queue = [start]
+    while queue:
+        current = queue.pop(0)
+        if current == target:
+            return paths[current]
+        for neighbour in NEIGHBOURS[current]:
+            if neighbour not in paths:
+                paths[neighbour] = paths[current] + [neighbour]
+                queue.append(neighbour)
+    raise QuerySpecError(f"Cannot join {start} to {target}")
+
+
+def _join_condition(a: str, b: str):
+    return JOINS[(a, b)] if (a, b) in JOINS else JOINS[(b, a)]
+
+
+class _Compiler:
+    def __init__(self, table: str, dialect: str):
+        if not isinstance(table, str) or not validate_table_name(table):
+            raise QuerySpecError("Invalid table. Allowed tables: users, orders, sales")
+        self.base = table.lower()
+        self.dialect = dialect
+        self.joined = [self.base]
+
+    def column(self, reference: Any):
+        """
+        Resolve 'column' (base table) or 'table.column', joining the table if needed
+        """
+        if not isinstance(reference, str):
+            raise QuerySpecError(f"Invalid column reference: {reference!r}")
+        table, _, name = reference.rpartition(".")
+        table = (table or self.base).lower()
+        if not validate_column_name(table, name):
+            raise QuerySpecError(f"Column '{reference}' is not available")
+        for step in _join_path(self.base, table):
+            if step not in self.joined:
+                self.joined.append(step)
+        return TABLES[table].c[name]
+
+    def from_clause(self):
+        clause = TABLES[self.base]
+        previous = {self.base}
+        for table in self.joined[1:]:
+            neighbour = next(t for t in NEIGHBOURS[table] if t in previous)
+            clause = clause.join(TABLES[table], _join_condition(table, neighbour))
+            previous.add(table)
+        return clause
+
+    def value(self, column, value: Any, end_of_range: bool = False):
+        """
+        Coerce a filter value to the column type. A date-only upper bound
+        on a timestamp means the whole day, so it becomes the next midnight
+        """
+        if value is None:
+            raise QuerySpecError(f"Missing value for {column.name}")
+        try:
+            if isinstance(column.type, DateTime):
+                text_value = str(value)
+                parsed = datetime.fromisoformat(text_value.replace("Z", "+00:00")).replace(tzinfo=None)
+                if end_of_range and _DATE_ONLY.match(text_value):
+                    parsed += timedelta(days=1)
+                return parsed
+            if isinstance(column.type, Integer):
+                return int(value)
+            if isinstance(column.type, Float):
+                return float(value)
+        except (TypeError, ValueError):
+            raise QuerySpecError(f"Invalid value {value!r} for {column.name}")
+        return str(value)
+
+    def condition(self, spec: Any):
+        if not isinstance(spec, dict):
+            raise QuerySpecError("Each filter must be an object with column, op and value")
+        column = self.column(spec.get("column"))
+        op = spec.get("op", "eq")
+        value = spec.get("value")
+        if op not in ALLOWED_FILTER_OPS:
+            raise QuerySpecError(f"Invalid filter op '{op}'. Allowed: {', '.join(sorted(ALLOWED_FILTER_OPS))}")
+
+        if op == "in":
+            if not isinstance(value, list) or not 0 < len(value) <= MAX_IN_VALUES:
+                raise QuerySpecError(f"'in' needs a list of 1..{MAX_IN_VALUES} values")
+            return column.in_([self.value(column, item) for item in value])
+        if op == "between":
+            if not isinstance(value, list) or len(value) != 2:
+                raise QuerySpecError("'between' needs [low, high]")
+            low = self.value(column, value[0])
+            high = self.value(column, value[1], end_of_range=True)
+            if isinstance(column.type, DateTime) and _DATE_ONLY.match(str(value[1])):
+                return (column >= low) & (column < high)
+            return column.between(low, high)
+        if op == "contains":
+            return column.icontains(str(value), autoescape=True)
+
+        day_bound = isinstance(column.type, DateTime) and _DATE_ONLY.match(str(value))
+        if op == "eq":
+            if day_bound:
+                return (column >= self.value(column, value)) & (column < self.value(column, value, end_of_range=True))
+            return column == self.value(column, value)
+        if op == "ne":
+            return column != self.value(column, value)
+        if op == "gt":
+            return column >= self.value(column, value, end_of_range=True) if day_bound else column > self.value(column, value)
+        if op == "gte":
+            return column >= self.value(column, value)
+        if op == "lt":
+            return column < self.value(column, value)
+        # lte
+        return column < self.value(column, value, end_of_range=True) if day_bound else column <= self.value(column, value)
+
+    def group_expression(self, spec: Any) -> Tuple[str, Any]:
+        """
+        'column' / 'table.column', or {"column": ..., "bucket": "day|week|month"} for dates
+        """
+        if isinstance(spec, dict):
+            column = self.column(spec.get("column"))
+            bucket = spec.get("bucket")
+            if bucket not in BUCKET_UNITS or not isinstance(column.type, DateTime):
+                raise QuerySpecError(f"Date buckets ({', '.join(BUCKET_UNITS)}) need a date column")
+            name = f"{column.name}_{bucket}"
+            return name, date_bucket(column, bucket, self.dialect).label(name)
+        column = self.column(spec)
+        return column.name, column.label(column.name)
+
+    def aggregate(self, spec: Any) -> Tuple[str, Any]:
+        if not isinstance(spec, dict):
+            raise QuerySpecError("Each aggregate must be an object with func and column")
+        name = spec.get("func")
+        if name not in ALLOWED_AGGREGATES:
+            raise QuerySpecError(f"Invalid aggregate '{name}'. Allowed: {', '.join(sorted(ALLOWED_AGGREGATES))}")
+        reference = spec.get("column", "*")
+        if name == "count" and reference in ("*", None):
+            expression, default_label = func.count(), "count"
+        else:
+            column = self.column(reference)
+            if name in ("sum", "avg") and not isinstance(column.type, (Integer, Float)):
+                raise QuerySpecError(f"{name} needs a numeric column, got '{reference}'")
+            expression, default_label = getattr(func, name)(column), f"{name}_{column.name}"
+        label = spec.get("as") or default_label
+        if not re.match(r"^[A-Za-z_][A-Za-z0-9_]{0,40}$", str(label)):
+            raise QuerySpecError(f"Invalid aggregate alias '{label}'")
+        return label, expression.label(label)
+
+
+def compile_query_spec(spec: Dict[str, Any], dialect: str = "sqlite"):
+    """
+    Validate a spec and build a parameterized SELECT
+    """
+    compiler = _Compiler(spec.get("table"), dialect)
+    filters = spec.get("filters") or []
+    group_by = spec.get("group_by") or []
+    aggregates = spec.get("aggregates") or []
+    if len(filters) > MAX_FILTERS or len(group_by) > MAX_GROUP_BY or len(aggregates) > MAX_AGGREGATES:
+        raise QuerySpecError(f"At most {MAX_FILTERS} filters, {MAX_GROUP_BY} group_by and {MAX_AGGREGATES} aggregates")
+
+    outputs: Dict[str, Any] = {}
+
+    def add_output(name: str, expression) -> None:
+        if name in outputs:
+            raise QuerySpecError(f"Duplicate output column '{name}', set a distinct 'as'")
+        outputs[name] = expression
+
+    group_names = []
+    if group_by or aggregates:
+        for item in group_by:
+            name, expression = compiler.group_expression(item)
+            add_output(name, expression)
+            group_names.append(name)
+        for item in aggregates:
+            add_output(*compiler.aggregate(item))
+    else:
+        for reference in spec.get("columns") or sorted(QUERYABLE_COLUMNS[compiler.base]):
+            column = compiler.column(reference)
+            add_output(column.name, column.label(column.name))
+
+    conditions = [compiler.condition(item) for item in filters]
+    statement = select(*outputs.values()).select_from(compiler.from_clause())
+    if conditions:
+        statement = statement.where(*conditions)
+    if group_by:
+        statement = statement.group_by(*(outputs[name] for name in group_names))
+
+    for item in spec.get("order_by") or []:
+        if isinstance(item, str):
+            item = {"column": item}
+        reference = item.get("column") if isinstance(item, dict) else None
+        if reference in outputs:
+            expression = outputs[reference]
+        else:
+            expression = compiler.column(reference)
+        direction = item.get("direction", "asc")
+        if direction not in ("asc", "desc"):
+            raise QuerySpecError("order_by direction must be 'asc' or 'desc'")
+        statement = statement.order_by(expression.desc() if direction == "desc" else expression.asc())
+
+    try:
+        limit = int(spec.get("limit") or DEFAULT_LIMIT)
+    except (TypeError, ValueError):
+        raise QuerySpecError("limit must be an integer")
+    return statement.limit(min(max(limit, 1), MAX_LIMIT))
+
+
+def _plan_params(compiled) -> Dict[str, Any]:
+    # Plans don't depend on the values; datetimes are passed as text for the driver
+    return {
+        key: value.isoformat(" ") if isinstance(value, datetime) else value
+        for key, value in compiled.params.items()
+    }
+
+
+def estimate_cost(db: Session, statement) -> Dict[str, Any]:
+    """
+    Planner-based cost estimate.
+    SQLite: EXPLAIN QUERY PLAN, with each loop weighted by table size
+    (full SCAN = all rows, range SEARCH = a quarter, key lookup = a few rows).
+    PostgreSQL: EXPLAIN's total cost.
+    """
+    dialect = db.get_bind().dialect
+    # Expanding parameters (IN lists) are rendered as one bind per value
+    compiled = statement.compile(
+        dialect=type(dialect)(paramstyle="named"),
+        compile_kwargs={"render_postcompile": True}
+    )
+    params = _plan_params(compiled)
+
+    if dialect.name == "postgresql":
+        plan = db.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}"), params).scalar()
+        return {"plan_cost": float(plan[0]["Plan"]["Total Cost"])}
+
+    rows = 1
+    sizes: Dict[str, int] = {}
+    plan = db.execute(text(f"EXPLAIN QUERY PLAN {compiled}"), params).all()
+    for detail in (row[-1] for row in plan):
+        match = re.match(r"(SCAN|SEARCH) (\w+)", detail)
+        if not match or match.group(2) not in TABLES:
+            continue
+        table = match.group(2)
+        if table not in sizes:
+            sizes[table] = db.query(func.max(TABLES[table].c.id)).scalar() or 0
+        if match.group(1) == "SCAN":
+            rows *= max(sizes[table], 1)
+        elif "PRIMARY KEY" in detail or "rowid=?" in detail:
+            continue
+        elif ">" in detail or "<" in detail:
+            rows *= max(sizes[table] // 4, 1)
+        else:
+            rows *= min(10, max(sizes[table], 1))
+    return {"scan_rows": rows}
+
+
+def check_cost(db: Session, statement) -> Dict[str, Any]:
+    cost = estimate_cost(db, statement)
+    if cost.get("scan_rows", 0) > settings.QUERY_SPEC_MAX_SCAN_ROWS or \
+            cost.get("plan_cost", 0) > settings.QUERY_SPEC_MAX_PLAN_COST:
+        raise QuerySpecError(
+            f"Query is too expensive ({cost}). Add a date range or more specific filters"
+        )
+    return cost
+
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    # PostgreSQL returns sum/avg of integer columns as numeric
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def run_query_spec(db: Session, spec: Dict[str, Any]) -> List[Dict[str, Any]]:
+    statement = compile_query_spec(spec, db.get_bind().dialect.name)
+    check_cost(db, statement)
+    result = db.execute(statement)
+    columns = list(result.keys())
+    return [dict(zip(columns, (_json_value(value) for value in row))) for row in result]
@@ -0,0 +1,171 @@
+"""
+Server-side conversation sessions for /api/chat.
+Each session keeps a bounded history (recent turns verbatim, older turns
+folded into a short summary) and the latest tool results, so follow-up
+questions can refer to earlier answers and narrowing follow-ups ("only the
+top 3") are answered from memory instead of re-running the query.
+Sessions are evicted by TTL and, beyond SESSION_MAX_SESSIONS, least recently used.
+"""
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.config import settings
+
+# Assistant text kept per turn in the prompt history
+ANSWER_MAX_CHARS = 300
+# Recently used tool names remembered per session
+RECENT_TOOLS = 3
+
+
+def _format_call(tool_name: str, args: Dict[str, Any]) -> str:
+    arg_text = ", ".join(f"{key}={value!r}" for key, value in sorted(args.items()))
+    return f"{tool_name}({arg_text})"
+
+
+def _describe_result(result: Any) -> str:
+    if isinstance(result, list):
+        return f"{len(result)} rows"
+    if isinstance(result, dict):
+        text = json.dumps(result, default=str, ensure_ascii=False, separators=(",", ":"))
+        return text if len(text) <= 200 else text[:200] + "..."
+    return str(result)
+
+
+class ConversationSession:
+    def __init__(self, session_id: str):
+        self.id = session_id
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.turns: List[Dict[str, Any]] = []
+        self.summary = ""
+        # (tool_name, normalized args) -> (args, result), most recent last
+        self.tool_results: "OrderedDict[Tuple[str, str], Tuple[Dict[str, Any], Any]]" = OrderedDict()
+        # Data version the cached results were read at; a write invalidates them
+        self.data_version: Optional[int] = None
+        # Tools used in recent turns, most recent last (hint for tool pruning)
+        self.recent_tools: List[str] = []
+
+    def history_messages(self) -> List[Dict[str, str]]:
+        """
+        Prompt messages for earlier turns: the folded summary, then recent turns
+        """
+        messages = []
+        if self.summary:
+            messages.append({"role": "system", "content": f"Earlier in this conversation: {self.summary}"})
+        for turn in self.turns:
+            messages.append({"role": "user", "content": turn["user"]})
+            messages.append({"role": "assistant", "content": turn["assistant"]})
+        return messages
+
+    def sync_data_version(self, version: int) -> None:
+        """
+        Drop cached tool results if the data changed since they were read
+        """
+        if self.data_version != version:
+            self.tool_results.clear()
+            self.data_version = version
+
+    def add_turn(self, user_message: str, answer: Optional[str],
+                 tool_calls: List[Tuple[str, Dict[str, Any], Any]]) -> None:
+        """
+        Record a finished turn and fold the oldest turns into the summary
+        """
+        notes = [f"{_format_call(name, args)} -> {_describe_result(result)}" for name, args, result in tool_calls]
+        assistant = (answer or "")[:ANSWER_MAX_CHARS]
+        if notes:
+            assistant = (assistant + "\n" if assistant else "") + "Tools used: " + "; ".join(notes)
+        self.turns.append({"user": user_message, "assistant": assistant or "(no answer)"})
+
+        for name, args, result in tool_calls:
+            self.remember_result(name, args, result)
+            if name in self.recent_tools:
+                self.recent_tools.remove(name)
+            self.recent_tools.append(name)
+        del self.recent_tools[:-RECENT_TOOLS]
+
+        while len(self.turns) > settings.SESSION_HISTORY_TURNS:
+            oldest = self.turns.pop(0)
+            self.summary = f"{self.summary} | Q: {oldest['user']} A: {oldest['assistant']}".strip(" |")
+
+        # Keep the most recent part of the summary
+        max_chars = settings.SESSION_SUMMARY_MAX_CHARS
+        if len(self.summary) > max_chars:
+            self.summary = "..." + self.summary[-max_chars:]
+
+    def remember_result(self, tool_name: str, args: Dict[str, Any], result: Any) -> None:
+        key = (tool_name, json.dumps(args, sort_keys=True, default=str))
+        self.tool_results.pop(key, None)
+        self.tool_results[key] = (dict(args), result)
+        while len(self.tool_results) > settings.SESSION_MAX_TOOL_RESULTS:
+            self.tool_results.popitem(last=False)
+
+    def find_result(self, tool_name: str, args: Dict[str, Any]) -> Optional[Any]:
+        """
+        Return an earlier result that answers this call: an identical call,
+        or the same list query with a larger limit (its first `limit` rows are
+        the answer, since the ordering is the same). None if nothing fits.
+        """
+        key = (tool_name, json.dumps(args, sort_keys=True, default=str))
+        if key in self.tool_results:
+            return self.tool_results[key][1]
+
+        limit = args.get("limit")
+        if limit is None:
+            return None
+        other_args = {k: v for k, v in args.items() if k != "limit"}
+
+        for (name, _), (cached_args, result) in reversed(self.tool_results.items()):
+            if name != tool_name or not isinstance(result, list):
+                continue
+            cached_limit = cached_args.get("limit")
+            if cached_limit is None or cached_limit < limit:
+                continue
+            if {k: v for k, v in cached_args.items() if k != "limit"} == other_args:
+                return result[:limit]
+        return None
+
+
+class SessionStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, ConversationSession]" = OrderedDict()
+        self._evicted = 0
+
+    def get_or_create(self, session_id: Optional[str] = None) -> ConversationSession:
+        """
+        Return the live session with this ID, or start a new one
+        (unknown and expired IDs get a fresh session with a new ID)
+        """
+        now = time.time()
+        with self._lock:
+            self._evict_expired(now)
+            session = self._sessions.get(session_id) if session_id else None
+            if session is None:
+                session = ConversationSession(uuid.uuid4().hex)
+                self._sessions[session.id] = session
+                while len(self._sessions) > settings.SESSION_MAX_SESSIONS:
+                    self._sessions.popitem(last=False)
+                    self._evicted += 1
+            else:
+                self._sessions.move_to_end(session.id)
+            session.last_used = now
+            return session
+
+    def _evict_expired(self, now: float) -> None:
+        # Sessions are ordered by last use, so expired ones are at the front
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest.last_used <= settings.SESSION_TTL_SECONDS:
+                break
+            self._sessions.popitem(last=False)
+            self._evicted += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"active": len(self._sessions), "evicted": self._evicted}
+
+
+session_store = SessionStore()
@@ -0,0 +1,51 @@
+"""
+Database summary statistics used by /api/data/summary
+"""
+from typing import Dict, Any
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.db import models
+
+
+def get_data_summary(db: Session) -> Dict[str, Any]:
+    """
+    Row counts and headline aggregates for users, orders and sales
+    """
+    user_count = db.query(func.count(models.User.id)).scalar() or 0
+    order_count = db.query(func.count(models.Order.id)).scalar() or 0
+    sale_count = db.query(func.count(models.Sale.id)).scalar() or 0
+
+    total_revenue = db.query(func.sum(models.Sale.revenue)).scalar() or 0
+    avg_order_amount = db.query(func.avg(models.Order.amount)).scalar() or 0
+    avg_sale_revenue = db.query(func.avg(models.Sale.revenue)).scalar() or 0
+
+    return shape_summary(user_count, order_count, avg_order_amount, sale_count, total_revenue, avg_sale_revenue)
+
+
+def shape_summary(user_count: int, order_count: int, avg_order_amount: float,
+                  sale_count: int, total_revenue: float, avg_sale_revenue: float) -> Dict[str, Any]:
+    """
+    The /api/data/summary payload; also built incrementally by the change feed
+    """
+    return {
+        "tables": {
+            "users": {
+                "count": user_count
+            },
+            "orders": {
+                "count": order_count,
+                "avg_amount": float(avg_order_amount) if avg_order_amount else 0
+            },
+            "sales": {
+                "count": sale_count,
+                "total_revenue": float(total_revenue) if total_revenue else 0,
+                "avg_revenue": float(avg_sale_revenue) if avg_sale_revenue else 0
+            }
+        },
+        "summary": {
+            "total_users": user_count,
+            "total_orders": order_count,
+            "total_sales": sale_count,
+            "total_revenue": float(total_revenue) if total_revenue else 0
+        }
+    }
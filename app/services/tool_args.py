@@ -0,0 +1,68 @@
+"""
+Typed argument models for the tools, built from TOOLS_SCHEMA.
+The direct-invocation endpoints take them as request bodies and batches
+validate each argument set with them, so both accept and reject the same input.
+"""
+from typing import Any, Dict, List, Literal, Optional, Type
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, create_model
+from app.services.agent import TOOLS_SCHEMA
+
+
+# JSON schema types of TOOLS_SCHEMA parameters -> Python types for validation
+JSON_TYPES = {
+    "integer": int,
+    "number": float,
+    "string": str,
+    "boolean": bool,
+    "object": Dict[str, Any],
+}
+
+
+def _field_type(schema: Dict[str, Any]) -> Any:
+    if "enum" in schema:
+        return Literal[tuple(schema["enum"])]
+    if schema.get("type") == "array":
+        items = schema.get("items", {})
+        return List[JSON_TYPES.get(items.get("type"), Any)]
+    return JSON_TYPES.get(schema.get("type"), Any)
+
+
+def build_args_model(function: Dict[str, Any]) -> Type[BaseModel]:
+    """
+    Pydantic model of a tool's arguments, built from its TOOLS_SCHEMA entry.
+    Unknown arguments are rejected, numbers outside the schema's
+    minimum/maximum too; omitted or null optional ones fall back to the
+    tool's own defaults
+    """
+    parameters = function.get("parameters", {})
+    required = set(parameters.get("required", []))
+    fields = {}
+    for name, schema in parameters.get("properties", {}).items():
+        field_type = _field_type(schema)
+        bounds = {"ge": schema.get("minimum"), "le": schema.get("maximum")}
+        if name in required:
+            fields[name] = (field_type, Field(..., **bounds))
+        else:
+            fields[name] = (Optional[field_type], Field(None, **bounds))
+    model_name = "".join(part.title() for part in function["name"].split("_")) + "Args"
+    return create_model(model_name, __config__=ConfigDict(extra="forbid"), **fields)
+
+
+# tool name -> argument model
+ARGS_MODELS: Dict[str, Type[BaseModel]] = {
+    tool["function"]["name"]: build_args_model(tool["function"]) for tool in TOOLS_SCHEMA
+}
+
+
+def validate_args(tool_name: str, args: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Arguments checked and coerced by the tool's model, omitted and null
+    optional ones left out. Raises ValueError with one line per invalid field
+    """
+    try:
+        payload = ARGS_MODELS[tool_name].model_validate(args)
+    except ValidationError as e:
+        raise ValueError("; ".join(
+            f"{'.'.join(str(part) for part in error['loc']) or 'args'}: {error['msg']}" for error in e.errors()
+        ))
+    return payload.model_dump(exclude_none=True)
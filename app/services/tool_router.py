@@ -0,0 +1,126 @@
+"""
+Local intent pre-classifier that picks the tools relevant to a message,
+so only their schemas are sent to the LLM.
+Keyword stems (Uzbek and English) are matched at word starts; tools are
+ranked by hits (multi-word phrases weigh more). When nothing matches, the
+caller sends the full tool set.
+"""
+import re
+from typing import Dict, Iterable, List, Optional
+
+TOOL_KEYWORDS: Dict[str, List[str]] = {
+    "get_row_count": [
+        "nechta", "soni", "qancha", "jami", "how many", "count", "number of", "total number"
+    ],
+    "get_recent_records": [
+        "oxirgi", "so'nggi", "songgi", "eng yangi", "yangi", "recent", "latest", "last", "newest"
+    ],
+    "get_sales_stats": [
+        "savdo", "sotuv", "daromad", "sales", "revenue", "statistika", "stats", "ko'rsatkich"
+    ],
+    "get_user_stats": [
+        "foydalanuvchi", "mijoz", "user", "customer", "statistika", "stats"
+    ],
+    "get_order_stats": [
+        "buyurtma", "order", "summa", "statistika", "stats", "amount"
+    ],
+    "get_top_products": [
+        "top", "eng ko'p", "ommabop", "mashhur", "mahsulot", "product", "best", "popular"
+    ],
+    "get_user_orders": [
+        "foydalanuvchining buyurtma", "foydalanuvchi buyurtma", "user orders", "orders of user",
+        "buyurtmalari", "id"
+    ],
+    "get_average_order_value": [
+        "o'rtacha", "ortacha", "average", "avg", "mean"
+    ],
+    "get_sales_by_product": [
+        "mahsulot bo'yicha", "mahsulotlar daromad", "by product", "per product", "daromad", "revenue",
+        "mahsulot", "product"
+    ],
+    "search_orders": [
+        "qidir", "search", "find", "dollardan", "yuqori", "past", "dan ko'p", "dan kam",
+        "above", "below", "more than", "less than", "between"
+    ],
+    "get_user_by_id": [
+        "id", "kim", "who", "ma'lumot", "sarflagan", "spent", "profile", "info"
+    ],
+    "get_users_by_ids": [
+        "foydalanuvchilar", "foydalanuvchilarni", "users", "solishtir", "compare"
+    ],
+    "get_orders_for_users": [
+        "foydalanuvchilarning buyurtma", "foydalanuvchilar buyurtma", "orders of users", "users orders",
+        "users' orders"
+    ],
+    "get_revenue_by_period": [
+        "kun", "kunlik", "hafta", "haftalik", "oy", "oylik", "days", "day", "week", "month",
+        "period", "daromad", "revenue"
+    ],
+    "get_orders_by_date_range": [
+        "sana", "yil", "oralig", "date", "range", "year", "dan boshlab", "gacha", "since", "until"
+    ],
+    "get_distribution": [
+        "mediana", "median", "persentil", "percentil", "kvantil", "quantile", "quartil", "p90", "p95",
+        "p99", "taqsimot", "distribution", "gistogramma", "histogram", "tarqoq", "spread",
+        "daromad taqsimot", "summa taqsimot", "buyurtma taqsimot", "revenue distribution", "amount distribution"
+    ],
+    "get_cohort_retention": [
+        "kohort", "cohort", "retention", "saqlab qol", "qaytib", "qaytgan", "qayta xarid", "takroriy",
+        "repeat", "churn", "qo'shilgan foydalanuvchi", "ro'yxatdan o'tgan", "joined", "signed up",
+        "keyingi oy", "following month"
+    ],
+    "run_query_spec": [
+        "bo'yicha", "har bir", "har oy", "har kun", "guruh", "taqqosla", "by", "per", "each",
+        "group", "breakdown", "compare", "yanvar", "fevral", "mart", "aprel", "may", "iyun",
+        "iyul", "avgust", "sentabr", "oktabr", "noyabr", "dekabr", "january", "february",
+        "march", "april", "june", "july", "august", "september", "october", "november", "december"
+    ],
+}
+
+# Different apostrophes used in Uzbek Latin text ("o‘rtacha", "so`nggi")
+_APOSTROPHES = str.maketrans({"‘": "'", "’": "'", "`": "'", "ʻ": "'", "ʼ": "'"})
+
+_PATTERNS = {
+    tool: [(re.compile(r"\b" + re.escape(keyword)), len(keyword.split())) for keyword in keywords]
+    for tool, keywords in TOOL_KEYWORDS.items()
+}
+
+_USER_ID_PATTERN = re.compile(r"\b(?:id|#)\s*\d+")
+# Several ids ("ID 3, 7 va 12", "users 4 and 9") point at the batch variants
+_USER_IDS_PATTERN = re.compile(r"\b\d+\s*(?:,|va\b|and\b)\s*(?:id\s*|#)?\d+")
+
+
+def score_tools(message: str) -> Dict[str, int]:
+    """
+    Keyword score per tool for the message (0 = no match)
+    """
+    text = message.lower().translate(_APOSTROPHES)
+    scores = {
+        tool: sum(weight for pattern, weight in patterns if pattern.search(text))
+        for tool, patterns in _PATTERNS.items()
+    }
+    # An explicit "ID 5" is a strong hint for the per-user tools
+    if _USER_ID_PATTERN.search(text):
+        scores["get_user_by_id"] += 2
+        scores["get_user_orders"] += 2
+    if _USER_IDS_PATTERN.search(text):
+        scores["get_users_by_ids"] += 3
+        scores["get_orders_for_users"] += 3
+    return scores
+
+
+def select_tools(message: str, max_tools: int, always_include: Iterable[str] = ()) -> Optional[List[str]]:
+    """
+    Names of the most relevant tools (at most max_tools, plus always_include),
+    or None when the message matches nothing and the full set should be used
+    """
+    scores = score_tools(message)
+    ranked = sorted((tool for tool, score in scores.items() if score > 0), key=lambda tool: -scores[tool])
+    if not ranked:
+        return None
+
+    selected = ranked[:max_tools]
+    for tool in always_include:
+        if tool in TOOL_KEYWORDS and tool not in selected:
+            selected.append(tool)
+    return selected
@@ -1,9 +1,50 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
+from sqlalchemy import func, and_, or_, select
 from app.db import models
+from app.db.dialect import date_bucket, dialect_name, iso_timestamp
+from app.services import distribution, parallel_agg, query_spec
+from app.services.cohorts import get_cohort_retention as build_cohort_retention
 from app.core.safety import validate_table_name
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, List, Dict, Any
+
+
+def to_columnar(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Convert a list of row dicts into a compact columnar payload:
+    {"columns": [...], "rows": [[...], ...]}
+    """
+    columns = list(records[0].keys()) if records else []
+    return {
+        "columns": columns,
+        "rows": [[record.get(column) for column in columns] for record in records]
+    }
+
+
+def fetch_rows(db: Session, statement) -> List[Dict[str, Any]]:
+    """
+    Rows of a Core select as dicts. Only the selected columns come back, as
+    plain tuples: no ORM instances, identity-map entries or datetime objects
+    per row (timestamps are formatted in SQL, see timestamp_column)
+    """
+    result = db.execute(statement)
+    columns = tuple(result.keys())
+    return [dict(zip(columns, row)) for row in result]
+
+
+def timestamp_column(db: Session, column):
+    return iso_timestamp(column, dialect_name(db)).label(column.key)
+
+
+def order_columns(db: Session):
+    return (
+        models.Order.id,
+        models.Order.user_id,
+        models.Order.product,
+        models.Order.amount,
+        timestamp_column(db, models.Order.created_at)
+    )
+
 
 def get_row_count(db: Session, table: str):
     """
@@ -23,28 +64,14 @@ def get_row_count(db: Session, table: str):
 
 def get_recent_records(db: Session, table: str, limit: int = 10):
     if table == "orders":
-        orders = db.query(models.Order).order_by(models.Order.created_at.desc()).limit(limit).all()
-        return [
-            {
-                "id": order.id,
-                "user_id": order.user_id,
-                "product": order.product,
-                "amount": order.amount,
-                "created_at": order.created_at.isoformat() if order.created_at else None
-            }
-            for order in orders
-        ]
+        return fetch_rows(db, select(*order_columns(db)).order_by(models.Order.created_at.desc()).limit(limit))
     if table == "sales":
-        sales = db.query(models.Sale).order_by(models.Sale.created_at.desc()).limit(limit).all()
-        return [
-            {
-                "id": sale.id,
-                "order_id": sale.order_id,
-                "revenue": sale.revenue,
-                "created_at": sale.created_at.isoformat() if sale.created_at else None
-            }
-            for sale in sales
-        ]
+        return fetch_rows(db, select(
+            models.Sale.id,
+            models.Sale.order_id,
+            models.Sale.revenue,
+            timestamp_column(db, models.Sale.created_at)
+        ).order_by(models.Sale.created_at.desc()).limit(limit))
     return []
 
 
@@ -66,7 +93,10 @@ def get_sales_stats(db: Session):
 def get_user_stats(db: Session):
     """Get user statistics"""
     total_users = db.query(func.count(models.User.id)).scalar() or 0
-    users_with_orders = db.query(func.count(func.distinct(models.Order.user_id))).scalar() or 0
+    # Indexed count over the maintained order_count instead of scanning orders
+    users_with_orders = db.query(func.count(models.User.id)).filter(
+        models.User.order_count > 0
+    ).scalar() or 0
     
     return {
         "total_users": total_users,
@@ -77,6 +107,10 @@ def get_user_stats(db: Session):
 
 def get_order_stats(db: Session):
     """Get order statistics"""
+    shards = parallel_agg.plan_shards(db, models.Order.__table__)
+    if shards:
+        return parallel_agg.order_stats(db, shards)
+    
     total_orders = db.query(func.count(models.Order.id)).scalar() or 0
     total_amount = db.query(func.sum(models.Order.amount)).scalar() or 0
     avg_amount = db.query(func.avg(models.Order.amount)).scalar() or 0
@@ -94,6 +128,10 @@ def get_order_stats(db: Session):
 
 def get_top_products(db: Session, limit: int = 10):
     """Get top products by order count"""
+    shards = parallel_agg.plan_shards(db, models.Order.__table__)
+    if shards:
+        return parallel_agg.top_products(db, shards, limit)
+    
     products = db.query(
         models.Order.product,
         func.count(models.Order.id).label('order_count'),
@@ -112,21 +150,54 @@ def get_top_products(db: Session, limit: int = 10):
     ]
 
 
+def _user_order_dict(order) -> Dict[str, Any]:
+    return {
+        "id": order.id,
+        "product": order.product,
+        "amount": order.amount,
+        "created_at": order.created_at
+    }
+
+
 def get_user_orders(db: Session, user_id: int, limit: int = 10):
     """Get orders for a specific user"""
-    orders = db.query(models.Order).filter(
+    return fetch_rows(db, select(
+        models.Order.id,
+        models.Order.product,
+        models.Order.amount,
+        timestamp_column(db, models.Order.created_at)
+    ).where(
         models.Order.user_id == user_id
-    ).order_by(models.Order.created_at.desc()).limit(limit).all()
+    ).order_by(models.Order.created_at.desc()).limit(limit))
+
+
+def get_orders_for_users(db: Session, user_ids: List[int], limit: int = 10):
+    """
+    Latest orders of several users in one query, keyed by user id.
+    Each user's rows are numbered newest first (row_number over the
+    (user_id, created_at) index) and only the first `limit` are kept.
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    ranked = db.query(
+        models.Order.id,
+        models.Order.user_id,
+        models.Order.product,
+        models.Order.amount,
+        timestamp_column(db, models.Order.created_at),
+        func.row_number().over(
+            partition_by=models.Order.user_id,
+            order_by=(models.Order.created_at.desc(), models.Order.id.desc())
+        ).label("position")
+    ).filter(models.Order.user_id.in_(user_ids)).subquery()
     
-    return [
-        {
-            "id": order.id,
-            "product": order.product,
-            "amount": order.amount,
-            "created_at": order.created_at.isoformat() if order.created_at else None
-        }
-        for order in orders
-    ]
+    orders = db.query(ranked).filter(ranked.c.position <= limit).order_by(
+        ranked.c.user_id, ranked.c.position
+    ).all()
+    
+    result: Dict[int, List[Dict[str, Any]]] = {user_id: [] for user_id in user_ids}
+    for order in orders:
+        result[order.user_id].append(_user_order_dict(order))
+    return result
 
 
 def get_average_order_value(db: Session):
@@ -139,6 +210,10 @@ def get_average_order_value(db: Session):
 
 def get_sales_by_product(db: Session, limit: int = 10):
     """Get sales statistics by product"""
+    shards = parallel_agg.plan_shards(db, models.Sale.__table__)
+    if shards:
+        return parallel_agg.sales_by_product(db, shards, limit)
+    
     sales_by_product = db.query(
         models.Order.product,
         func.count(models.Sale.id).label('sale_count'),
@@ -164,107 +239,148 @@ def get_sales_by_product(db: Session, limit: int = 10):
 def search_orders(db: Session, product: Optional[str] = None, min_amount: Optional[float] = None, 
                   max_amount: Optional[float] = None, limit: int = 20):
     """Search orders by product name or amount range"""
-    query = db.query(models.Order)
+    query = select(*order_columns(db))
     
     if product:
-        query = query.filter(models.Order.product.ilike(f"%{product}%"))
+        query = query.where(models.Order.product.ilike(f"%{product}%"))
     
     if min_amount is not None:
-        query = query.filter(models.Order.amount >= min_amount)
+        query = query.where(models.Order.amount >= min_amount)
     
     if max_amount is not None:
-        query = query.filter(models.Order.amount <= max_amount)
+        query = query.where(models.Order.amount <= max_amount)
     
-    orders = query.order_by(models.Order.created_at.desc()).limit(limit).all()
-    
-    return [
-        {
-            "id": order.id,
-            "user_id": order.user_id,
-            "product": order.product,
-            "amount": order.amount,
-            "created_at": order.created_at.isoformat() if order.created_at else None
-        }
-        for order in orders
-    ]
+    return fetch_rows(db, query.order_by(models.Order.created_at.desc()).limit(limit))
 
 
-def get_user_by_id(db: Session, user_id: int):
-    """Get user information by ID"""
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
-        return None
-    
-    order_count = db.query(func.count(models.Order.id)).filter(
-        models.Order.user_id == user_id
-    ).scalar() or 0
-    
-    total_spent = db.query(func.sum(models.Order.amount)).filter(
-        models.Order.user_id == user_id
-    ).scalar() or 0
-    
+def _user_dict(user) -> Dict[str, Any]:
     return {
         "id": user.id,
         "name": user.name,
         "email": user.email,
-        "created_at": user.created_at.isoformat() if user.created_at else None,
-        "order_count": order_count,
-        "total_spent": float(total_spent)
+        "created_at": user.created_at,
+        "order_count": user.order_count or 0,
+        "total_spent": float(user.total_spent or 0),
+        "first_order_at": user.first_order_at,
+        "last_order_at": user.last_order_at
     }
 
 
-def get_revenue_by_period(db: Session, days: int = 30):
-    """Get revenue statistics for the last N days"""
-    cutoff_date = datetime.utcnow() - timedelta(days=days)
+def user_columns(db: Session):
+    return (
+        models.User.id,
+        models.User.name,
+        models.User.email,
+        timestamp_column(db, models.User.created_at),
+        models.User.order_count,
+        models.User.total_spent,
+        timestamp_column(db, models.User.first_order_at),
+        timestamp_column(db, models.User.last_order_at)
+    )
+
+
+def get_user_by_id(db: Session, user_id: int):
+    """Get user information by ID (single primary-key read, aggregates are denormalized)"""
+    user = db.execute(select(*user_columns(db)).where(models.User.id == user_id)).first()
+    if not user:
+        return None
     
-    total_revenue = db.query(func.sum(models.Sale.revenue)).filter(
-        models.Sale.created_at >= cutoff_date
-    ).scalar() or 0
+    return _user_dict(user)
+
+
+def get_users_by_ids(db: Session, user_ids: List[int]):
+    """Get several users in one primary-key IN query, keyed by id (None for unknown ids)"""
+    user_ids = list(dict.fromkeys(user_ids))
+    users = db.execute(select(*user_columns(db)).where(models.User.id.in_(user_ids))).all()
     
-    sale_count = db.query(func.count(models.Sale.id)).filter(
-        models.Sale.created_at >= cutoff_date
-    ).scalar() or 0
+    result: Dict[int, Optional[Dict[str, Any]]] = {user_id: None for user_id in user_ids}
+    for user in users:
+        result[user.id] = _user_dict(user)
+    return result
+
+
+def get_revenue_by_period(db: Session, days: int = 30, group_by: Optional[str] = None):
+    """Get revenue statistics for the last N days, optionally as a day/week/month series"""
+    cutoff_date = datetime.utcnow() - timedelta(days=days)
     
-    avg_revenue = db.query(func.avg(models.Sale.revenue)).filter(
+    # One scan of the (created_at, revenue) index range instead of three
+    totals = db.query(
+        func.sum(models.Sale.revenue).label("total_revenue"),
+        func.count(models.Sale.id).label("sale_count"),
+        func.avg(models.Sale.revenue).label("avg_revenue")
+    ).filter(
         models.Sale.created_at >= cutoff_date
-    ).scalar() or 0
+    ).one()
     
-    return {
+    result = {
         "period_days": days,
-        "total_revenue": float(total_revenue),
-        "sale_count": sale_count,
-        "avg_revenue": float(avg_revenue) if avg_revenue else 0
+        "total_revenue": float(totals.total_revenue or 0),
+        "sale_count": totals.sale_count or 0,
+        "avg_revenue": float(totals.avg_revenue) if totals.avg_revenue else 0
     }
+    
+    if group_by:
+        bucket = date_bucket(models.Sale.created_at, group_by, dialect_name(db)).label("period")
+        rows = db.query(
+            bucket,
+            func.sum(models.Sale.revenue).label("revenue"),
+            func.count(models.Sale.id).label("sale_count")
+        ).filter(
+            models.Sale.created_at >= cutoff_date
+        ).group_by(bucket).order_by(bucket).all()
+        result["group_by"] = group_by
+        result["series"] = [
+            {"period": row.period, "revenue": float(row.revenue or 0), "sale_count": row.sale_count}
+            for row in rows
+        ]
+    
+    return result
 
 
 def get_orders_by_date_range(db: Session, start_date: Optional[str] = None, 
                               end_date: Optional[str] = None, limit: int = 50):
     """Get orders within a date range"""
-    query = db.query(models.Order)
+    query = select(*order_columns(db))
     
     if start_date:
         try:
             start = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-            query = query.filter(models.Order.created_at >= start)
+            query = query.where(models.Order.created_at >= start)
         except:
             pass
     
     if end_date:
         try:
             end = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-            query = query.filter(models.Order.created_at <= end)
+            query = query.where(models.Order.created_at <= end)
         except:
             pass
     
-    orders = query.order_by(models.Order.created_at.desc()).limit(limit).all()
-    
-    return [
-        {
-            "id": order.id,
-            "user_id": order.user_id,
-            "product": order.product,
-            "amount": order.amount,
-            "created_at": order.created_at.isoformat() if order.created_at else None
-        }
-        for order in orders
-    ]
+    return fetch_rows(db, query.order_by(models.Order.created_at.desc()).limit(limit))
+
+
+def get_distribution(db: Session, table: str = "orders", group_by: Optional[str] = None,
+                     days: Optional[int] = None, quantiles: Optional[List[float]] = None,
+                     bins: int = 20, scale: str = "linear", limit: int = 10):
+    """Quantiles and histogram of order amounts or sale revenue (see app/services/distribution.py)"""
+    return distribution.get_distribution(db, table, group_by, days, quantiles, bins, scale, limit)
+
+
+def get_cohort_retention(db: Session, start_month: Optional[str] = None, cohorts: int = 6, periods: int = 6):
+    """Monthly signup cohorts and the share ordering in each following month (see app/services/cohorts.py)"""
+    return build_cohort_retention(db, start_month, cohorts, periods)
+
+
+def run_query_spec(db: Session, table: str, filters: Optional[List[Dict[str, Any]]] = None,
+                   group_by: Optional[List[Any]] = None, aggregates: Optional[List[Dict[str, Any]]] = None,
+                   columns: Optional[List[str]] = None, order_by: Optional[List[Any]] = None, limit: int = 50):
+    """Run an ad-hoc query spec, validated and cost-checked (see app/services/query_spec.py)"""
+    return query_spec.run_query_spec(db, {
+        "table": table,
+        "filters": filters,
+        "group_by": group_by,
+        "aggregates": aggregates,
+        "columns": columns,
+        "order_by": order_by,
+        "limit": limit
+    })
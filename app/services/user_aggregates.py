@@ -0,0 +1,69 @@
+"""
+Reconciliation job for the denormalized per-user order aggregates.
+Order inserts keep users.order_count / total_spent / first_order_at /
+last_order_at up to date; bulk deletes, manual edits or imports that bypass
+the ORM can make them drift, and this job recomputes them from orders.
+"""
+from typing import Dict
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+from app.db import models
+from app.db.dialect import STREAM_BATCH_SIZE
+
+# Float sums are compared with a tolerance to avoid rewriting rounding noise
+AMOUNT_TOLERANCE = 1e-6
+
+
+def reconcile_user_aggregates(db: Session) -> Dict[str, int]:
+    """
+    Recompute order aggregates for every user and repair the ones that drifted.
+    Returns the number of users checked and repaired
+    """
+    actual = {
+        row.user_id: row
+        for row in db.query(
+            models.Order.user_id,
+            func.count(models.Order.id).label("order_count"),
+            func.sum(models.Order.amount).label("total_spent"),
+            func.min(models.Order.created_at).label("first_order_at"),
+            func.max(models.Order.created_at).label("last_order_at")
+        ).group_by(models.Order.user_id).yield_per(STREAM_BATCH_SIZE)
+    }
+
+    # Streamed in batches (server-side cursor on PostgreSQL) instead of loading every user
+    stored = db.query(
+        models.User.id,
+        models.User.order_count,
+        models.User.total_spent,
+        models.User.first_order_at,
+        models.User.last_order_at
+    ).yield_per(STREAM_BATCH_SIZE)
+
+    checked = 0
+    repairs = []
+    for user in stored:
+        checked += 1
+        row = actual.get(user.id)
+        expected = {
+            "order_count": row.order_count if row else 0,
+            "total_spent": float(row.total_spent or 0) if row else 0.0,
+            "first_order_at": row.first_order_at if row else None,
+            "last_order_at": row.last_order_at if row else None
+        }
+
+        if (
+            user.order_count != expected["order_count"]
+            or abs((user.total_spent or 0) - expected["total_spent"]) > AMOUNT_TOLERANCE
+            or user.first_order_at != expected["first_order_at"]
+            or user.last_order_at != expected["last_order_at"]
+        ):
+            repairs.append({"id": user.id, **expected})
+
+    if repairs:
+        db.execute(update(models.User), repairs)
+        db.commit()
+
+    return {
+        "checked": checked,
+        "repaired": len(repairs)
+    }
@@ -0,0 +1,166 @@
+"""
+Server-side shaping of visualization payloads.
+Keeps what the browser receives bounded whatever the result size:
+- time series are downsampled with LTTB (Largest-Triangle-Three-Buckets) to
+  VIS_MAX_POINTS, which keeps peaks and dips a plain stride would drop
+- bar/pie categories beyond VIS_MAX_CATEGORIES are folded into one "other"
+  slice (or just cut, when the values are not additive)
+- tables send VIS_TABLE_PAGE_ROWS rows; the rest is held server-side and
+  fetched page by page with a cursor (GET /api/data/rows)
+"""
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from app.core.config import settings
+
+OTHER_LABEL = "Boshqa"
+
+
+def lttb(values: Sequence[float], threshold: int) -> List[int]:
+    """
+    Indices of the points to keep (first and last always included).
+    Points are taken as evenly spaced on the x axis (period buckets).
+    """
+    n = len(values)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    selected = [0]
+    bucket_size = (n - 2) / (threshold - 2)
+    previous = 0
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        # Average of the next bucket (the last point for the final bucket)
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        avg_x = (end + next_end - 1) / 2
+        avg_y = sum(values[end:next_end]) / (next_end - end)
+
+        prev_x, prev_y = previous, values[previous]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((prev_x - avg_x) * (values[j] - prev_y) - (prev_x - j) * (avg_y - prev_y))
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        previous = best
+    selected.append(n - 1)
+    return selected
+
+
+def downsample_series(series: List[Dict[str, Any]], value_key: str,
+                      max_points: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    At most max_points of series, chosen by LTTB on value_key
+    """
+    max_points = max_points or settings.VIS_MAX_POINTS
+    if len(series) <= max_points:
+        return series
+    values = [point.get(value_key) or 0 for point in series]
+    return [series[i] for i in lttb(values, max_points)]
+
+
+def top_n_with_other(labels: List[Any], values: List[float], n: Optional[int] = None,
+                     additive: bool = True) -> Tuple[List[Any], List[float], int]:
+    """
+    The n largest categories, plus one OTHER_LABEL slice summing the rest when
+    the values are additive (counts, sums). Returns (labels, values, folded count)
+    """
+    n = n or settings.VIS_MAX_CATEGORIES
+    if len(labels) <= n:
+        return labels, values, 0
+    ranked = sorted(zip(labels, values), key=lambda item: item[1] or 0, reverse=True)
+    kept, rest = ranked[:n], ranked[n:]
+    labels = [label for label, _ in kept]
+    values = [value for _, value in kept]
+    if additive:
+        labels.append(OTHER_LABEL)
+        values.append(sum(value or 0 for _, value in rest))
+    return labels, values, len(rest)
+
+
+def label_value_columns(rows: List[Dict[str, Any]]) -> Optional[Tuple[str, str]]:
+    """
+    (label, value) column names when every row is one text label and one
+    number, e.g. a query spec grouped by one column with one aggregate
+    """
+    if len(rows) < 2 or len(rows[0]) != 2:
+        return None
+    label, value = rows[0].keys()
+    for row in rows:
+        if not isinstance(row[label], str) or not isinstance(row[value], (int, float)) \
+                or isinstance(row[value], bool):
+            return None
+    return label, value
+
+
+def is_period_label(value: str) -> bool:
+    """
+    'YYYY-MM' or 'YYYY-MM-DD' date bucket labels
+    """
+    return len(value) in (7, 10) and value[:4].isdigit() and value[4] == "-" and value[5:7].isdigit()
+
+
+class RowCursorStore:
+    """
+    Table rows beyond the first page, kept for VIS_CURSOR_TTL_SECONDS.
+    A cursor is "<id>:<offset>", so every page hands out the next one.
+    Stored rows are shared results and are never modified.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._rows: "OrderedDict[str, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+
+    def _evict(self, now: float) -> None:
+        while self._rows:
+            key, (stored_at, _) = next(iter(self._rows.items()))
+            if len(self._rows) <= self.max_entries and now - stored_at < self.ttl_seconds:
+                break
+            del self._rows[key]
+
+    def first_page(self, rows: List[Dict[str, Any]], page_size: Optional[int] = None
+                   ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        The first page of rows and a cursor for the next one (None if it all fits)
+        """
+        page_size = page_size or settings.VIS_TABLE_PAGE_ROWS
+        if len(rows) <= page_size:
+            return rows, None
+        cursor_id = secrets.token_urlsafe(9)
+        now = time.time()
+        with self._lock:
+            self._rows[cursor_id] = (now, rows)
+            self._evict(now)
+        return rows[:page_size], f"{cursor_id}:{page_size}"
+
+    def page(self, cursor: str, page_size: Optional[int] = None
+             ) -> Optional[Tuple[List[Dict[str, Any]], Optional[str], int]]:
+        """
+        (rows, next cursor, total rows) or None when the cursor is unknown or expired
+        """
+        page_size = page_size or settings.VIS_TABLE_PAGE_ROWS
+        cursor_id, _, offset = cursor.partition(":")
+        if not offset.isdigit():
+            return None
+        offset = int(offset)
+        with self._lock:
+            self._evict(time.time())
+            entry = self._rows.get(cursor_id)
+        if entry is None:
+            return None
+        rows = entry[1]
+        end = offset + page_size
+        next_cursor = f"{cursor_id}:{end}" if end < len(rows) else None
+        return rows[offset:end], next_cursor, len(rows)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"cursors": len(self._rows)}
+
+
+row_cursors = RowCursorStore(settings.VIS_CURSOR_TTL_SECONDS, settings.VIS_CURSOR_MAX_ENTRIES)
@@ -0,0 +1,212 @@
+"""
+Precomputed dashboard results with scheduled refresh.
+A background thread computes the WARMUP_JOBS calls (data summary and the
+headline tools) at startup and re-checks them every WARMUP_REFRESH_SECONDS.
+A cached result is exact while the data version it was computed at is
+current, so the refresh only recomputes after a write. When a request finds
+the version has moved on, it still gets the cached result immediately
+(stale-while-revalidate, for at most WARMUP_MAX_STALE_SECONDS since the
+result was last known current) and the refresh runs in the background.
+Cached results are shared between requests and must be treated as read-only.
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.singleflight import Key, flight, make_key
+from app.db.models import get_data_version
+from app.db.snapshot import open_read_session
+from app.services import tools
+from app.services.summary import get_data_summary
+
+logger = logging.getLogger(__name__)
+
+# Job name for the /api/data/summary payload (everything else is a tool name)
+DATA_SUMMARY = "data_summary"
+DATA_SUMMARY_KEY = make_key("get_data_summary", {})
+
+
+class CacheEntry(NamedTuple):
+    value: Any
+    version: int
+    computed_at: float
+    # Last time the scheduler saw `version` still current
+    verified_at: float
+
+
+class WarmJob:
+    def __init__(self, name: str, key: Key, fn: Callable[[Session], Any]):
+        self.name = name
+        self.key = key
+        self.fn = fn
+        self.next_run = 0.0
+        self.runs = 0
+        self.skipped = 0
+        self.failures = 0
+        self.last_ms: Optional[float] = None
+        self.total_ms = 0.0
+        self.last_error: Optional[str] = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "runs": self.runs,
+            "skipped_unchanged": self.skipped,
+            "failures": self.failures,
+            "last_ms": self.last_ms,
+            "avg_ms": round(self.total_ms / self.runs, 2) if self.runs else None,
+            "last_error": self.last_error
+        }
+
+
+def build_job(name: str) -> WarmJob:
+    """
+    data_summary, or any tool called with its default arguments
+    """
+    if name == DATA_SUMMARY:
+        return WarmJob(name, DATA_SUMMARY_KEY, get_data_summary)
+    tool_fn = getattr(tools, name, None)
+    if tool_fn is None:
+        raise ValueError(f"Unknown warmup job '{name}'")
+    return WarmJob(name, make_key(name, {}, func=tool_fn), tool_fn)
+
+
+class Warmup:
+    def __init__(self, jobs: List[WarmJob], refresh_seconds: float, max_stale_seconds: float):
+        self.jobs = {job.key: job for job in jobs}
+        self.refresh_seconds = refresh_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self._entries: Dict[Key, CacheEntry] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def serve(self, key: Key, db: Session) -> Optional[CacheEntry]:
+        """
+        Cached entry for a warmed call, or None if the caller must compute it.
+        A stale entry (older data version) is returned while a refresh is queued.
+        """
+        job = self.jobs.get(key)
+        if job is None:
+            return None
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.version == get_data_version(db):
+            self.hits += 1
+            return entry
+        self._request_refresh(job)
+        if time.time() - entry.verified_at > self.max_stale_seconds:
+            self.misses += 1
+            return None
+        self.stale_hits += 1
+        return entry
+
+    def _request_refresh(self, job: WarmJob) -> None:
+        with self._lock:
+            job.next_run = 0.0
+        self._wake.set()
+
+    def run_job(self, job: WarmJob) -> None:
+        """
+        Recompute one job if the data changed since its cached result
+        """
+        started = time.perf_counter()
+        try:
+            with open_read_session() as db:
+                version = get_data_version(db)
+                entry = self._entries.get(job.key)
+                now = time.time()
+                if entry is not None and entry.version == version:
+                    self._entries[job.key] = entry._replace(verified_at=now)
+                    job.skipped += 1
+                    return
+                # Requests that miss meanwhile join this computation
+                value = flight.do(job.key, lambda: job.fn(db))
+                self._entries[job.key] = CacheEntry(value, version, now, now)
+            job.runs += 1
+            job.last_ms = round((time.perf_counter() - started) * 1000, 2)
+            job.total_ms += job.last_ms
+            job.last_error = None
+        except Exception as e:
+            job.failures += 1
+            job.last_error = str(e)
+            logger.error(f"Warmup job {job.name} failed: {e}")
+
+    def run_due(self) -> float:
+        """
+        Run every job that is due; returns seconds until the next one
+        """
+        now = time.monotonic()
+        for job in self.jobs.values():
+            with self._lock:
+                due = job.next_run <= now
+                if due:
+                    job.next_run = now + self.refresh_seconds
+            if due:
+                self.run_job(job)
+        return max(0.0, min(job.next_run for job in self.jobs.values()) - time.monotonic())
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            wait = self.run_due()
+            self._wake.wait(wait)
+            self._wake.clear()
+
+    def start(self) -> None:
+        """
+        Start the scheduler; the first pass (startup warmup) runs right away in the background
+        """
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refresh_seconds": self.refresh_seconds,
+            "jobs": {
+                job.name: {
+                    **job.stats(),
+                    "cached_version": self._entries[job.key].version if job.key in self._entries else None,
+                    "age_seconds": round(now - self._entries[job.key].computed_at, 1)
+                    if job.key in self._entries else None
+                }
+                for job in self.jobs.values()
+            }
+        }
+
+
+def build_warmup() -> Optional[Warmup]:
+    """
+    None when WARMUP_ENABLED is off or no jobs are configured
+    """
+    if not settings.WARMUP_ENABLED:
+        return None
+    names = [name.strip() for name in settings.WARMUP_JOBS.split(",") if name.strip()]
+    if not names:
+        return None
+    return Warmup(
+        [build_job(name) for name in names],
+        settings.WARMUP_REFRESH_SECONDS,
+        settings.WARMUP_MAX_STALE_SECONDS
+    )
+
+
+warmup = build_warmup()
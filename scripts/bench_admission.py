@@ -0,0 +1,151 @@
+"""
+Admission control under a chat burst.
+
+Serves a stand-in app over uvicorn: /api/chat holds a threadpool thread for
+--chat-seconds (like a chat waiting on the LLM and SQLite), /api/health
+returns immediately. Fires --burst concurrent chats from --clients clients
+while polling /api/health, once without admission and once through
+AdmissionMiddleware, and reports chat status codes and health latency.
+Chats arrive at --arrival-rate per second so the client's own connection
+setup doesn't dominate the measurement on small machines.
+
+    python scripts/bench_admission.py --burst 300 --clients 4 --chat-seconds 2
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+from app.core.admission import AdmissionController, AdmissionMiddleware, ConcurrencyLimiter, MemoryBucketStore
+
+
+def build_app(chat_seconds: float, controller=None) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/api/chat")
+    def chat():
+        time.sleep(chat_seconds)
+        return {"answer": "ok"}
+
+    @app.get("/api/health")
+    def health():
+        return {"status": "healthy"}
+
+    if controller is not None:
+        app.add_middleware(AdmissionMiddleware, controller=controller)
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Server:
+    def __init__(self, app):
+        self.port = free_port()
+        self.server = uvicorn.Server(uvicorn.Config(app, port=self.port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return f"http://127.0.0.1:{self.port}"
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+async def run_burst(base_url: str, burst: int, clients: int, arrival_rate: float, timeout: float):
+    limits = httpx.Limits(max_connections=burst + 10)
+    # Separate client so health checks don't queue behind the burst's connection pool
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as http, \
+            httpx.AsyncClient(base_url=base_url, timeout=timeout) as probe:
+        done = asyncio.Event()
+        health_ms = []
+
+        async def poll_health():
+            while not done.is_set():
+                started = time.perf_counter()
+                try:
+                    await probe.get("/api/health")
+                    health_ms.append((time.perf_counter() - started) * 1000)
+                except httpx.TimeoutException:
+                    health_ms.append(timeout * 1000)
+                await asyncio.sleep(0.05)
+
+        async def one_chat(i: int):
+            await asyncio.sleep(i / arrival_rate)
+            try:
+                response = await http.post("/api/chat", json={"message": "hi"},
+                                           headers={"x-client": f"client-{i % clients}"})
+                return response.status_code, response.headers.get("retry-after")
+            except httpx.TimeoutException:
+                return "timeout", None
+
+        poller = asyncio.create_task(poll_health())
+        started = time.perf_counter()
+        results = await asyncio.gather(*(one_chat(i) for i in range(burst)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await poller
+
+    statuses = Counter(status for status, _ in results)
+    retry_afters = sorted({int(value) for _, value in results if value})
+    return statuses, retry_afters, health_ms, elapsed
+
+
+def report(label, statuses, retry_afters, health_ms, elapsed):
+    health_ms = sorted(health_ms)
+    p99 = health_ms[min(len(health_ms) - 1, int(len(health_ms) * 0.99))] if health_ms else 0
+    print(f"\n{label}")
+    print(f"  chat statuses:       {dict(statuses)}  (burst drained in {elapsed:.1f}s)")
+    if retry_afters:
+        print(f"  Retry-After values:  {retry_afters}")
+    print(f"  health checks:       {len(health_ms)}, median {statistics.median(health_ms):.1f} ms, "
+          f"p99 {p99:.1f} ms, max {health_ms[-1]:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--burst", type=int, default=300)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--chat-seconds", type=float, default=2)
+    parser.add_argument("--arrival-rate", type=float, default=100)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--rate-per-minute", type=float, default=600)
+    parser.add_argument("--burst-tokens", type=float, default=30)
+    parser.add_argument("--max-concurrent", type=int, default=16)
+    parser.add_argument("--max-queue", type=int, default=32)
+    parser.add_argument("--queue-timeout", type=float, default=2)
+    args = parser.parse_args()
+
+    with Server(build_app(args.chat_seconds)) as url:
+        report("no admission control", *asyncio.run(run_burst(url, args.burst, args.clients, args.arrival_rate, args.timeout)))
+
+    controller = AdmissionController(
+        MemoryBucketStore(), args.rate_per_minute, args.burst_tokens,
+        ConcurrencyLimiter(args.max_concurrent, args.max_queue, args.queue_timeout),
+        ("/api/chat",), client_header="x-client"
+    )
+    with Server(build_app(args.chat_seconds, controller)) as url:
+        report("admission control", *asyncio.run(run_burst(url, args.burst, args.clients, args.arrival_rate, args.timeout)))
+    print(f"  controller:          {controller.stats()}")
+
+
+if __name__ == "__main__":
+    main()
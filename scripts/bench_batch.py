@@ -0,0 +1,81 @@
+"""
+Per-call loop vs batch evaluation of the per-user tools.
+
+Builds a throwaway SQLite database, then answers get_user_by_id and
+get_user_orders for N user ids (a few unknown) both ways: one tool call per
+id, and one app.services.batch.run_batch call per tool. Checks the results
+are identical and reports SQL statements executed and wall time.
+
+    python scripts/bench_batch.py --users 10 50 200 --rows-per-day 300
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+from scripts.bench_time_range import USERS, build
+from app.services import tools
+from app.services.batch import run_batch
+
+
+class StatementCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+
+def measure(counter, fn):
+    counter.count = 0
+    started = time.perf_counter()
+    result = fn()
+    return result, counter.count, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--rows-per-day", type=int, default=300)
+    parser.add_argument("--years", type=int, default=1)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = build(os.path.join(tmp, "bench.db"), args.years, args.rows_per_day)
+        counter = StatementCounter(engine)
+        Session = sessionmaker(bind=engine)
+        failures = 0
+
+        print(f"{'tool':<16} {'ids':>5} {'loop stmts':>11} {'loop ms':>9} {'batch stmts':>12} {'batch ms':>9}")
+        with Session() as db:
+            for n in args.users:
+                ids = random.sample(range(1, USERS + 1), n - 2) + [USERS + 1, USERS + 2]
+                cases = [
+                    ("get_user_by_id", lambda uid: tools.get_user_by_id(db, uid), [{"user_id": uid} for uid in ids]),
+                    ("get_user_orders", lambda uid: tools.get_user_orders(db, uid, limit=args.limit),
+                     [{"user_id": uid, "limit": args.limit} for uid in ids]),
+                ]
+                for name, single, arg_sets in cases:
+                    looped, loop_stmts, loop_ms = measure(counter, lambda: [single(uid) for uid in ids])
+                    batch, batch_stmts, batch_ms = measure(counter, lambda: run_batch(db, name, arg_sets))
+                    if [item["result"] for item in batch["results"]] != looped:
+                        failures += 1
+                        print(f"MISMATCH {name} for {n} ids")
+                    print(f"{name:<16} {n:>5} {loop_stmts:>11} {loop_ms:>9.1f} {batch_stmts:>12} {batch_ms:>9.1f}")
+        engine.dispose()
+
+    print("\nresults identical" if not failures else f"\n{failures} mismatches")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Dashboard refresh cost: full summary aggregates vs the change feed.
+
+Builds a throwaway SQLite database with synthetic history, then repeatedly
+writes a few orders/sales (inserts, amount updates, deletes) and refreshes
+the data summary both ways: re-running get_data_summary over whole tables,
+and ChangeFeed.poll() applying only the new change_log rows. Checks the
+incremental totals match the full recomputation after every round.
+
+    python scripts/bench_changes.py --years 2 --rows-per-day 1000 --rounds 20 --writes 10
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.orm import sessionmaker
+from scripts.bench_time_range import USERS, build
+from app.db import models
+from app.db.migrations import run_migrations
+from app.services.changes import ChangeFeed
+from app.services.summary import get_data_summary
+
+
+def ms_since(started: float) -> float:
+    return (time.perf_counter() - started) * 1000
+
+
+def write_round(db, writes: int) -> None:
+    for _ in range(writes):
+        roll = random.random()
+        if roll < 0.6:
+            amount = round(random.uniform(10, 500), 2)
+            order = models.Order(user_id=random.randint(1, USERS), product="Laptop", amount=amount)
+            db.add(order)
+            db.flush()
+            db.add(models.Sale(order_id=order.id, revenue=round(amount * 1.3, 2)))
+        elif roll < 0.85:
+            sale = db.get(models.Sale, random.randint(1, 1000))
+            if sale is not None:
+                sale.revenue = round(random.uniform(10, 650), 2)
+        else:
+            order = db.get(models.Order, random.randint(1, 1000))
+            if order is not None:
+                db.delete(order)
+    db.commit()
+
+
+def same_totals(expected: dict, got: dict) -> bool:
+    return all(
+        abs(expected["tables"][table][name] - got["tables"][table][name]) < 1e-6 * max(1, abs(expected["tables"][table][name]))
+        for table in expected["tables"] for name in expected["tables"][table]
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=int, default=2)
+    parser.add_argument("--rows-per-day", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--writes", type=int, default=10, help="writes between refreshes")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = build(os.path.join(tmp, "bench.db"), args.years, args.rows_per_day)
+        run_migrations(engine)
+        Session = sessionmaker(bind=engine)
+        feed = ChangeFeed(Session, poll_seconds=0, batch_size=10000, buffer_size=100,
+                          retention_rows=100000, max_subscribers=1, verify_seconds=0)
+        started = time.perf_counter()
+        feed.load()
+        print(f"orders: {args.years * 365 * args.rows_per_day}, baseline load: {ms_since(started):.1f} ms")
+
+        full_ms, incremental_ms, mismatches = [], [], 0
+        with Session() as db:
+            for _ in range(args.rounds):
+                write_round(db, args.writes)
+
+                started = time.perf_counter()
+                expected = get_data_summary(db)
+                full_ms.append(ms_since(started))
+
+                started = time.perf_counter()
+                feed.poll()
+                incremental_ms.append(ms_since(started))
+
+                if not same_totals(expected, feed.snapshot().data):
+                    mismatches += 1
+        engine.dispose()
+
+    print(f"{'refresh':<22} {'median ms':>10} {'max ms':>8}")
+    print(f"{'full aggregates':<22} {statistics.median(full_ms):>10.2f} {max(full_ms):>8.2f}")
+    print(f"{'change feed poll':<22} {statistics.median(incremental_ms):>10.2f} {max(incremental_ms):>8.2f}")
+    print(f"changes applied: {feed.changes}")
+    print("\ntotals identical" if not mismatches else f"\n{mismatches} mismatching rounds")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
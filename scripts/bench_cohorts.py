@@ -0,0 +1,120 @@
+"""
+Cohort retention: joining users with every order vs the activity matrix.
+
+Builds a throwaway SQLite database where users sign up over the last
+--months months and order afterwards, backfills user_activity, then answers
+the same retention question two ways: a GROUP BY over users JOIN orders
+(distinct users per signup month and order month), and get_cohort_retention
+over the per-user bitmasks. Checks the active-user counts are identical.
+
+    python scripts/bench_cohorts.py --users 20000 --orders 1000000 --months 12
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, distinct, func
+from sqlalchemy.orm import sessionmaker
+from app.db.database import Base
+from app.db import models
+from app.db.dialect import date_bucket
+from app.services.cohorts import get_cohort_retention, reconcile_user_activity
+
+
+def build(path: str, users: int, orders: int, months: int):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    now = datetime.utcnow()
+    span = months * 30 * 86400
+    signups = [now - timedelta(seconds=random.uniform(0, span)) for _ in range(users)]
+    with engine.begin() as conn:
+        conn.execute(models.User.__table__.insert(), [
+            {"id": i + 1, "name": f"user{i}", "email": f"user{i}@example.com", "created_at": created}
+            for i, created in enumerate(signups)
+        ])
+        batch = []
+        for order_id in range(1, orders + 1):
+            user_id = random.randint(1, users)
+            age = (now - signups[user_id - 1]).total_seconds()
+            batch.append({"id": order_id, "user_id": user_id, "product": "Laptop", "amount": 100.0,
+                          "created_at": now - timedelta(seconds=random.uniform(0, age))})
+            if len(batch) == 10000:
+                conn.execute(models.Order.__table__.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(models.Order.__table__.insert(), batch)
+    return engine
+
+
+def join_retention(db, first: str, last: str) -> dict:
+    """
+    The naive version: every order joined to its user on each request
+    """
+    cohort = date_bucket(models.User.created_at, "month", "sqlite").label("cohort")
+    ordered = date_bucket(models.Order.created_at, "month", "sqlite").label("ordered")
+    rows = db.query(cohort, ordered, func.count(distinct(models.User.id))).join(
+        models.Order, models.Order.user_id == models.User.id
+    ).filter(cohort.between(f"{first}-01", f"{last}-01")).group_by(cohort, ordered).all()
+    result = {}
+    for cohort_start, order_start, users in rows:
+        offset = (int(order_start[:4]) * 12 + int(order_start[5:7])) - (int(cohort_start[:4]) * 12 + int(cohort_start[5:7]))
+        result[(cohort_start[:7], offset)] = users
+    return result
+
+
+def timed(fn, runs: int):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return result, statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--orders", type=int, default=1000000)
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    random.seed(1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = build(os.path.join(tmp, "bench.db"), args.users, args.orders, args.months)
+        Session = sessionmaker(bind=engine)
+        with Session() as db:
+            started = time.perf_counter()
+            reconcile_user_activity(db)
+            print(f"users: {args.users}, orders: {args.orders}, "
+                  f"activity backfill: {(time.perf_counter() - started) * 1000:.0f} ms (one-off)")
+
+            matrix, matrix_ms = timed(lambda: get_cohort_retention(db, cohorts=args.months, periods=args.months), args.runs)
+            joined, join_ms = timed(lambda: join_retention(db, matrix["start_month"], matrix["end_month"]), args.runs)
+        engine.dispose()
+
+    from_matrix = {
+        (cohort["cohort"], offset): users
+        for cohort in matrix["cohorts"]
+        for offset, users in enumerate(cohort["active"])
+        if users
+    }
+    print(f"{'method':<18} {'median ms':>10}")
+    print(f"{'users JOIN orders':<18} {join_ms:>10.1f}")
+    print(f"{'activity matrix':<18} {matrix_ms:>10.1f}")
+    identical = from_matrix == joined
+    print(f"\ncohorts {matrix['start_month']}..{matrix['end_month']}: "
+          + ("counts identical" if identical else "counts differ"))
+    sys.exit(0 if identical else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Distribution statistics in the database vs pulling rows into Python.
+
+Builds a throwaway SQLite database with synthetic history, then computes the
+quantiles and histogram of orders.amount (overall and per product) two ways:
+get_distribution's grouped queries, and fetching every amount, sorting in
+Python and binning. Reports wall time and peak Python heap (tracemalloc),
+and checks both give the same numbers.
+
+    python scripts/bench_distribution.py --years 1 2 --rows-per-day 1000
+"""
+import argparse
+import bisect
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.orm import sessionmaker
+from scripts.bench_time_range import build
+from app.db import models
+from app.services.distribution import DEFAULT_QUANTILES, bin_edges, get_distribution, quantile_name
+
+
+def in_python(db, group_by, bins: int) -> dict:
+    """
+    The naive version: every value into a list
+    """
+    groups = {}
+    for product, amount in db.query(models.Order.product, models.Order.amount):
+        groups.setdefault(product if group_by else "all", []).append(amount)
+    low = min(min(values) for values in groups.values())
+    high = max(max(values) for values in groups.values())
+    edges = bin_edges(low, high, bins, "linear")
+    result = {}
+    for group, values in groups.items():
+        values.sort()
+        quantiles = {}
+        for q in DEFAULT_QUANTILES:
+            k = (len(values) - 1) * q
+            below = int(k)
+            upper = values[min(below + 1, len(values) - 1)]
+            quantiles[quantile_name(q)] = round(values[below] + (upper - values[below]) * (k - below), 4)
+        counts = [0] * bins
+        for value in values:
+            counts[min(bisect.bisect_right(edges, value) - 1, bins - 1)] += 1
+        result[group] = (quantiles, counts)
+    return result
+
+
+def from_tool(result: dict) -> dict:
+    if "groups" not in result:
+        return {"all": (result["quantiles"], result["histogram"]["counts"])}
+    names = [quantile_name(q) for q in DEFAULT_QUANTILES]
+    return {group["group"]: ({name: group[name] for name in names}, group["histogram"]) for group in result["groups"]}
+
+
+def measure(fn):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = fn()
+    elapsed = (time.perf_counter() - started) * 1000
+    peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--rows-per-day", type=int, default=1000)
+    parser.add_argument("--bins", type=int, default=20)
+    args = parser.parse_args()
+
+    failures = 0
+    print(f"{'orders':>8} {'group_by':<8} {'sql ms':>8} {'sql MB':>7} {'python ms':>10} {'python MB':>10}")
+    for years in args.years:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = build(os.path.join(tmp, "bench.db"), years, args.rows_per_day)
+            Session = sessionmaker(bind=engine)
+            with Session() as db:
+                for group_by in (None, "product"):
+                    # Every product is reported, so both sides cover the same groups
+                    sql, sql_ms, sql_mb = measure(lambda: get_distribution(db, group_by=group_by, bins=args.bins, limit=50))
+                    naive, py_ms, py_mb = measure(lambda: in_python(db, group_by, args.bins))
+                    if from_tool(sql) != naive:
+                        failures += 1
+                        print(f"MISMATCH for {years} years, group_by={group_by}")
+                    orders = years * 365 * args.rows_per_day
+                    print(f"{orders:>8} {str(group_by):<8} {sql_ms:>8.0f} {sql_mb:>7.2f} {py_ms:>10.0f} {py_mb:>10.2f}")
+            engine.dispose()
+
+    print("\nresults identical" if not failures else f"\n{failures} mismatches")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Exercise the LLM gateway against the local mock server: retries on 429,
+per-request timeouts, the concurrency cap, the circuit breaker and hedged
+requests. Uses the real Cerebras SDK client pointed at the mock.
+
+    python scripts/bench_llm_gateway.py
+"""
+import os
+import sys
+import threading
+import time
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from mock_llm_server import MockBehaviour, start_server
+from app.core.config import settings
+from app.services.agent import get_cerebras_client
+from app.services.llm_gateway import CircuitBreaker, LLMGateway, LLMUnavailableError
+
+REQUEST = {"model": "llama-3.3-70b", "messages": [{"role": "user", "content": "ping"}]}
+
+
+def make_gateway(client, **overrides) -> LLMGateway:
+    options = dict(
+        timeout=2.0, max_retries=3, backoff_base=0.05, backoff_max=0.2,
+        max_concurrency=8, queue_timeout=5.0, breaker=CircuitBreaker(5, 30.0)
+    )
+    options.update(overrides)
+    return LLMGateway(client, **options)
+
+
+def scenario_retry_on_429(client, mock):
+    mock.push(429, count=2)
+    gateway = make_gateway(client)
+    gateway.create(**REQUEST)
+    stats = gateway.stats()
+    return stats["retries"] == 2 and mock.hits == 3, f"retries={stats['retries']} hits={mock.hits}"
+
+
+def scenario_timeout(client, mock):
+    mock.push(200, delay=1.5, count=2)
+    gateway = make_gateway(client, timeout=0.3, max_retries=1)
+    started = time.perf_counter()
+    try:
+        gateway.create(**REQUEST)
+        return False, "slow request did not time out"
+    except Exception as e:
+        elapsed = time.perf_counter() - started
+        return elapsed < 1.2, f"{type(e).__name__} after {elapsed:.2f}s (2 attempts x 0.3s)"
+
+
+def scenario_concurrency_cap(client, mock):
+    mock.delay = 0.2
+    gateway = make_gateway(client, max_concurrency=2)
+    threads = [threading.Thread(target=gateway.create, kwargs=REQUEST) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    mock.delay = 0.0
+    return mock.max_in_flight <= 2, f"max concurrent at server={mock.max_in_flight} (cap 2)"
+
+
+def scenario_circuit_breaker(client, mock):
+    mock.push(503, count=2)
+    gateway = make_gateway(client, max_retries=0, breaker=CircuitBreaker(2, 0.5))
+    for _ in range(2):
+        try:
+            gateway.create(**REQUEST)
+        except Exception:
+            pass
+    hits_when_open = mock.hits
+    try:
+        gateway.create(**REQUEST)
+        return False, "circuit did not open"
+    except LLMUnavailableError:
+        pass
+    rejected_without_call = mock.hits == hits_when_open
+    time.sleep(0.6)
+    gateway.create(**REQUEST)  # half-open trial succeeds and closes the circuit
+    state = gateway.breaker.state
+    return rejected_without_call and state == "closed", f"fast-fail without call={rejected_without_call}, state after trial={state}"
+
+
+def scenario_hedging(client, mock):
+    mock.delay = 0.02
+    gateway = make_gateway(client, hedge_enabled=True, hedge_min_samples=20)
+    for _ in range(20):
+        gateway.create(**REQUEST)
+    mock.push(200, delay=1.5)  # the next primary request stalls
+    started = time.perf_counter()
+    gateway.create(**REQUEST)
+    elapsed = time.perf_counter() - started
+    stats = gateway.stats()
+    mock.delay = 0.0
+    return stats["hedge_wins"] == 1 and elapsed < 0.5, f"hedge_wins={stats['hedge_wins']} latency={elapsed * 1000:.0f}ms (stalled primary 1500ms)"
+
+
+SCENARIOS = [
+    ("retry with backoff on 429", scenario_retry_on_429),
+    ("per-request timeout", scenario_timeout),
+    ("concurrency semaphore", scenario_concurrency_cap),
+    ("circuit breaker", scenario_circuit_breaker),
+    ("hedged request after p95", scenario_hedging),
+]
+
+
+def main():
+    mock = MockBehaviour()
+    server = start_server(mock)
+    settings.LLM_BASE_URL = f"http://127.0.0.1:{server.server_address[1]}"
+    settings.CEREBRAS_API_KEY = settings.CEREBRAS_API_KEY or "mock-api-key-0000"
+    client = get_cerebras_client()
+
+    failed = 0
+    for name, scenario in SCENARIOS:
+        # Let requests abandoned by the previous scenario (timeouts, hedges) finish
+        while mock.in_flight:
+            time.sleep(0.05)
+        mock.reset_counters()
+        mock.script.clear()
+        ok, detail = scenario(client, mock)
+        failed += not ok
+        print(f"{'PASS' if ok else 'FAIL'}  {name:<28} {detail}")
+
+    server.shutdown()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
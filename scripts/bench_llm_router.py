@@ -0,0 +1,120 @@
+"""
+Exercise multi-provider LLM routing against two local mock servers (a fast
+and a slow OpenAI-compatible backend): latency-aware selection, failover
+when a provider fails, the caller's time budget holding across failovers, and
+role-based routing of tool selection vs answers.
+
+    python scripts/bench_llm_router.py
+"""
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from mock_llm_server import MockBehaviour, start_server
+from app.core.config import settings
+from app.services.llm_router import build_router
+
+MESSAGES = [{"role": "user", "content": "ping"}]
+
+
+def configure(providers):
+    settings.LLM_PROVIDERS = json.dumps(providers)
+    settings.LLM_MAX_RETRIES = 0
+    settings.LLM_BREAKER_FAILURES = 2
+    settings.LLM_ROUTER_EXPLORE_RATE = 0.0
+    return build_router(settings)
+
+
+def spec(name, server, model, roles):
+    return {
+        "name": name, "kind": "openai", "model": model, "roles": roles,
+        "base_url": f"http://127.0.0.1:{server.server_address[1]}/v1"
+    }
+
+
+def route(router, calls, role="tools"):
+    served = Counter()
+    for _ in range(calls):
+        _, provider = router.create(role=role, messages=MESSAGES)
+        served[provider] += 1
+    return served
+
+
+def scenario_latency(fast, slow):
+    router = configure([spec("slow", slow, "big", ["tools"]), spec("fast", fast, "small", ["tools"])])
+    served = route(router, 20)
+    # Each provider is measured once, then the fast one takes the rest
+    return served["fast"] >= 18, f"served={dict(served)}"
+
+
+def scenario_failover(fast, slow, fast_mock):
+    router = configure([spec("slow", slow, "big", ["tools"]), spec("fast", fast, "small", ["tools"])])
+    route(router, 5)
+    fast_mock.fail_rate = 1.0
+    started = time.perf_counter()
+    served = route(router, 10)
+    elapsed = time.perf_counter() - started
+    fast_mock.fail_rate = 0.0
+    stats = router.stats()
+    return (
+        served["slow"] == 10 and stats["fast"]["gateway"]["circuit"] == "open",
+        f"served={dict(served)} fast circuit={stats['fast']['gateway']['circuit']} "
+        f"errors={stats['fast']['errors']} ({elapsed * 1000:.0f}ms for 10 calls)"
+    )
+
+
+def scenario_budget(fast, slow, fast_mock, slow_mock):
+    router = configure([spec("slow", slow, "big", ["tools"]), spec("fast", fast, "small", ["tools"])])
+    # Both providers hang well past the budget
+    fast_mock.push(delay=1.0)
+    slow_mock.push(delay=1.0)
+    budget = 0.3
+    started = time.perf_counter()
+    try:
+        router.create(role="tools", messages=MESSAGES, timeout=budget)
+        failed = False
+    except Exception:
+        failed = True
+    elapsed = time.perf_counter() - started
+    # Let the mocks finish the hung requests before the next scenario
+    time.sleep(1.0)
+    return failed and elapsed < budget * 1.5, f"{elapsed * 1000:.0f}ms for a {budget * 1000:.0f}ms budget"
+
+
+def scenario_roles(fast, slow):
+    router = configure([spec("cheap", fast, "small", ["tools"]), spec("large", slow, "big", ["answer"])])
+    tools = route(router, 5, "tools")
+    answers = route(router, 5, "answer")
+    return tools == {"cheap": 5} and answers == {"large": 5}, f"tools={dict(tools)} answer={dict(answers)}"
+
+
+def main():
+    fast_mock = MockBehaviour(delay=0.01)
+    slow_mock = MockBehaviour(delay=0.15)
+    fast = start_server(fast_mock)
+    slow = start_server(slow_mock)
+
+    results = [
+        ("latency-aware selection", scenario_latency(fast, slow)),
+        ("failover on provider errors", scenario_failover(fast, slow, fast_mock)),
+        ("budget across failovers", scenario_budget(fast, slow, fast_mock, slow_mock)),
+        ("role-based routing", scenario_roles(fast, slow)),
+    ]
+    failed = 0
+    for name, (ok, detail) in results:
+        failed += not ok
+        print(f"{'PASS' if ok else 'FAIL'}  {name:<28} {detail}")
+
+    fast.shutdown()
+    slow.shutdown()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
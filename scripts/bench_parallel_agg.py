@@ -0,0 +1,92 @@
+"""
+Parallel aggregation benchmark: times get_order_stats, get_top_products and
+get_sales_by_product on a large synthetic SQLite database with 1..N worker
+processes, and checks every parallel result against the single query.
+
+    python scripts/bench_parallel_agg.py --years 4 --rows-per-day 1000 --workers 1 2 4 8
+"""
+import argparse
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy.orm import sessionmaker
+from bench_time_range import build
+from app.core.config import settings
+from app.services import parallel_agg, tools
+
+CALLS = [
+    ("get_order_stats", lambda db: tools.get_order_stats(db)),
+    ("get_top_products", lambda db: tools.get_top_products(db, limit=10)),
+    ("get_sales_by_product", lambda db: tools.get_sales_by_product(db, limit=10)),
+]
+
+
+def same(a, b) -> bool:
+    """
+    Equal up to float summation order
+    """
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(same(a[k], b[k]) for k in a)
+    if isinstance(a, list):
+        return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    if isinstance(a, float) or isinstance(b, float):
+        return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-6)
+    return a == b
+
+
+def measure(db, runs: int) -> dict:
+    timings, results = {}, {}
+    for name, call in CALLS:
+        results[name] = call(db)  # warm-up (also starts the worker pool)
+        samples = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            call(db)
+            samples.append((time.perf_counter() - started) * 1000)
+        timings[name] = statistics.median(samples)
+    return timings, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=int, default=4)
+    parser.add_argument("--rows-per-day", type=int, default=1000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    settings.PARALLEL_AGG_MIN_ROWS = 0
+    print(f"CPU cores: {os.cpu_count()}")
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = build(os.path.join(tmp, "bench.db"), args.years, args.rows_per_day)
+        print(f"Orders: {args.years * 365 * args.rows_per_day}")
+        Session = sessionmaker(bind=engine)
+
+        baseline = None
+        print(f"{'workers':>7}  " + "  ".join(f"{name:>22}" for name, _ in CALLS) + "  match")
+        with Session() as db:
+            for workers in args.workers:
+                settings.PARALLEL_AGG_WORKERS = workers
+                timings, results = measure(db, args.runs)
+                if baseline is None:
+                    baseline = (timings, results)
+                cells = [
+                    f"{timings[name]:>9.1f}ms ({baseline[0][name] / timings[name]:>4.2f}x)"
+                    for name, _ in CALLS
+                ]
+                match = all(same(results[name], baseline[1][name]) for name, _ in CALLS)
+                print(f"{workers:>7}  " + "  ".join(f"{cell:>22}" for cell in cells) + f"  {match}")
+        parallel_agg.shutdown()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
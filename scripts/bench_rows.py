@@ -0,0 +1,92 @@
+"""
+Memory per row of list tool results: ORM instances vs Core column selects.
+
+Builds a throwaway SQLite database with synthetic order history, then loads
+the newest --rows orders two ways: full Order instances copied into dicts
+with created_at.isoformat() per row (what the tools used to do), and
+get_recent_records' Core select of the needed columns with timestamps
+formatted in SQL. Reports wall time, peak Python heap while loading and the
+heap still held by the result (tracemalloc), and checks both give the same
+rows, timestamp strings included (some rows are moved to whole seconds, which
+isoformat() writes without a fraction).
+
+    python scripts/bench_rows.py --rows 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+from scripts.bench_time_range import build
+from app.db import models
+from app.services import tools
+
+
+def orm_rows(db, limit: int) -> list:
+    """
+    The old version: one ORM instance per row, then a dict copy
+    """
+    orders = db.query(models.Order).order_by(models.Order.created_at.desc()).limit(limit).all()
+    return [
+        {
+            "id": order.id,
+            "user_id": order.user_id,
+            "product": order.product,
+            "amount": order.amount,
+            "created_at": order.created_at.isoformat() if order.created_at else None
+        }
+        for order in orders
+    ]
+
+
+def measure(Session, fn):
+    # A fresh session each time, so neither side starts with a warm identity map
+    with Session() as db:
+        tracemalloc.start()
+        started = time.perf_counter()
+        result = fn(db)
+        elapsed = (time.perf_counter() - started) * 1000
+        held, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return result, elapsed, peak, held
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = build(os.path.join(tmp, "bench.db"), 1, args.rows // 365 + 1)
+        with engine.begin() as conn:
+            conn.execute(text(
+                "UPDATE orders SET created_at = substr(created_at, 1, 19) || '.000000' WHERE id % 10 = 0"
+            ))
+        Session = sessionmaker(bind=engine, expire_on_commit=False)
+        old, old_ms, old_peak, old_held = measure(Session, lambda db: orm_rows(db, args.rows))
+        new, new_ms, new_peak, new_held = measure(Session, lambda db: tools.get_recent_records(db, "orders", limit=args.rows))
+        engine.dispose()
+
+    rows = len(new)
+    print(f"rows: {rows}")
+    print(f"{'method':<14} {'ms':>8} {'peak MB':>8} {'peak B/row':>11} {'held B/row':>11}")
+    for name, elapsed, peak, held in (("ORM instances", old_ms, old_peak, old_held),
+                                      ("Core rows", new_ms, new_peak, new_held)):
+        print(f"{name:<14} {elapsed:>8.0f} {peak / 1024 / 1024:>8.1f} {peak / rows:>11.0f} {held / rows:>11.0f}")
+
+    whole_seconds = sum(1 for row in new if "." not in row["created_at"])
+    identical = old == new
+    print(f"\nwhole-second timestamps compared: {whole_seconds}")
+    print("rows identical" if identical else "rows differ")
+    sys.exit(0 if identical else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Safety checks: fuzz equivalence and micro-benchmark.
+
+Compares app.core.safety against the previous implementations (kept below as
+the reference) on a random corpus built to hit the edge cases: keywords in
+mixed case and inside longer words, non-ASCII text whose upper() changes
+(e.g. "ß", "ſ", "ı"), and dangerous sequences that only appear after an
+earlier removal (e.g. "-;-"). Then times short chat messages and long pasted text.
+
+    python scripts/bench_safety.py --cases 50000
+"""
+import argparse
+import random
+import re
+import sys
+import os
+import timeit
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core import safety
+
+
+# Previous implementations (reference behaviour)
+def legacy_is_dangerous_query(query):
+    if not query:
+        return False
+    query_upper = query.upper().strip()
+    for keyword in safety.DANGEROUS_KEYWORDS:
+        pattern = r'\b' + re.escape(keyword) + r'\b'
+        if re.search(pattern, query_upper):
+            return True
+    return False
+
+
+def legacy_sanitize_input(input_str):
+    if not input_str:
+        return ""
+    dangerous_chars = [';', '--', '/*', '*/', 'xp_', 'sp_']
+    sanitized = input_str
+    for char in dangerous_chars:
+        sanitized = sanitized.replace(char, '')
+    return sanitized.strip()
+
+
+def legacy_validate_table_name(table):
+    ALLOWED_TABLES = ["users", "orders", "sales"]
+    return table.lower() in ALLOWED_TABLES
+
+
+FRAGMENTS = (
+    [keyword.lower() for keyword in safety.DANGEROUS_KEYWORDS]
+    + [keyword.capitalize() for keyword in safety.DANGEROUS_KEYWORDS]
+    + safety.DANGEROUS_KEYWORDS
+    + ["updated", "dropped", "executes", "_drop", "drop_", "kill9", "skill", "ſhutdown", "dıop",
+       "kıll", "straße", "ﬀ", "İnsert", "nechta", "foydalanuvchi", "buyurtma", "so'nggi", "o‘rtacha",
+       "-", "-;-", ";", "/", "*", "/*", "*/", "x", "p", "s", "_", "xp", "sp", "x;p_", "s--p_", "/;*",
+       " ", "  ", "\t", "\n", ".", ",", "?", "'", "\"", "1", "42", "é", "ж", "中", "🙂"]
+)
+TABLES = ["users", "Users", "ORDERS", "sales", "sale", "tickets", "usérs", "İusers", " users", "orders ", ""]
+
+
+def random_text(rng, max_parts=12):
+    return "".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, max_parts)))
+
+
+def fuzz(cases, seed):
+    rng = random.Random(seed)
+    mismatches = []
+    for _ in range(cases):
+        text = random_text(rng)
+        if safety.is_dangerous_query(text) != legacy_is_dangerous_query(text):
+            mismatches.append(("is_dangerous_query", text))
+        if safety.sanitize_input(text) != legacy_sanitize_input(text):
+            mismatches.append(("sanitize_input", text))
+    for table in TABLES:
+        if safety.validate_table_name(table) != legacy_validate_table_name(table):
+            mismatches.append(("validate_table_name", table))
+    return mismatches
+
+
+def bench(label, text, number):
+    rows = [
+        ("is_dangerous_query", legacy_is_dangerous_query, safety.is_dangerous_query),
+        ("sanitize_input", legacy_sanitize_input, safety.sanitize_input),
+    ]
+    for name, old, new in rows:
+        old_us = timeit.timeit(lambda: old(text), number=number) / number * 1e6
+        new_us = timeit.timeit(lambda: new(text), number=number) / number * 1e6
+        print(f"{label:<18} {name:<20} {old_us:>10.2f} us {new_us:>10.2f} us {old_us / new_us:>7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    mismatches = fuzz(args.cases, args.seed)
+    print(f"Fuzz: {args.cases} cases, {len(mismatches)} mismatches")
+    for name, text in mismatches[:10]:
+        print(f"  MISMATCH {name}: {text!r}")
+
+    short = "Oxirgi 30 kunlik daromad qancha bo'ldi?"
+    long_text = ("Foydalanuvchilar statistikasi va buyurtmalar bo'yicha hisobot kerak. " * 150).strip()
+    table = "orders"
+    print(f"\n{'input':<18} {'check':<20} {'before':>13} {'after':>13} {'speedup':>8}")
+    bench("short message", short, args.number)
+    bench(f"long ({len(long_text) // 1000}KB)", long_text, max(args.number // 20, 10))
+    old_us = timeit.timeit(lambda: legacy_validate_table_name(table), number=args.number * 10) / (args.number * 10) * 1e6
+    new_us = timeit.timeit(lambda: safety.validate_table_name(table), number=args.number * 10) / (args.number * 10) * 1e6
+    print(f"{'table name':<18} {'validate_table_name':<20} {old_us:>10.2f} us {new_us:>10.2f} us {old_us / new_us:>7.1f}x")
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
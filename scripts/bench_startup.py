@@ -0,0 +1,86 @@
+"""
+Cold-start benchmark: time `import app.main` and the lifespan startup in
+fresh interpreters.
+
+    python scripts/bench_startup.py --runs 10
+    python scripts/bench_startup.py --importtime 15   # slowest direct imports
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside each fresh interpreter; prints "<import_ms> <startup_ms>"
+PROBE = """
+import time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app.main.app):
+    ready = time.perf_counter()
+print((imported - started) * 1000, (ready - imported) * 1000)
+"""
+
+
+def run_probe() -> tuple:
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout.split()
+    return float(output[-2]), float(output[-1])
+
+
+def slowest_imports(count: int) -> list:
+    """
+    Parse `python -X importtime` output and return the slowest modules
+    imported directly by app.main and the interpreter startup
+    """
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def describe(label: str, values: list) -> str:
+    return (f"{label:<10} median {statistics.median(values):8.1f} ms   "
+            f"min {min(values):8.1f} ms   max {max(values):8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--importtime", type=int, default=0, metavar="N",
+                        help="also list the N slowest direct imports")
+    args = parser.parse_args()
+
+    results = [run_probe() for _ in range(args.runs)]
+    imports = [r[0] for r in results]
+    startups = [r[1] for r in results]
+    totals = [i + s for i, s in results]
+
+    print(f"Cold start over {args.runs} fresh interpreters:")
+    print(describe("import", imports))
+    print(describe("lifespan", startups))
+    print(describe("total", totals))
+
+    if args.importtime:
+        print(f"\nSlowest {args.importtime} direct imports (cumulative):")
+        for micros, name in slowest_imports(args.importtime):
+            print(f"  {micros / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Recent-window query benchmark as order/sales history grows.
+
+Builds throwaway SQLite databases with 1..N years of synthetic history and
+times the date-filtered tools with the created_at indexes dropped (full
+scans) and in place (range scans). With the indexes, recent-window latency
+should stay flat however many years are stored.
+
+    python scripts/bench_time_range.py --years 1 2 4 --rows-per-day 300
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from app.db.database import Base
+from app.db import models
+from app.services import tools
+
+PRODUCTS = ["Laptop", "Smartphone", "Tablet", "Monitor", "Keyboard", "Mouse", "Headphones", "Camera"]
+DATE_INDEXES = ["ix_orders_created_at", "ix_orders_user_id_created_at", "ix_sales_created_at_revenue"]
+USERS = 1000
+
+CALLS = [
+    ("get_revenue_by_period 30d", lambda db: tools.get_revenue_by_period(db, days=30)),
+    ("get_revenue_by_period 30d day", lambda db: tools.get_revenue_by_period(db, days=30, group_by="day")),
+    ("get_orders_by_date_range 7d", lambda db: tools.get_orders_by_date_range(
+        db, start_date=(datetime.utcnow() - timedelta(days=7)).isoformat(), limit=50)),
+    ("get_recent_records orders", lambda db: tools.get_recent_records(db, "orders", limit=20)),
+    ("get_user_orders", lambda db: tools.get_user_orders(db, user_id=7, limit=10)),
+]
+
+
+def build(path: str, years: int, rows_per_day: int):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    now = datetime.utcnow()
+    days = years * 365
+    with engine.begin() as conn:
+        conn.execute(models.User.__table__.insert(), [
+            {"id": i, "name": f"user{i}", "email": f"user{i}@example.com", "created_at": now}
+            for i in range(1, USERS + 1)
+        ])
+        order_id = 0
+        for day in range(days):
+            base = now - timedelta(days=day)
+            orders, sales = [], []
+            for _ in range(rows_per_day):
+                order_id += 1
+                created = base - timedelta(seconds=random.randint(0, 86399))
+                amount = round(random.uniform(10, 500), 2)
+                orders.append({"id": order_id, "user_id": random.randint(1, USERS),
+                               "product": random.choice(PRODUCTS), "amount": amount, "created_at": created})
+                sales.append({"order_id": order_id, "revenue": round(amount * 1.3, 2), "created_at": created})
+            conn.execute(models.Order.__table__.insert(), orders)
+            conn.execute(models.Sale.__table__.insert(), sales)
+    return engine
+
+
+def time_calls(engine, runs: int) -> dict:
+    Session = sessionmaker(bind=engine)
+    timings = {}
+    with Session() as db:
+        for name, call in CALLS:
+            call(db)  # warm-up
+            samples = []
+            for _ in range(runs):
+                started = time.perf_counter()
+                call(db)
+                samples.append((time.perf_counter() - started) * 1000)
+            timings[name] = statistics.median(samples)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--rows-per-day", type=int, default=300)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'history':<9} {'query':<34} {'no index ms':>12} {'indexed ms':>11}")
+    for years in args.years:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = build(os.path.join(tmp, "bench.db"), years, args.rows_per_day)
+            with engine.begin() as conn:
+                for index in DATE_INDEXES:
+                    conn.execute(text(f"DROP INDEX {index}"))
+            full_scan = time_calls(engine, args.runs)
+            for table in (models.Order.__table__, models.Sale.__table__):
+                for index in table.indexes:
+                    index.create(bind=engine, checkfirst=True)
+            with engine.begin() as conn:
+                conn.execute(text("ANALYZE"))
+            indexed = time_calls(engine, args.runs)
+            engine.dispose()
+
+        rows = years * 365 * args.rows_per_day
+        for name in full_scan:
+            print(f"{f'{years}y/{rows // 1000}k':<9} {name:<34} {full_scan[name]:>12.2f} {indexed[name]:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
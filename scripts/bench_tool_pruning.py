@@ -0,0 +1,152 @@
+"""
+Tool-schema pruning benchmark.
+
+Offline (default): for a labeled set of questions, checks that the local
+classifier keeps the expected tool and reports schema bytes / approximate
+prompt tokens with and without pruning.
+
+Live (--live, needs CEREBRAS_API_KEY): sends each question to the LLM with
+the full and the pruned schema and compares prompt tokens, latency and
+whether the same tool was chosen.
+
+    python scripts/bench_tool_pruning.py
+    python scripts/bench_tool_pruning.py --live
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.services.agent import SYSTEM_PROMPT, TOOLS_SCHEMA, AGENT_MODEL, tools_for_message, get_cerebras_client
+
+# (question, expected tool)
+CORPUS = [
+    ("Nechta foydalanuvchi bor?", "get_row_count"),
+    ("Jami nechta buyurtma bor?", "get_row_count"),
+    ("Nechta savdo bor?", "get_row_count"),
+    ("How many users are there?", "get_row_count"),
+    ("Oxirgi 10 ta buyurtma", "get_recent_records"),
+    ("So'nggi savdolar", "get_recent_records"),
+    ("Show the latest 5 sales", "get_recent_records"),
+    ("Savdo statistikasini ko'rsating", "get_sales_stats"),
+    ("Daromad ko'rsatkichlari", "get_sales_stats"),
+    ("Foydalanuvchilar statistikasi", "get_user_stats"),
+    ("Nechta foydalanuvchi buyurtma bergan?", "get_user_stats"),
+    ("Buyurtmalar statistikasi", "get_order_stats"),
+    ("Jami buyurtma summasi", "get_order_stats"),
+    ("Eng ko'p sotilgan mahsulotlar", "get_top_products"),
+    ("Top 10 mahsulot", "get_top_products"),
+    ("ID 5 foydalanuvchining buyurtmalari", "get_user_orders"),
+    ("Show orders of user 12", "get_user_orders"),
+    ("O'rtacha buyurtma qiymati", "get_average_order_value"),
+    ("What is the average order value?", "get_average_order_value"),
+    ("Mahsulot bo'yicha savdo", "get_sales_by_product"),
+    ("Qaysi mahsulot ko'p daromad keltiradi?", "get_sales_by_product"),
+    ("100 dollardan yuqori buyurtmalar", "search_orders"),
+    ("Laptop buyurtmalarini qidir", "search_orders"),
+    ("ID 5 foydalanuvchi kim?", "get_user_by_id"),
+    ("Foydalanuvchi 7 necha pul sarflagan?", "get_user_by_id"),
+    ("Oxirgi 30 kunlik daromad", "get_revenue_by_period"),
+    ("Haftalik daromad", "get_revenue_by_period"),
+    ("2024 yil buyurtmalari", "get_orders_by_date_range"),
+    ("Sana oralig'idagi buyurtmalar", "get_orders_by_date_range"),
+    ("Mart oyida 5-foydalanuvchining mahsulotlar bo'yicha daromadi", "run_query_spec"),
+    ("Har oy bo'yicha buyurtmalar soni", "run_query_spec"),
+    ("Revenue by product for user 3 in March", "run_query_spec"),
+    ("Buyurtma summalarining medianasi qancha?", "get_distribution"),
+    ("Mahsulotlar bo'yicha daromad taqsimoti", "get_distribution"),
+    ("What is the p90 order amount?", "get_distribution"),
+    ("May oyida qo'shilgan foydalanuvchilarning necha foizi keyingi oylarda xarid qilgan?", "get_cohort_retention"),
+    ("Kohort tahlili", "get_cohort_retention"),
+    ("What share of customers make a repeat purchase?", "get_cohort_retention"),
+    ("ID 3, 7 va 12 foydalanuvchilar kim?", "get_users_by_ids"),
+    ("Compare users 4 and 9", "get_users_by_ids"),
+    ("ID 3 va 5 foydalanuvchilarning buyurtmalari", "get_orders_for_users"),
+]
+
+
+def schema_bytes(schema) -> int:
+    return len(json.dumps(schema, ensure_ascii=False))
+
+
+def offline():
+    full_bytes = schema_bytes(TOOLS_SCHEMA)
+    pruned_bytes = []
+    misses = []
+    fallbacks = 0
+
+    for question, expected in CORPUS:
+        offered = tools_for_message(question)
+        if offered is TOOLS_SCHEMA:
+            fallbacks += 1
+        names = [tool["function"]["name"] for tool in offered]
+        if expected not in names:
+            misses.append((question, expected, names))
+        pruned_bytes.append(schema_bytes(offered))
+
+    mean_pruned = statistics.mean(pruned_bytes)
+    print(f"Questions:              {len(CORPUS)}")
+    print(f"Expected tool kept:     {len(CORPUS) - len(misses)}/{len(CORPUS)}")
+    print(f"Full-set fallbacks:     {fallbacks}")
+    print(f"Schema bytes (full):    {full_bytes}  (~{full_bytes // 4} tokens)")
+    print(f"Schema bytes (pruned):  {mean_pruned:.0f} mean  (~{mean_pruned / 4:.0f} tokens), "
+          f"{100 * (1 - mean_pruned / full_bytes):.1f}% smaller")
+    for question, expected, names in misses:
+        print(f"  MISS  {question!r}: expected {expected}, offered {names}")
+
+
+def ask(client, question, schema):
+    started = time.perf_counter()
+    response = client.chat.completions.create(
+        model=AGENT_MODEL,
+        messages=[{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": question}],
+        tools=schema,
+        tool_choice="auto"
+    )
+    latency = (time.perf_counter() - started) * 1000
+    msg = response.choices[0].message
+    tool = msg.tool_calls[0].function.name if msg.tool_calls else None
+    return latency, response.usage.prompt_tokens, tool
+
+
+def live():
+    client = get_cerebras_client()
+    rows = {"full": [], "pruned": []}
+    agree = correct_full = correct_pruned = 0
+
+    for question, expected in CORPUS:
+        full = ask(client, question, TOOLS_SCHEMA)
+        pruned = ask(client, question, tools_for_message(question))
+        rows["full"].append(full)
+        rows["pruned"].append(pruned)
+        agree += full[2] == pruned[2]
+        correct_full += full[2] == expected
+        correct_pruned += pruned[2] == expected
+
+    for mode, results in rows.items():
+        print(f"{mode:<7} prompt tokens {statistics.mean(r[1] for r in results):7.1f}   "
+              f"latency median {statistics.median(r[0] for r in results):7.1f} ms")
+    print(f"Same tool chosen: {agree}/{len(CORPUS)}   "
+          f"correct (full/pruned): {correct_full}/{correct_pruned}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--live", action="store_true", help="also measure real LLM calls")
+    args = parser.parse_args()
+
+    settings.TOOL_PRUNING_ENABLED = True
+    offline()
+    if args.live:
+        print()
+        live()
+
+
+if __name__ == "__main__":
+    main()
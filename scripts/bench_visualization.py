@@ -0,0 +1,81 @@
+"""
+Visualization payload size and shaping time as results grow.
+
+Formats synthetic tool results (revenue series, grouped query specs, order
+tables) of increasing size and reports the JSON bytes the browser would
+receive and the server-side shaping time. Raw sizes are what the response
+carried before shaping; shaped sizes should stay flat.
+
+    python scripts/bench_visualization.py --sizes 100 1000 10000 100000
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.agent import format_response_for_visualization
+
+
+def revenue_series(n: int) -> dict:
+    series = [
+        {"period": f"p{i:06d}", "revenue": round(1000 + 300 * math.sin(i / 30) + random.uniform(-50, 50), 2),
+         "sale_count": random.randint(1, 40)}
+        for i in range(n)
+    ]
+    return {"period_days": n, "total_revenue": sum(p["revenue"] for p in series),
+            "sale_count": len(series), "avg_revenue": 0, "group_by": "day", "series": series}
+
+
+def grouped(n: int) -> list:
+    return [{"product": f"product-{i}", "sum_amount": round(random.uniform(10, 5000), 2)} for i in range(n)]
+
+
+def orders(n: int) -> list:
+    return [{"id": i, "user_id": random.randint(1, 1000), "product": "Laptop",
+             "amount": round(random.uniform(10, 500), 2), "created_at": "2024-05-01T10:00:00"}
+            for i in range(n)]
+
+
+CASES = [
+    ("series", "get_revenue_by_period", revenue_series),
+    ("grouped", "run_query_spec", grouped),
+    ("table", "search_orders", orders),
+]
+
+
+def size_kb(payload) -> float:
+    return len(json.dumps(payload, default=str, separators=(",", ":"))) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    print(f"{'case':<8} {'rows':>8} {'raw KB':>10} {'shaped KB':>10} {'points':>8} {'shape ms':>9}")
+    for label, tool_name, make in CASES:
+        for n in args.sizes:
+            result = make(n)
+            raw = {"tool_used": tool_name, "result": result, "visualization": {"data": result}}
+            started = time.perf_counter()
+            shaped = format_response_for_visualization(result, tool_name, columnar=True)
+            elapsed = (time.perf_counter() - started) * 1000
+            visualization = shaped["visualization"]
+            if visualization["type"] == "chart":
+                points = len(visualization["labels"])
+            else:
+                points = len(shaped["result"]["rows"])
+            # Charts carry their points in the visualization; result stays for the LLM-facing fields
+            print(f"{label:<8} {n:>8} {size_kb(raw):>10.1f} {size_kb(shaped):>10.1f} {points:>8} {elapsed:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+import sys
+import os
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.startup import init_database, startup_report
+
+
+def main():
+    added = init_database()
+    if added:
+        print(f"Added columns: {', '.join(added)}")
+
+    for step in startup_report.as_dict()["steps"]:
+        print(f"  {step['step']}: {step['duration_ms']} ms")
+    print("✅ Database is up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Local OpenAI-compatible mock LLM server for exercising the LLM gateway.
+
+Answers POST .../chat/completions with a canned assistant message. Each
+request takes the next scripted (status, delay) step if any, otherwise the
+defaults; a fraction of default requests can be made to fail or be slow.
+
+    python scripts/mock_llm_server.py --port 8001 --delay 0.05 --fail-rate 0.2
+    LLM_BASE_URL=http://127.0.0.1:8001 uvicorn app.main:app
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+class MockBehaviour:
+    def __init__(self, delay: float = 0.0, fail_rate: float = 0.0, fail_status: int = 503,
+                 slow_rate: float = 0.0, slow_delay: float = 1.0):
+        self.delay = delay
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        self.slow_rate = slow_rate
+        self.slow_delay = slow_delay
+        self.script = deque()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def push(self, status: int = 200, delay: float = 0.0, count: int = 1) -> None:
+        """
+        Script the next `count` responses
+        """
+        with self.lock:
+            self.script.extend([(status, delay)] * count)
+
+    def reset_counters(self) -> None:
+        with self.lock:
+            self.hits = 0
+            self.max_in_flight = 0
+
+    def next_step(self):
+        with self.lock:
+            self.hits += 1
+            if self.script:
+                return self.script.popleft()
+        if random.random() < self.fail_rate:
+            return self.fail_status, self.delay
+        if random.random() < self.slow_rate:
+            return 200, self.slow_delay
+        return 200, self.delay
+
+
+def completion(model: str, content: str = "ok") -> dict:
+    return {
+        "id": "chatcmpl-mock",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop"
+        }],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 1, "total_tokens": 11}
+    }
+
+
+def make_handler(behaviour: MockBehaviour):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, body: dict, headers: Optional[dict] = None):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            # SDK connection warm-up and health probes
+            self._send(200, {"status": "ok"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if not self.path.endswith("/chat/completions"):
+                self._send(404, {"error": {"message": "not found"}})
+                return
+
+            status, delay = behaviour.next_step()
+            with behaviour.lock:
+                behaviour.in_flight += 1
+                behaviour.max_in_flight = max(behaviour.max_in_flight, behaviour.in_flight)
+            try:
+                time.sleep(delay)
+            finally:
+                with behaviour.lock:
+                    behaviour.in_flight -= 1
+
+            try:
+                if status == 200:
+                    self._send(200, completion(payload.get("model", "mock")))
+                else:
+                    headers = {"Retry-After": "0"} if status == 429 else None
+                    self._send(status, {"error": {"message": f"mock error {status}", "code": status}}, headers)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # client timed out or a hedge won
+
+    return Handler
+
+
+def start_server(behaviour: MockBehaviour, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """
+    Start the mock server in a daemon thread; port 0 picks a free port
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(behaviour))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--delay", type=float, default=0.05, help="seconds per response")
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--fail-status", type=int, default=503)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-delay", type=float, default=1.0)
+    args = parser.parse_args()
+
+    behaviour = MockBehaviour(args.delay, args.fail_rate, args.fail_status, args.slow_rate, args.slow_delay)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(behaviour))
+    print(f"Mock LLM listening on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+import sys
+import os
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.startup import init_database
+from app.db.database import SessionLocal
+from app.services.user_aggregates import reconcile_user_aggregates
+from app.services.cohorts import reconcile_user_activity
+
+
+def main():
+    added = init_database()
+    if added:
+        print(f"Added columns: {', '.join(added)}")
+
+    db = SessionLocal()
+    try:
+        result = reconcile_user_aggregates(db)
+        activity = reconcile_user_activity(db)
+    finally:
+        db.close()
+
+    print(f"✅ Checked {result['checked']} users, repaired {result['repaired']}")
+    print(f"✅ Checked {activity['checked']} activity rows, repaired {activity['repaired']}")
+
+
+if __name__ == "__main__":
+    main()
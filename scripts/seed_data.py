@@ -8,6 +8,8 @@ from faker import Faker
 from sqlalchemy.orm import Session
 from app.db.database import SessionLocal
 from app.db import models
+from app.services.user_aggregates import reconcile_user_aggregates
+from app.services.cohorts import reconcile_user_activity
 import random
 from datetime import datetime, timedelta
 
@@ -25,6 +27,15 @@ PRODUCTS = [
     "Graphics Card", "Motherboard", "Power Supply", "Cooling Fan", "Webcam"
 ]
 
+def order_date_for(user):
+    """
+    Random date within the last 6 months, never before the user signed up
+    """
+    now = datetime.utcnow()
+    max_seconds = min(180 * 86400, (now - user.created_at).total_seconds())
+    return now - timedelta(seconds=random.uniform(0, max_seconds))
+
+
 def seed():
     db: Session = SessionLocal()
     
@@ -40,6 +51,9 @@ def seed():
         db.commit()
         print("  ✓ Orders deleted")
         
+        db.query(models.UserActivity).delete()
+        db.commit()
+        
         db.query(models.User).delete()
         db.commit()
         print("  ✓ Users deleted")
@@ -50,6 +64,7 @@ def seed():
         try:
             db.execute("DELETE FROM sales")
             db.execute("DELETE FROM orders")
+            db.execute("DELETE FROM user_activity")
             db.execute("DELETE FROM users")
             db.commit()
             print("  ✓ Data cleared using raw SQL")
@@ -66,9 +81,11 @@ def seed():
         last_name = fake.last_name()
         full_name = f"{first_name} {last_name}"
         
+        # Signups spread over the last 9 months, so there are cohorts to compare
         user = models.User(
             name=full_name,
-            email=fake.unique.email()
+            email=fake.unique.email(),
+            created_at=datetime.utcnow() - timedelta(days=random.randint(0, 270))
         )
         db.add(user)
         users.append(user)
@@ -107,9 +124,7 @@ def seed():
     for product, (count, min_price, max_price) in product_distribution.items():
         for _ in range(count):
             user = random.choice(users)
-            # Random date within last 6 months
-            days_ago = random.randint(0, 180)
-            order_date = datetime.utcnow() - timedelta(days=days_ago)
+            order_date = order_date_for(user)
             
             order = models.Order(
                 user_id=user.id,
@@ -124,8 +139,7 @@ def seed():
     for _ in range(100):
         user = random.choice(users)
         product = random.choice(PRODUCTS)
-        days_ago = random.randint(0, 180)
-        order_date = datetime.utcnow() - timedelta(days=days_ago)
+        order_date = order_date_for(user)
         
         order = models.Order(
             user_id=user.id,
@@ -160,14 +174,21 @@ def seed():
     
     db.commit()
     print(f"Created {len(sales)} sales")
+
+    # Order inserts maintain user aggregates and activity; reconcile catches
+    # anything left over from the bulk deletes above
+    reconcile_user_aggregates(db)
+    reconcile_user_activity(db)
     
+    # Counted in SQL rather than from the order objects built above
+    product_count = db.query(models.Order.product).distinct().count()
     db.close()
     print("\n✅ Data seeded successfully!")
     print(f"📊 Summary:")
     print(f"   - Users: {len(users)}")
     print(f"   - Orders: {len(orders)}")
     print(f"   - Sales: {len(sales)}")
-    print(f"   - Products: {len(set(order.product for order in orders))} unique products")
+    print(f"   - Products: {product_count} unique products")
 
 
 if __name__ == "__main__":
@@ -12,6 +12,8 @@ const ticketForm = document.getElementById('ticketForm');
 const closeModal = document.querySelector('.close');
 
 let currentChart = null;
+// Server-side conversation, so follow-up questions can refer to earlier answers
+let sessionId = null;
 
 // Event Listeners
 sendBtn.addEventListener('click', sendMessage);
@@ -55,7 +57,8 @@ async function sendMessage() {
             headers: {
                 'Content-Type': 'application/json',
             },
-            body: JSON.stringify({ message })
+            // Ask for compact {columns, rows} tables instead of a list of objects
+            body: JSON.stringify({ message, columnar: true, session_id: sessionId })
         });
 
         const data = await response.json();
@@ -66,6 +69,10 @@ async function sendMessage() {
         // Debug logging
         console.log('Response data:', data);
 
+        if (data.session_id) {
+            sessionId = data.session_id;
+        }
+
         if (data.error) {
             addMessage('bot', `Xato: ${data.error}`);
             showError(data.error);
@@ -147,9 +154,19 @@ function displayVisualization(visualization, result) {
         `;
         visualizationContainer.appendChild(statCard);
     } else if (visualization.type === 'table') {
-        if (visualization.data && Array.isArray(visualization.data) && visualization.data.length > 0) {
-            const table = createTable(visualization.data, visualization.columns || Object.keys(visualization.data[0]));
+        if (visualization.columnar && isColumnar(result)) {
+            if (result.rows.length > 0) {
+                const table = createTable(result.rows, result.columns);
+                visualizationContainer.appendChild(table);
+                addLoadMore(table, result.columns, visualization);
+            } else {
+                visualizationContainer.innerHTML = '<div class="placeholder">Ma\'lumot topilmadi</div>';
+            }
+        } else if (visualization.data && Array.isArray(visualization.data) && visualization.data.length > 0) {
+            const columns = visualization.columns || Object.keys(visualization.data[0]);
+            const table = createTable(visualization.data, columns);
             visualizationContainer.appendChild(table);
+            addLoadMore(table, columns, visualization);
         } else {
             visualizationContainer.innerHTML = '<div class="placeholder">Ma\'lumot topilmadi</div>';
         }
@@ -226,7 +243,20 @@ function displayVisualization(visualization, result) {
         } catch (error) {
             console.error('Chart creation error:', error);
             visualizationContainer.innerHTML = '<div class="error-message">Grafik yaratishda xato: ' + error.message + '</div>';
+            return;
+        }
+
+        // The server thins long series and folds small categories
+        if (visualization.downsampled_from || visualization.folded_categories) {
+            const note = document.createElement('div');
+            note.className = 'chart-note';
+            note.textContent = visualization.downsampled_from
+                ? `${visualization.downsampled_from} ta nuqtadan ${labels.length} tasi ko'rsatilmoqda`
+                : `${visualization.folded_categories} ta kichik kategoriya "Boshqa" ga birlashtirildi`;
+            visualizationContainer.appendChild(note);
         }
+    } else if (visualization.type === 'heatmap') {
+        visualizationContainer.appendChild(createHeatmap(visualization));
     } else {
         console.warn('Unknown visualization type:', visualization.type);
         visualizationContainer.innerHTML = '<div class="placeholder">Noma\'lum vizualizatsiya turi</div>';
@@ -249,6 +279,12 @@ function displayResult(result, toolUsed) {
             <div class="stat-value">${result.toLocaleString()}</div>
         `;
         visualizationContainer.appendChild(statCard);
+    } else if (isColumnar(result)) {
+        if (result.rows.length > 0) {
+            visualizationContainer.appendChild(createTable(result.rows, result.columns));
+        } else {
+            visualizationContainer.innerHTML = '<div class="placeholder">Ma\'lumot topilmadi</div>';
+        }
     } else if (Array.isArray(result)) {
         if (result.length > 0) {
             const columns = Object.keys(result[0]);
@@ -327,6 +363,32 @@ function displayResult(result, toolUsed) {
     }
 }
 
+// Columnar payload: {columns: [...], rows: [[...], ...]}
+function isColumnar(result) {
+    return result !== null && typeof result === 'object' &&
+        Array.isArray(result.columns) && Array.isArray(result.rows);
+}
+
+// Table whose cells are shaded by value (cohort retention); null cells stay empty
+function createHeatmap(visualization) {
+    const table = document.createElement('table');
+    table.className = 'data-table heatmap-table';
+    const header = visualization.x_labels.map(label => `<th>${escapeHtml(label)}</th>`).join('');
+    table.innerHTML = `<thead><tr><th></th>${header}</tr></thead>`;
+    const tbody = document.createElement('tbody');
+    const max = Math.max(1, ...visualization.values.flat().filter(value => value !== null));
+    visualization.values.forEach((row, index) => {
+        const cells = row.map(value => {
+            if (value === null) return '<td></td>';
+            const alpha = (0.1 + 0.9 * value / max).toFixed(2);
+            return `<td style="background: rgba(102, 126, 234, ${alpha})">${value}${visualization.unit || ''}</td>`;
+        }).join('');
+        tbody.insertAdjacentHTML('beforeend', `<tr><th>${escapeHtml(visualization.y_labels[index])}</th>${cells}</tr>`);
+    });
+    table.appendChild(tbody);
+    return table;
+}
+
 function createTable(data, columns) {
     const table = document.createElement('table');
     table.className = 'data-table';
@@ -344,18 +406,62 @@ function createTable(data, columns) {
     
     // Body
     const tbody = document.createElement('tbody');
+    appendRows(tbody, data, columns);
+    table.appendChild(tbody);
+    
+    return table;
+}
+
+// Rows may be objects (keyed by column) or arrays (columnar payload)
+function appendRows(tbody, data, columns) {
     data.forEach(row => {
         const tr = document.createElement('tr');
-        columns.forEach(col => {
+        columns.forEach((col, index) => {
             const td = document.createElement('td');
-            td.textContent = formatValue(row[col]);
+            td.textContent = formatValue(Array.isArray(row) ? row[index] : row[col]);
             tr.appendChild(td);
         });
         tbody.appendChild(tr);
     });
-    table.appendChild(tbody);
-    
-    return table;
+}
+
+// Tables arrive one page at a time; the rest is fetched with the cursor
+function addLoadMore(table, columns, visualization) {
+    if (!visualization.next_cursor) return;
+
+    let cursor = visualization.next_cursor;
+    const button = document.createElement('button');
+    button.className = 'btn btn-secondary load-more-btn';
+    const updateLabel = () => {
+        const shown = table.tBodies[0].rows.length;
+        button.textContent = `Ko'proq yuklash (${shown} / ${visualization.total_rows})`;
+    };
+    updateLabel();
+
+    button.addEventListener('click', async () => {
+        button.disabled = true;
+        try {
+            const response = await fetch(`${API_BASE_URL}/data/rows?cursor=${encodeURIComponent(cursor)}&columnar=true`);
+            const data = await response.json();
+            if (!response.ok) {
+                showError(data.detail || 'Qatorlarni yuklashda xato');
+                button.remove();
+                return;
+            }
+            appendRows(table.tBodies[0], data.rows.rows, columns);
+            cursor = data.next_cursor;
+            if (cursor) {
+                updateLabel();
+                button.disabled = false;
+            } else {
+                button.remove();
+            }
+        } catch (error) {
+            showError('Server bilan bog\'lanishda xato');
+            button.disabled = false;
+        }
+    });
+    visualizationContainer.appendChild(button);
 }
 
 function formatValue(value) {
@@ -420,28 +526,74 @@ async function createTicket(e) {
     }
 }
 
-// Load data summary on page load
-window.addEventListener('load', async () => {
+// Data summary card, kept current by the live change stream
+function renderSummary(summary) {
+    let summaryDiv = document.getElementById('summaryCard');
+    if (!summaryDiv) {
+        // Only on the start screen; once a chat result is shown the card is gone
+        if (visualizationContainer.children.length > 0) return;
+        summaryDiv = document.createElement('div');
+        summaryDiv.id = 'summaryCard';
+        summaryDiv.className = 'stat-card';
+        summaryDiv.innerHTML = `
+            <div class="stat-label">Ma'lumotlar bazasi statistikasi</div>
+            <div id="summaryStats" style="margin-top: 20px; text-align: left;"></div>
+            <div id="ticketNotices"></div>
+        `;
+        visualizationContainer.appendChild(summaryDiv);
+    }
+    document.getElementById('summaryStats').innerHTML = `
+        <p>Foydalanuvchilar: ${summary.total_users}</p>
+        <p>Buyurtmalar: ${summary.total_orders}</p>
+        <p>Savdolar: ${summary.total_sales}</p>
+        <p>Jami daromad: $${summary.total_revenue.toLocaleString()}</p>
+    `;
+}
+
+function showTicketNotice(ticket) {
+    const notices = document.getElementById('ticketNotices');
+    if (!notices || ticket.op !== 'insert') return;
+    const notice = document.createElement('div');
+    notice.className = 'live-notice';
+    notice.textContent = `Yangi ticket #${ticket.id}: ${ticket.title} (${ticket.priority})`;
+    notices.prepend(notice);
+    // Keep the last few
+    while (notices.children.length > 3) notices.lastChild.remove();
+}
+
+function followChanges() {
+    // The first event is the full summary; EventSource reconnects and resumes by itself
+    const source = new EventSource(`${API_BASE_URL}/stream/changes`);
+    let received = false;
+    source.addEventListener('summary', (e) => {
+        received = true;
+        renderSummary(JSON.parse(e.data).summary);
+    });
+    source.addEventListener('ticket', (e) => showTicketNotice(JSON.parse(e.data)));
+    source.onerror = () => {
+        // Stream unavailable (e.g. disabled on the server): show the summary once instead
+        if (!received) {
+            source.close();
+            loadSummary();
+        }
+    };
+}
+
+async function loadSummary() {
     try {
         const response = await fetch(`${API_BASE_URL}/data/summary`);
         const data = await response.json();
-        
-        if (data.summary) {
-            const summaryDiv = document.createElement('div');
-            summaryDiv.className = 'stat-card';
-            summaryDiv.innerHTML = `
-                <div class="stat-label">Ma'lumotlar bazasi statistikasi</div>
-                <div style="margin-top: 20px; text-align: left;">
-                    <p>Foydalanuvchilar: ${data.summary.total_users}</p>
-                    <p>Buyurtmalar: ${data.summary.total_orders}</p>
-                    <p>Savdolar: ${data.summary.total_sales}</p>
-                    <p>Jami daromad: $${data.summary.total_revenue.toLocaleString()}</p>
-                </div>
-            `;
-            visualizationContainer.appendChild(summaryDiv);
-        }
+        if (data.summary) renderSummary(data.summary);
     } catch (error) {
         console.error('Error loading summary:', error);
     }
-});
+}
 
+// Load data summary on page load, then follow live updates
+window.addEventListener('load', () => {
+    if (window.EventSource) {
+        followChanges();
+    } else {
+        loadSummary();
+    }
+});